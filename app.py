@@ -1,41 +1,357 @@
-from flask import Flask, render_template
+# 应用工厂
+# 导入本模块不创建应用：蓝图（及其表单、模型）和各服务模块在 create_app() 中才导入，
+# 运行 flask 命令时由 Flask 自动调用 create_app()，gunicorn 使用 'app:create_app()'。
+# 启动的每个阶段计入 StartupTimer，第一个请求结束后把启动耗时报告写入日志（见 services/startup.py）。
+
+import time
+
+_import_started = time.perf_counter()
+
 import os
+import threading
+
+import click
+from flask import Flask, current_app, render_template
+from flask.cli import with_appcontext
+from flask_login import login_required
+
 from extensions import db, login_manager
 
-app = Flask(__name__)
-app.config.from_object('config.Config')
+_import_seconds = time.perf_counter() - _import_started
+
+
+def create_app(config_object='config.Config'):
+    from services.startup import StartupTimer, init_template_cache
+
+    timer = StartupTimer(_import_seconds)
+
+    with timer.phase('config'):
+        app = Flask(__name__)
+        app.config.from_object(config_object)
+        # 模板字节码缓存必须在第一次访问 jinja_env 之前配置
+        init_template_cache(app)
+        timer.init_app(app)
+
+    # 初始化数据库（引擎参数、SQLite PRAGMA、只读副本）
+    with timer.phase('database'):
+        from services.database import configure_engines, init_engines
+        configure_engines(app)
+        db.init_app(app)
+        init_engines(app, db)
+
+    with timer.phase('services'):
+        _init_services(app, timer)
+    # 后台线程在本进程处理第一个请求时才启动，flask 命令（以及 init_db.py）只创建应用，不会启动它们
+    app.before_request(_start_background_workers)
+
+    # 注册蓝图：路由模块（连同表单、模型和它们用到的服务）在这里才导入
+    with timer.phase('blueprints'):
+        from routes.auth import auth_bp
+        from routes.student import student_bp
+        from routes.teacher import teacher_bp
+
+        app.register_blueprint(auth_bp)
+        app.register_blueprint(student_bp, url_prefix='/student')
+        app.register_blueprint(teacher_bp, url_prefix='/teacher')
+        app.add_url_rule('/', 'index', index)
+        app.add_url_rule('/catalog', 'catalog_tree', catalog_tree)
+
+    # 创建上传目录
+    with timer.phase('directories'):
+        os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'assignments'), exist_ok=True)
+        os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'word_files'), exist_ok=True)
+        os.makedirs(app.config['CHUNK_UPLOAD_FOLDER'], exist_ok=True)
+
+    # 可选：启动时就把模板载入内存（有字节码缓存时只是读文件），第一个请求不再承担这部分耗时
+    if app.config.get('JINJA_PRELOAD_TEMPLATES'):
+        from services.startup import precompile_templates
+        with timer.phase('templates'):
+            precompile_templates(app)
+
+    for command in COMMANDS:
+        app.cli.add_command(command)
+
+    app.logger.debug('应用初始化完成：%s', timer.summary())
+    return app
+
+
+def _init_services(app, timer):
+    from services.autosave import autosave_buffer
+    from services.bulk_import import import_worker
+    from services.catalog import catalog
+    from services.class_feed import class_fragments
+    from services.docx_preview import preview_worker
+    from services.exam_paper import paper_cache
+    from services.exam_timer import exam_timer
+    from services.identity_cache import identity_cache
+    from services.metrics import metrics
+    from services.password_pool import password_verifier
+    from services.query_profiler import query_profiler
+    from services.search import search_index
+    from services.static_assets import static_assets
+
+    # SQL 查询分析：每个请求的查询数、N+1 嫌疑和慢查询日志
+    query_profiler.init_app(app)
+
+    # 初始化登录管理
+    login_manager.init_app(app)
+    login_manager.login_view = 'auth.login'
+    login_manager.login_message = '请先登录'
+    login_manager.login_message_category = 'warning'
+
+    # 初始化登录用户缓存
+    identity_cache.init_app(app)
+
+    # 初始化作业附件预览的后台线程池
+    preview_worker.init_app(app)
+
+    # 初始化批量导入学生的后台线程
+    import_worker.init_app(app)
+
+    # 初始化登录密码校验线程池
+    password_verifier.init_app(app)
+
+    # 初始化学院/专业/班级目录
+    catalog.init_app(app)
+
+    # 初始化学生端作业/考试列表的班级片段缓存
+    class_fragments.init_app(app)
+
+    # 初始化考试试卷预编译缓存
+    with app.app_context():
+        paper_cache.init_app(app)
+
+    # 初始化考试答案自动保存缓冲区（写库线程启动时重放上次崩溃遗留的日志）
+    autosave_buffer.init_app(app)
+
+    # 初始化考试到时自动交卷的计时器（计时线程启动时从数据库恢复未交卷的考试）
+    exam_timer.init_app(app)
+
+    # 初始化全文检索索引（SQLite FTS5），之后的写入会同步更新索引
+    search_index.init_app(app)
+
+    # 静态资源：url_for('static', ...) 改写为指纹文件名，指纹文件带长期缓存头并优先发送预压缩版本
+    static_assets.init_app(app)
+
+    # 请求指标（Prometheus 格式 /metrics），同时输出各缓存和后台组件的运行统计
+    metrics.init_app(app)
+    metrics.register('identity_cache', identity_cache.stats)
+    metrics.register('password_verify', password_verifier.stats)
+    metrics.register('class_fragments', class_fragments.stats)
+    metrics.register('exam_autosave', autosave_buffer.stats)
+    metrics.register('exam_timer', exam_timer.stats)
+    metrics.register('exam_papers', lambda: {'compiles': paper_cache.compiles})
+    metrics.register('query_profiler', lambda: {'slow_queries': query_profiler.slow_queries})
+    metrics.register('startup', timer.stats)
 
-# 初始化数据库
-db.init_app(app)
 
-# 初始化登录管理
-login_manager.init_app(app)
-login_manager.login_view = 'auth.login'
-login_manager.login_message = '请先登录'
-login_manager.login_message_category = 'warning'
+_background_started = False
+_background_lock = threading.Lock()
 
-# 创建上传目录
-os.makedirs('static/uploads/assignments', exist_ok=True)
-os.makedirs('static/uploads/word_files', exist_ok=True)
 
-# 用户加载回调
+def _start_background_workers():
+    """每个进程处理第一个请求时启动：重放自动保存日志并启动写库线程、考试计时器、试卷预编译"""
+    global _background_started
+    if _background_started:
+        return
+    with _background_lock:
+        if _background_started:
+            return
+        if current_app.config.get('BACKGROUND_WORKERS', True):
+            from services.autosave import autosave_buffer
+            from services.exam_paper import paper_cache
+            from services.exam_timer import exam_timer
+
+            autosave_buffer.start()
+            exam_timer.start()
+            paper_cache.start()
+        _background_started = True
+
+
+# 用户加载回调：优先从身份缓存读取，未命中时才查询数据库
 @login_manager.user_loader
 def load_user(user_id):
     from models import User
-    return User.query.get(int(user_id))
-
-# 注册蓝图
-from routes.auth import auth_bp
-from routes.student import student_bp
-from routes.teacher import teacher_bp
+    from services.identity_cache import identity_cache
+    return identity_cache.load(int(user_id), User.query.get)
 
-app.register_blueprint(auth_bp)
-app.register_blueprint(student_bp, url_prefix='/student')
-app.register_blueprint(teacher_bp, url_prefix='/teacher')
 
-@app.route('/')
 def index():
     return render_template('index.html')
 
+
+# 完整的学院 → 专业 → 班级目录，前端可一次加载后在本地完成级联选择
+@login_required
+def catalog_tree():
+    from services.catalog import catalog
+    return catalog.json_response(lambda tree: {'catalog': tree})
+
+
+# 从 CSV / XLSX 批量导入学生：flask import-students students.csv [--passwords-out passwords.csv]
+# 密码列为空的学生会生成随机初始密码，写入 --passwords-out 指定的 CSV，未指定时直接输出
+@click.command('import-students')
+@click.argument('path')
+@click.option('--passwords-out', default=None, help='把随机生成的初始密码写入这个 CSV 文件')
+@with_appcontext
+def import_students_command(path, passwords_out):
+    import csv
+    import sys
+    from services import bulk_import
+    from services.catalog import catalog
+    with open(path, 'rb') as f:
+        rows = bulk_import.read_rows(f, path)
+    report = bulk_import.import_students(rows,
+                                         batch_size=current_app.config['BULK_IMPORT_BATCH_SIZE'],
+                                         workers=current_app.config['BULK_IMPORT_WORKERS'],
+                                         hash_method=current_app.config['PASSWORD_HASH_METHOD'])
+    if report['classes_created']:
+        catalog.invalidate()
+    for line_no, message in report['errors']:
+        print(f'第 {line_no} 行: {message}')
+    print(f"共 {report['total']} 行，导入 {report['created']} 名学生，新建 {report['classes_created']} 个班级，"
+          f"失败 {len(report['errors'])} 行")
+    print(f"耗时 {report['elapsed']} 秒（密码哈希 {report['hash_seconds']} 秒），{report['rows_per_second']} 行/秒")
+
+    if report['generated_passwords']:
+        out = open(passwords_out, 'w', encoding='utf-8-sig', newline='') if passwords_out else sys.stdout
+        try:
+            writer = csv.writer(out)
+            writer.writerow(['行号', '学号', '姓名', '初始密码'])
+            writer.writerows(report['generated_passwords'])
+        finally:
+            if passwords_out:
+                out.close()
+        if passwords_out:
+            print(f"{len(report['generated_passwords'])} 名学生的随机初始密码已写入 {passwords_out}")
+
+
+# 预编译即将开始的考试试卷，可在开考前由定时任务调用：flask precompile-papers
+@click.command('precompile-papers')
+@click.option('--window', default=15, help='编译多少分钟内开始的考试')
+@with_appcontext
+def precompile_papers(window):
+    from services.exam_paper import paper_cache
+    count = paper_cache.precompile_upcoming(window)
+    print(f'已编译 {count} 场考试的试卷')
+
+
+# 清理过期未完成的分片上传，可由定时任务调用：flask cleanup-uploads
+@click.command('cleanup-uploads')
+@with_appcontext
+def cleanup_uploads():
+    from services import chunked_upload
+    removed = chunked_upload.cleanup_stale(current_app.config['CHUNK_UPLOAD_FOLDER'],
+                                           current_app.config['CHUNK_UPLOAD_EXPIRE'])
+    print(f'已清理 {removed} 个过期上传')
+
+
+# 把旧版本保存在 static/uploads 下的作业附件移到 UPLOAD_FOLDER（升级后执行一次）：flask move-uploads
+@click.command('move-uploads')
+@click.option('--source', default=None, help='旧的上传目录，默认是 static/uploads')
+@with_appcontext
+def move_uploads(source):
+    from services import submission_files
+    source = source or os.path.join(current_app.static_folder, 'uploads')
+    moved, missing = submission_files.move_legacy_uploads(source)
+    print(f'已移动 {moved} 个附件，{missing} 个附件文件不存在')
+
+
+# 为已有的作业提交重建查重索引（首次启用查重或调整分桶参数后执行）：flask reindex-plagiarism
+@click.command('reindex-plagiarism')
+@with_appcontext
+def reindex_plagiarism():
+    from models import AssignmentSubmission, SubmissionPreview
+    from services import plagiarism
+    from services.docx_preview import build_preview
+
+    options = {'min_length': current_app.config['PLAGIARISM_MIN_LENGTH'],
+               'min_similarity': current_app.config['PLAGIARISM_MIN_SIMILARITY']}
+    submission_ids = [row.id for row in AssignmentSubmission.query.with_entities(AssignmentSubmission.id)
+                      .order_by(AssignmentSubmission.id)]
+    pairs = 0
+    for submission_id in submission_ids:
+        if SubmissionPreview.query.get(submission_id) is None:
+            build_preview(submission_id)
+        pairs += len(plagiarism.index_submission(submission_id, **options))
+    print(f'已索引 {len(submission_ids)} 份提交，发现 {pairs} 对相似提交')
+
+
+# 重建全文检索索引（首次启用检索或索引损坏时执行）：flask rebuild-search-index
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index():
+    from services.search import search_index
+    if not search_index.available:
+        print('当前数据库不支持 FTS5，无法建立全文检索索引')
+        return
+    with db.engine.begin() as connection:
+        count = search_index.rebuild(connection)
+    print(f'已索引 {count} 条记录')
+
+
+# 用提交表重新计算班级成绩统计（数据修复用）：flask rebuild-grade-stats
+@click.command('rebuild-grade-stats')
+@with_appcontext
+def rebuild_grade_stats():
+    from models import Assignment, Exam
+    from services import grade_stats
+
+    assignment_ids = [row.id for row in Assignment.query.with_entities(Assignment.id)]
+    exam_ids = [row.id for row in Exam.query.with_entities(Exam.id)]
+    for assignment_id in assignment_ids:
+        grade_stats.rebuild('assignment', assignment_id)
+    for exam_id in exam_ids:
+        grade_stats.rebuild('exam', exam_id)
+    db.session.commit()
+    print(f'已重新统计 {len(assignment_ids)} 个作业、{len(exam_ids)} 场考试')
+
+
+# 构建带内容哈希的静态资源和 gzip/brotli 压缩版本，部署时执行：flask build-assets
+@click.command('build-assets')
+@with_appcontext
+def build_assets():
+    from services import static_assets as assets
+    manifest = assets.build(current_app.static_folder, current_app.config['STATIC_ASSETS_DIR'])
+    for source, target in sorted(manifest.items()):
+        print(f'{source} -> {target}')
+    if assets.brotli is None:
+        print('未安装 brotli，只生成了 gzip 压缩版本')
+    print(f'已构建 {len(manifest)} 个静态文件')
+
+
+# 编译全部模板并写入字节码缓存，部署时执行，worker 启动后不再解析模板：flask precompile-templates
+@click.command('precompile-templates')
+@with_appcontext
+def precompile_templates_command():
+    from services.startup import precompile_templates
+    if not current_app.config.get('JINJA_BYTECODE_CACHE_DIR'):
+        print('未配置 JINJA_BYTECODE_CACHE_DIR，编译结果不会保存')
+    started = time.perf_counter()
+    loaded, errors = precompile_templates(current_app)
+    for name, message in errors:
+        print(f'{name}: {message}')
+    print(f'已编译 {loaded} 个模板，失败 {len(errors)} 个，耗时 {time.perf_counter() - started:.2f} 秒')
+
+
+# 输出启动各阶段的耗时和第一个请求的耗时：flask startup-report
+@click.command('startup-report')
+@with_appcontext
+def startup_report():
+    timer = current_app.extensions['startup']
+    # 报告用的请求不启动后台线程
+    current_app.config['BACKGROUND_WORKERS'] = False
+    for name, seconds in timer.phases:
+        print(f'{name:<12}{seconds * 1000:>10.1f} ms')
+    print(f'{"total":<12}{timer.total * 1000:>10.1f} ms')
+    started = time.perf_counter()
+    status = current_app.test_client().get('/').status_code
+    print(f'{"first GET /":<12}{(time.perf_counter() - started) * 1000:>10.1f} ms（状态 {status}）')
+
+
+COMMANDS = (import_students_command, precompile_papers, cleanup_uploads, move_uploads, reindex_plagiarism,
+            rebuild_search_index, rebuild_grade_stats, build_assets, precompile_templates_command,
+            startup_report)
+
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
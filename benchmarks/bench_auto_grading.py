@@ -0,0 +1,72 @@
+# 自动评分基准：向量化评分 vs 逐题循环
+# 用法：python -m benchmarks.bench_auto_grading [学生数] [题目数]
+
+import random
+import sys
+import time
+
+from services.auto_grading import MULTIPLE, JUDGE, SINGLE, score_arrays, score_matrix, score_matrix_loop, to_arrays
+
+
+def make_exam(students, questions, seed=42):
+    rng = random.Random(seed)
+    kinds, keys, points = [], [], []
+    for _ in range(questions):
+        kind = rng.choice([SINGLE, SINGLE, MULTIPLE, JUDGE])
+        if kind == SINGLE:
+            key = 1 << rng.randrange(4)
+        elif kind == MULTIPLE:
+            key = rng.randrange(1, 16)
+        else:
+            key = rng.choice([1, 2])
+        kinds.append(kind)
+        keys.append(key)
+        points.append(rng.choice([1.0, 2.0, 5.0]))
+
+    responses = []
+    for _ in range(students):
+        row = []
+        for kind, key in zip(kinds, keys):
+            roll = rng.random()
+            if roll < 0.6:
+                row.append(key)
+            elif roll < 0.65:
+                row.append(0)
+            elif kind == JUDGE:
+                row.append(3 - key)
+            else:
+                row.append(rng.randrange(1, 16))
+        responses.append(row)
+    return kinds, keys, points, responses
+
+
+def timed(func, *args, repeat=3):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(students=1000, questions=100):
+    kinds, keys, points, responses = make_exam(students, questions)
+
+    loop_time, loop_scores = timed(score_matrix_loop, kinds, keys, points, responses)
+    vector_time, vector_scores = timed(score_matrix, kinds, keys, points, responses)
+
+    arrays = to_arrays(kinds, keys, points, responses)
+    kernel_time, _ = timed(score_arrays, *arrays)
+
+    assert loop_scores == vector_scores, '向量化评分结果与逐题循环不一致'
+
+    print(f'{students} 名学生 × {questions} 道题')
+    print(f'逐题循环:           {loop_time * 1000:.1f} ms')
+    print(f'向量化（含数组转换）: {vector_time * 1000:.1f} ms，加速 {loop_time / vector_time:.1f}x')
+    print(f'向量化（仅评分）:     {kernel_time * 1000:.1f} ms，加速 {loop_time / kernel_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,81 @@
+# 试卷下发吞吐量基准：每次请求查询题目并渲染模板 vs 预编译试卷
+# 用法：python -m benchmarks.bench_exam_paper [题目数] [请求数]
+
+import json
+import sys
+import time
+
+from jinja2 import Environment
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, Text, create_engine, select
+
+from services.exam_paper import build_paper
+
+PAPER_TEMPLATE = Environment(autoescape=True).from_string('''
+<h5>{{ exam.title }}</h5>
+{% for q in questions %}
+<div class="question" data-id="{{ q.id }}">
+  <p>{{ loop.index }}. {{ q.content }}（{{ q.score }}分）</p>
+  {% for option in q.options %}<label><input type="radio" name="q{{ q.id }}">{{ option }}</label>{% endfor %}
+</div>
+{% endfor %}
+''')
+
+
+def setup_database(question_count):
+    engine = create_engine('sqlite://')
+    metadata = MetaData()
+    questions = Table('exam_question', metadata,
+                      Column('id', Integer, primary_key=True),
+                      Column('exam_id', Integer, index=True),
+                      Column('question_type', String(20)),
+                      Column('content', Text),
+                      Column('options', Text),
+                      Column('answer', String(20)),
+                      Column('score', Float))
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(questions.insert(), [{
+            'exam_id': 1,
+            'question_type': 'single_choice',
+            'content': f'第{i}题：下列关于数据结构的说法中，正确的是哪一项？' * 2,
+            'options': json.dumps(['选项A', '选项B', '选项C', '选项D'], ensure_ascii=False),
+            'answer': 'A',
+            'score': 2.0,
+        } for i in range(question_count)])
+    return engine, questions
+
+
+def current_path(engine, questions, student_id):
+    # 模拟现有做法：每个请求查询题目并渲染模板
+    with engine.connect() as conn:
+        rows = conn.execute(select(questions).where(questions.c.exam_id == 1).order_by(questions.c.id)).all()
+    items = [{'id': r.id, 'content': r.content, 'score': r.score, 'options': json.loads(r.options)} for r in rows]
+    return PAPER_TEMPLATE.render(exam={'title': '期中考试'}, questions=items).encode('utf-8')
+
+
+def main(question_count=100, requests=2000):
+    engine, questions = setup_database(question_count)
+
+    with engine.connect() as conn:
+        rows = conn.execute(select(questions).order_by(questions.c.id)).all()
+    meta = {'id': 1, 'title': '期中考试', 'class_id': 1, 'start_time': None, 'end_time': None, 'duration': 90}
+    paper = build_paper(1, meta, [dict(r._mapping) for r in rows])
+
+    started = time.perf_counter()
+    for student_id in range(requests):
+        current_path(engine, questions, student_id)
+    current_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for student_id in range(requests):
+        paper.render_for(student_id, 'secret')
+    compiled_elapsed = time.perf_counter() - started
+
+    print(f'{question_count} 道题，{requests} 次请求（单线程）')
+    print(f'查询 + 渲染模板: {requests / current_elapsed:,.0f} 次/秒')
+    print(f'预编译试卷:      {requests / compiled_elapsed:,.0f} 次/秒')
+    print(f'提升:            {current_elapsed / compiled_elapsed:.1f}x')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,66 @@
+# 请求指标开销检查：每个请求额外执行的指标代码（请求开始/结束钩子、模板渲染信号、写入直方图）的耗时，
+# 超过预算时以非零状态退出；同时给出端到端对比作参考（受机器抖动影响较大）。
+# 用法：python -m benchmarks.bench_metrics [请求数] [预算（微秒）]
+
+import sys
+import time
+
+from flask import Flask, Response, before_render_template, render_template_string, template_rendered
+
+from services.metrics import Metrics
+
+
+def make_app(enabled):
+    app = Flask(__name__)
+    app.config['METRICS_ENABLED'] = enabled
+
+    @app.route('/ping')
+    def ping():
+        return render_template_string('<p>{{ value }}</p>', value='ok')
+
+    metrics = Metrics()
+    metrics.init_app(app)
+    return app, metrics
+
+
+def hook_overhead(requests):
+    """在一个请求上下文中重复执行一个请求会触发的全部指标代码，返回每次的平均耗时（秒）"""
+    app, metrics = make_app(True)
+    template = app.jinja_env.from_string('')
+    response = Response('<p>ok</p>')
+    with app.test_request_context('/ping'):
+        started = time.perf_counter()
+        for _ in range(requests):
+            metrics._start_request()
+            before_render_template.send(app, template=template, context={})
+            template_rendered.send(app, template=template, context={})
+            metrics._after_request(response)
+            metrics._finish_request(None)
+        return (time.perf_counter() - started) / requests
+
+
+def end_to_end(enabled, requests):
+    app, _ = make_app(enabled)
+    client = app.test_client()
+    for _ in range(200):
+        client.get('/ping')
+    started = time.perf_counter()
+    for _ in range(requests):
+        client.get('/ping')
+    return (time.perf_counter() - started) / requests
+
+
+def main(requests=20000, budget_us=50):
+    overhead = min(hook_overhead(requests) for _ in range(3)) * 1e6
+    plain = end_to_end(False, requests // 4) * 1e6
+    instrumented = end_to_end(True, requests // 4) * 1e6
+
+    print(f'指标代码: {overhead:.1f} 微秒/请求（预算 {budget_us} 微秒）')
+    print(f'端到端参考: 关闭 {plain:.0f} 微秒/请求，开启 {instrumented:.0f} 微秒/请求')
+    if overhead > budget_us:
+        print('超出预算')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
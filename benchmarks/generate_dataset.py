@@ -0,0 +1,274 @@
+# 生成大规模合成数据，用于压测和观察各功能在真实数据量下的表现
+# init_db.py 只有 2 名教师和 3 名学生，看不出任何规模问题。这里按学院 → 专业 → 班级批量生成
+# 班级、教师、学生、作业、作业提交、考试和试题，全部用 Core 的批量 INSERT（executemany），
+# 每批一个事务，不经过 ORM 对象和 mapper 事件；所有账号共用同一个预先算好的密码哈希。
+# 写入完成后重建全文检索索引和成绩统计（这两者平时由 ORM 事件/业务代码增量维护），
+# 并在 instance/ 下写一份数据清单（账号规则、每个班级的作业和考试），供 load_test 使用。
+#
+# 用法：python -m benchmarks.generate_dataset --reset [--colleges 50 --students 50000 ...]
+# 默认规模：50 个学院 × 4 个专业 × 5 个班级 = 1000 个班级，5 万名学生，1 万个作业，
+# 每个作业约 80% 的学生提交（约 40 万份提交）；要几百万份提交可加大 --assignments 或 --students。
+
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, insert, select
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+from extensions import db
+from models import Assignment, AssignmentSubmission, ClassInfo, Exam, ExamQuestion, User
+
+# 账号规则：教师 138 开头、学生 139 开头，后 8 位为序号（与 init_db.py 的 1380013800x 不冲突）
+TEACHER_PHONE = '138{:08d}'
+STUDENT_PHONE = '139{:08d}'
+STUDENT_NUMBER = '{year}{index:06d}'
+
+SURNAMES = '赵钱孙李周吴郑王冯陈褚卫蒋沈韩杨朱秦尤许何吕施张孔曹严华金魏陶姜'
+GIVEN_NAMES = '伟芳娜敏静丽强磊军洋勇艳杰涛明超秀霞平刚桂英华玉萍红娥玲芬燕'
+MAJORS = ('计算机科学与技术专业', '软件工程专业', '物联网专业', '数据科学专业', '汉语言专业', '英语专业',
+          '机械工程专业', '电子信息专业')
+ANSWER_WORDS = ('数据结构', '算法', '时间复杂度', '链表', '二叉树', '哈希表', '排序', '递归', '动态规划',
+                '图的遍历', '栈和队列', '数据库', '索引', '事务', '并发', '网络协议', '操作系统', '内存管理')
+
+MANIFEST_PATH = os.path.join('instance', 'loadtest_dataset.json')
+
+
+def _name(rng):
+    return rng.choice(SURNAMES) + ''.join(rng.choice(GIVEN_NAMES) for _ in range(rng.randint(1, 2)))
+
+
+def _answer_text(rng, words=60):
+    return '，'.join(rng.choice(ANSWER_WORDS) for _ in range(words)) + '。'
+
+
+def _bulk_insert(table, rows, batch_size):
+    """按批次写入（rows 可以是生成器），每批一个事务，返回写入行数"""
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            count += _flush(table, batch)
+            batch = []
+    if batch:
+        count += _flush(table, batch)
+    return count
+
+
+def _flush(table, batch):
+    with db.engine.begin() as connection:
+        connection.execute(insert(table), batch)
+    return len(batch)
+
+
+def _ids(model, **filters):
+    query = select(model.id).filter_by(**filters).order_by(model.id)
+    with db.engine.connect() as connection:
+        return [row.id for row in connection.execute(query)]
+
+
+def generate(args):
+    rng = random.Random(args.seed)
+    now = datetime.now().replace(microsecond=0)
+    batch_size = args.batch_size
+    report = {}
+
+    # 所有账号共用一个哈希，不然 5 万次 pbkdf2 就要几个小时
+    password_hash = generate_password_hash(args.password, current_app.config['PASSWORD_HASH_METHOD'])
+
+    started = time.perf_counter()
+    classes = [{
+        'college': f'第{c + 1}学院',
+        'major': MAJORS[(c + m) % len(MAJORS)],
+        'class_name': f'{k + 1}班',
+        'description': f'第{c + 1}学院{MAJORS[(c + m) % len(MAJORS)]}{k + 1}班',
+    } for c in range(args.colleges) for m in range(args.majors) for k in range(args.classes)]
+    _bulk_insert(ClassInfo.__table__, classes, batch_size)
+    class_ids = _ids(ClassInfo)
+    report['班级'] = len(class_ids)
+
+    teacher_count = max(1, len(class_ids) // args.classes_per_teacher)
+    _bulk_insert(User.__table__, ({
+        'name': _name(rng) + '老师',
+        'phone': TEACHER_PHONE.format(i),
+        'role': 'teacher',
+        'password_hash': password_hash,
+    } for i in range(teacher_count)), batch_size)
+    teacher_ids = _ids(User, role='teacher')
+    report['教师'] = teacher_count
+
+    # 学生均匀分到各班，学号 = 入学年份 + 序号
+    class_info = {c_id: c for c_id, c in zip(class_ids, classes)}
+    student_class = [class_ids[i % len(class_ids)] for i in range(args.students)]
+    _bulk_insert(User.__table__, ({
+        'name': _name(rng),
+        'phone': STUDENT_PHONE.format(i),
+        'role': 'student',
+        'student_id': STUDENT_NUMBER.format(year=2020 + i % 4, index=i),
+        'class_id': class_id,
+        'college': class_info[class_id]['college'],
+        'major': class_info[class_id]['major'],
+        'password_hash': password_hash,
+    } for i, class_id in enumerate(student_class)), batch_size)
+    student_ids = _ids(User, role='student')
+    students_by_class = {}
+    for student_id, class_id in zip(student_ids, student_class):
+        students_by_class.setdefault(class_id, []).append(student_id)
+    report['学生'] = len(student_ids)
+
+    # 每个班级由固定的一位教师负责；作业截止时间分布在过去 90 天到未来 30 天
+    class_teacher = {c_id: teacher_ids[i // args.classes_per_teacher % len(teacher_ids)]
+                     for i, c_id in enumerate(class_ids)}
+    assignment_class = [class_ids[i % len(class_ids)] for i in range(args.assignments)]
+    _bulk_insert(Assignment.__table__, ({
+        'title': f'第{i // len(class_ids) + 1}次作业：{rng.choice(ANSWER_WORDS)}',
+        'description': _answer_text(rng, 20),
+        'deadline': now + timedelta(days=rng.randint(-90, 30), hours=rng.randint(0, 23)),
+        'class_id': class_id,
+        'teacher_id': class_teacher[class_id],
+    } for i, class_id in enumerate(assignment_class)), batch_size)
+    with db.engine.connect() as connection:
+        assignments = connection.execute(
+            select(Assignment.id, Assignment.class_id, Assignment.deadline).order_by(Assignment.id)).all()
+    report['作业'] = len(assignments)
+
+    # 作业提交按作业顺序流式生成，不把几百万行放进内存；截止时间已过的作业大部分已批改
+    answers = [_answer_text(rng) for _ in range(200)]
+
+    def submission_rows():
+        for assignment in assignments:
+            past = assignment.deadline < now
+            for student_id in students_by_class.get(assignment.class_id, ()):
+                if rng.random() >= args.submission_rate:
+                    continue
+                graded = past and rng.random() < 0.9
+                yield {
+                    'assignment_id': assignment.id,
+                    'student_id': student_id,
+                    'text_answer': rng.choice(answers),
+                    'submitted_at': min(assignment.deadline, now) - timedelta(minutes=rng.randint(1, 10000)),
+                    'graded': graded,
+                    'score': round(min(100.0, max(0.0, rng.gauss(76, 12)))) if graded else None,
+                }
+
+    report['作业提交'] = _bulk_insert(AssignmentSubmission.__table__, submission_rows(), batch_size)
+
+    # 每个班级若干场已结束的考试，外加一场正在进行的考试（压测“开始考试”场景用）
+    exams = []
+    for class_id in class_ids:
+        for k in range(args.exams):
+            start = now - timedelta(days=7 * (k + 1))
+            exams.append((class_id, start, start + timedelta(hours=2)))
+        exams.append((class_id, now - timedelta(hours=1), now + timedelta(days=args.open_exam_days)))
+    _bulk_insert(Exam.__table__, ({
+        'title': f'第{i % (args.exams + 1) + 1}次测验',
+        'description': '合成数据',
+        'start_time': start,
+        'end_time': end,
+        'duration': 90,
+        'class_id': class_id,
+        'teacher_id': class_teacher[class_id],
+    } for i, (class_id, start, end) in enumerate(exams)), batch_size)
+    with db.engine.connect() as connection:
+        exam_rows = connection.execute(select(Exam.id, Exam.class_id, Exam.end_time).order_by(Exam.id)).all()
+    report['考试'] = len(exam_rows)
+
+    report['试题'] = _bulk_insert(ExamQuestion.__table__, ({
+        'exam_id': exam.id,
+        'question_type': 'single_choice',
+        'content': f'第{q + 1}题：下列关于{rng.choice(ANSWER_WORDS)}的说法中，正确的是哪一项？',
+        'options': json.dumps(['选项A', '选项B', '选项C', '选项D'], ensure_ascii=False),
+        'answer': rng.choice('ABCD'),
+        'score': 100 / args.questions,
+    } for exam in exam_rows for q in range(args.questions)), batch_size)
+
+    report['写入耗时'] = f'{time.perf_counter() - started:.1f} 秒'
+
+    if not args.skip_derived:
+        started = time.perf_counter()
+        _rebuild_derived(assignments, exam_rows)
+        report['重建索引/统计耗时'] = f'{time.perf_counter() - started:.1f} 秒'
+
+    _write_manifest(args, now, student_class, assignments, exam_rows)
+    return report
+
+
+def _rebuild_derived(assignments, exam_rows):
+    from services import grade_stats
+    from services.search import search_index
+
+    if search_index.available:
+        with db.engine.begin() as connection:
+            search_index.rebuild(connection)
+    for assignment in assignments:
+        grade_stats.rebuild('assignment', assignment.id)
+    db.session.commit()
+    for exam in exam_rows:
+        grade_stats.rebuild('exam', exam.id)
+    db.session.commit()
+
+
+def _write_manifest(args, now, student_class, assignments, exam_rows):
+    """数据清单：压测脚本据此挑选学生账号、可提交的作业和正在进行的考试"""
+    open_assignments = {}
+    for assignment in assignments:
+        if assignment.deadline > now:
+            open_assignments.setdefault(assignment.class_id, []).append(assignment.id)
+    open_exams = {exam.class_id: exam.id for exam in exam_rows if exam.end_time > now}
+
+    manifest = {
+        'generated_at': now.isoformat(),
+        'password': args.password,
+        'student_phone': STUDENT_PHONE,
+        # 第 i 名学生（手机号序号 i）所在的班级
+        'student_classes': student_class,
+        'open_assignments': {str(k): v for k, v in open_assignments.items()},
+        'open_exams': {str(k): v for k, v in open_exams.items()},
+    }
+    os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成大规模合成数据')
+    parser.add_argument('--reset', action='store_true', help='先删除并重建所有表（会清空现有数据）')
+    parser.add_argument('--colleges', type=int, default=50, help='学院数')
+    parser.add_argument('--majors', type=int, default=4, help='每个学院的专业数')
+    parser.add_argument('--classes', type=int, default=5, help='每个专业的班级数')
+    parser.add_argument('--classes-per-teacher', type=int, default=5, help='每位教师负责的班级数')
+    parser.add_argument('--students', type=int, default=50000, help='学生数')
+    parser.add_argument('--assignments', type=int, default=10000, help='作业数')
+    parser.add_argument('--submission-rate', type=float, default=0.8, help='每个作业提交的学生比例')
+    parser.add_argument('--exams', type=int, default=2, help='每个班级已结束的考试数')
+    parser.add_argument('--questions', type=int, default=20, help='每场考试的题目数')
+    parser.add_argument('--open-exam-days', type=int, default=7, help='正在进行的考试还要持续几天')
+    parser.add_argument('--password', default='password123', help='所有生成账号的密码')
+    parser.add_argument('--batch-size', type=int, default=5000, help='每批写入的行数')
+    parser.add_argument('--seed', type=int, default=2023, help='随机种子（相同参数和种子生成相同数据）')
+    parser.add_argument('--skip-derived', action='store_true', help='不重建全文检索索引和成绩统计')
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        if args.reset:
+            db.drop_all()
+            db.create_all()
+        else:
+            with db.engine.connect() as connection:
+                if connection.execute(select(func.count()).select_from(User.__table__)).scalar():
+                    parser.error('数据库中已有用户，请加 --reset 清空后再生成')
+        report = generate(args)
+
+    for name, value in report.items():
+        print(f'{name}: {value}')
+    print(f'数据清单已写入 {MANIFEST_PATH}')
+
+
+if __name__ == '__main__':
+    main()
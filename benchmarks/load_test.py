@@ -0,0 +1,253 @@
+# 学生端压测：对本地运行的实例重放学生的典型操作，统计每个场景的吞吐量和延迟分位数
+# 先用 generate_dataset 生成数据（会写出 instance/loadtest_dataset.json），再启动应用，例如
+#   python -m benchmarks.generate_dataset --reset
+#   gunicorn -w 4 -b 127.0.0.1:5000 'app:create_app()'
+#   python -m benchmarks.load_test --url http://127.0.0.1:5000 --users 50 --duration 60 --output before.json
+# 每个虚拟用户是一个线程，登录一名随机学生后循环执行：打开面板、提交作业、打开考试试卷，
+# 每轮按 --relogin 的概率重新登录。每个场景只计最后那一个请求的耗时（取 CSRF 令牌的 GET 不计入）。
+# 登录没有重定向、或者请求被重定向回登录页都算错误。页面里取不到 CSRF 令牌时，
+# 被测实例需要用 WTF_CSRF_ENABLED=0 启动，否则所有表单提交都会失败。
+# 结果可写成 JSON，用 --compare 与另一次（例如上一个提交）的结果对比。
+# 只用标准库，不需要额外安装压测工具。
+
+import argparse
+import http.cookiejar
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+# generate_dataset 写出的数据清单
+MANIFEST_PATH = os.path.join('instance', 'loadtest_dataset.json')
+SCENARIOS = ('login', 'dashboard', 'submit', 'exam_start')
+
+_CSRF_RE = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"|value="([^"]+)"[^>]*name="csrf_token"')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # 登录和提交成功后会重定向，重定向后的页面不算在这个场景里
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class VirtualUser:
+    def __init__(self, base_url, manifest, rng, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.manifest = manifest
+        self.rng = rng
+        self.timeout = timeout
+        self.student_index = None
+        self._new_session()
+
+    def _new_session(self):
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def _request(self, path, data=None, headers=None):
+        """返回 (状态码, 响应内容)，3xx 视为成功"""
+        body = urllib.parse.urlencode(data).encode('utf-8') if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, headers=headers or {})
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            body = e.read()
+            # 会话失效时页面会重定向到登录页，不能算作成功
+            if 300 <= e.code < 400 and urllib.parse.urlsplit(e.headers.get('Location', '')).path == '/login':
+                return 401, body
+            return e.code, body
+
+    def _csrf_token(self, path):
+        status, body = self._request(path)
+        match = _CSRF_RE.search(body.decode('utf-8', 'replace'))
+        return status, (match.group(1) or match.group(2)) if match else None
+
+    @property
+    def class_id(self):
+        return str(self.manifest['student_classes'][self.student_index])
+
+    def login(self):
+        self._new_session()
+        self.student_index = self.rng.randrange(len(self.manifest['student_classes']))
+        _, token = self._csrf_token('/login')
+        form = {'phone': self.manifest['student_phone'].format(self.student_index),
+                'password': self.manifest['password']}
+        if token:
+            form['csrf_token'] = token
+        return lambda: self._post_login(form)
+
+    def _post_login(self, form):
+        status, body = self._request('/login', form)
+        # 登录成功会重定向到面板；返回 200 说明表单被重新渲染（密码错误或 CSRF 校验失败）
+        return (401 if status == 200 else status), body
+
+    def dashboard(self):
+        return lambda: self._request('/student/dashboard')
+
+    def submit(self):
+        assignment_ids = self.manifest['open_assignments'].get(self.class_id)
+        if not assignment_ids:
+            return None
+        path = f'/student/assignment/{self.rng.choice(assignment_ids)}'
+        _, token = self._csrf_token(path)
+        form = {'text_answer': f'压测提交 {time.time():.6f}：' + '数据结构与算法，' * 40}
+        if token:
+            form['csrf_token'] = token
+        return lambda: self._request(path, form)
+
+    def exam_start(self):
+        exam_id = self.manifest['open_exams'].get(self.class_id)
+        if exam_id is None:
+            return None
+        return lambda: self._request(f'/student/exam/{exam_id}/paper')
+
+
+class Results:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {name: [] for name in SCENARIOS}
+        self.errors = {name: 0 for name in SCENARIOS}
+        self.skipped = {name: 0 for name in SCENARIOS}
+
+    def record(self, scenario, seconds, ok):
+        with self._lock:
+            if ok:
+                self.latencies[scenario].append(seconds)
+            else:
+                self.errors[scenario] += 1
+
+    def skip(self, scenario):
+        with self._lock:
+            self.skipped[scenario] += 1
+
+
+def percentile(values, q):
+    """已排序列表的分位数（最近秩法）"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+def run_user(user, results, stop_at, relogin, think_time):
+    scenario_order = ('dashboard', 'submit', 'exam_start')
+    need_login = True
+    while time.perf_counter() < stop_at:
+        for scenario in (('login',) if need_login else ()) + scenario_order:
+            if time.perf_counter() >= stop_at:
+                return
+            try:
+                call = getattr(user, scenario)()
+            except OSError:
+                results.record(scenario, 0, False)
+                continue
+            if call is None:
+                results.skip(scenario)
+                continue
+            started = time.perf_counter()
+            try:
+                status, _ = call()
+                ok = status < 400
+            except OSError:
+                ok = False
+            results.record(scenario, time.perf_counter() - started, ok)
+            if scenario == 'login':
+                need_login = not ok
+            if think_time:
+                time.sleep(user.rng.uniform(0, think_time))
+        if not need_login and user.rng.random() < relogin:
+            need_login = True
+
+
+def summarize(results, elapsed):
+    summary = {}
+    for scenario in SCENARIOS:
+        values = sorted(results.latencies[scenario])
+        summary[scenario] = {
+            'requests': len(values),
+            'errors': results.errors[scenario],
+            'skipped': results.skipped[scenario],
+            'throughput': round(len(values) / elapsed, 1) if elapsed else 0,
+            'p50_ms': _ms(percentile(values, 50)),
+            'p95_ms': _ms(percentile(values, 95)),
+            'p99_ms': _ms(percentile(values, 99)),
+        }
+    return summary
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def print_summary(summary, baseline=None):
+    print(f'{"场景":<12}{"请求数":>8}{"错误":>6}{"次/秒":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}')
+    for scenario, row in summary.items():
+        line = (f'{scenario:<12}{row["requests"]:>8}{row["errors"]:>6}{row["throughput"]:>9}'
+                f'{_fmt(row["p50_ms"]):>9}{_fmt(row["p95_ms"]):>9}{_fmt(row["p99_ms"]):>9}')
+        old = (baseline or {}).get(scenario)
+        if old and old.get('throughput') and old.get('p95_ms') and row['p95_ms'] is not None:
+            line += (f'   吞吐 {row["throughput"] / old["throughput"]:.2f}x，'
+                     f'p95 {row["p95_ms"] / old["p95_ms"]:.2f}x')
+        print(line)
+
+
+def _fmt(value):
+    return '-' if value is None else f'{value}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='学生端压测')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='被测实例的地址')
+    parser.add_argument('--users', type=int, default=20, help='并发虚拟用户数')
+    parser.add_argument('--duration', type=float, default=30, help='压测时长（秒）')
+    parser.add_argument('--relogin', type=float, default=0.1, help='每轮结束后重新登录（换一名学生）的概率')
+    parser.add_argument('--think-time', type=float, default=0, help='每个请求后随机等待的最长秒数')
+    parser.add_argument('--timeout', type=float, default=30, help='单个请求的超时（秒）')
+    parser.add_argument('--manifest', default=MANIFEST_PATH, help='generate_dataset 写出的数据清单')
+    parser.add_argument('--seed', type=int, default=1, help='随机种子（相同种子重放相同的学生和作业序列）')
+    parser.add_argument('--output', help='把结果写成 JSON 文件')
+    parser.add_argument('--compare', help='与之前写出的 JSON 结果对比')
+    args = parser.parse_args()
+
+    with open(args.manifest, encoding='utf-8') as f:
+        manifest = json.load(f)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['scenarios']
+
+    results = Results()
+    started = time.perf_counter()
+    stop_at = started + args.duration
+    threads = [threading.Thread(target=run_user, daemon=True,
+                                args=(VirtualUser(args.url, manifest, random.Random(f'{args.seed}:{i}'), args.timeout),
+                                      results, stop_at, args.relogin, args.think_time))
+               for i in range(args.users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    summary = summarize(results, elapsed)
+    print(f'{args.users} 个并发用户，{elapsed:.1f} 秒，目标 {args.url}')
+    print_summary(summary, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'url': args.url, 'users': args.users, 'duration': round(elapsed, 1),
+                       'generated_at': manifest.get('generated_at'), 'scenarios': summary}, f, indent=2)
+        print(f'结果已写入 {args.output}')
+
+    if sum(row['requests'] for row in summary.values()) == 0 or summary['login']['requests'] == 0:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,140 @@ class Config:
     # 使用固定的密钥，避免每次重启变化
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'teaching-assistant-system-secret-key-2023'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///teaching_assistant.db'
+    # 只在压测实例上关闭（页面模板里没有 CSRF 令牌时压测脚本无法提交表单），生产环境保持开启
+    WTF_CSRF_ENABLED = os.environ.get('WTF_CSRF_ENABLED', '1') == '1'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    UPLOAD_FOLDER = 'static/uploads'
+    # 作业附件只能通过需要登录的下载路由获取，不能放在 static 下（旧数据用 flask move-uploads 迁移）
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or 'instance/uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB 文件大小限制
+
+    # 登录用户身份缓存：最多缓存的用户数和过期时间（秒）
+    IDENTITY_CACHE_SIZE = int(os.environ.get('IDENTITY_CACHE_SIZE', 10000))
+    IDENTITY_CACHE_TTL = int(os.environ.get('IDENTITY_CACHE_TTL', 300))
+
+    # 教师面板"最近作业/考试"列表显示的条数
+    DASHBOARD_RECENT_LIMIT = 5
+
+    # 分片上传：临时目录（不要放在 static 下）、单个分片大小和整个文件的大小上限
+    # 每个分片都是一个独立请求，必须小于 MAX_CONTENT_LENGTH
+    CHUNK_UPLOAD_FOLDER = os.environ.get('CHUNK_UPLOAD_FOLDER') or 'instance/chunk_uploads'
+    CHUNK_UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+    CHUNK_UPLOAD_MAX_SIZE = 200 * 1024 * 1024  # 200MB
+    CHUNK_UPLOAD_EXPIRE = 24 * 3600  # 未完成的上传保留时间（秒）
+    # 作业附件下载交给前端服务器发送：''（应用自己发送）、'x-sendfile'（Apache/lighttpd）、
+    # 'x-accel'（nginx，需要把 SUBMISSION_ACCEL_PREFIX 配置成指向 UPLOAD_FOLDER 的 internal location）
+    SUBMISSION_FILE_OFFLOAD = os.environ.get('SUBMISSION_FILE_OFFLOAD', '')
+    SUBMISSION_ACCEL_PREFIX = os.environ.get('SUBMISSION_ACCEL_PREFIX', '/protected-uploads/')
+
+    # 生成作业附件预览的后台线程数
+    DOCX_PREVIEW_WORKERS = int(os.environ.get('DOCX_PREVIEW_WORKERS', 2))
+
+    # 批量导入学生：每批插入的行数、计算密码哈希的进程数（None 表示 CPU 核数）
+    BULK_IMPORT_BATCH_SIZE = 1000
+    BULK_IMPORT_WORKERS = int(os.environ['BULK_IMPORT_WORKERS']) if os.environ.get('BULK_IMPORT_WORKERS') else None
+    # 网页导入在后台线程中执行，随机生成的初始密码暂存在这个目录，教师查看一次后删除
+    BULK_IMPORT_RESULT_DIR = os.environ.get('BULK_IMPORT_RESULT_DIR') or 'instance/import_results'
+
+    # 密码哈希参数，登录成功时旧参数的哈希会自动升级（或降级）到这里的配置
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'pbkdf2:sha256:600000'
+    # 登录密码校验线程池：线程数（None 表示 CPU 核数）、最多排队数、单次等待超时（秒）
+    PASSWORD_VERIFY_WORKERS = int(os.environ['PASSWORD_VERIFY_WORKERS']) if os.environ.get('PASSWORD_VERIFY_WORKERS') else None
+    PASSWORD_VERIFY_MAX_PENDING = int(os.environ.get('PASSWORD_VERIFY_MAX_PENDING', 64))
+    PASSWORD_VERIFY_TIMEOUT = 10
+
+    # 学院/专业目录：还没有班级时也需要出现在下拉框中的学院和专业，以及目录缓存时间（秒）
+    CATALOG_SEED = {
+        '计算机学院': ['计算机科学与技术专业', '物联网专业', '大数据专业'],
+        '人文学院': ['汉语言专业', '历史专业'],
+    }
+    CATALOG_TTL = 300
+
+    # 多选题少选（没有选错）时得到的分值比例
+    AUTO_GRADING_PARTIAL_CREDIT = 0.5
+
+    # 考试试卷预编译：编译结果目录、后台预编译的检查间隔（秒，0 表示不启动）和提前量（分钟）
+    EXAM_PAPER_CACHE_DIR = os.environ.get('EXAM_PAPER_CACHE_DIR') or 'instance/exam_papers'
+    EXAM_PAPER_PREWARM_INTERVAL = int(os.environ.get('EXAM_PAPER_PREWARM_INTERVAL', 60))
+    EXAM_PAPER_PREWARM_WINDOW = 15
+    # 同一考试每隔多少秒向数据库核对一次试卷修订号（其他进程修改试卷后，最多这么久之后生效）
+    EXAM_PAPER_CHECK_INTERVAL = float(os.environ.get('EXAM_PAPER_CHECK_INTERVAL', 1))
+
+    # 考试答案自动保存：日志目录、批量写库间隔（秒）、缓冲多少份答卷时立即写库、
+    # 每次保存是否 fsync 日志、单次保存最多的答案数
+    EXAM_AUTOSAVE_DIR = os.environ.get('EXAM_AUTOSAVE_DIR') or 'instance/autosave'
+    EXAM_AUTOSAVE_FLUSH_INTERVAL = 5
+    EXAM_AUTOSAVE_FLUSH_THRESHOLD = 500
+    EXAM_AUTOSAVE_FSYNC = True
+    EXAM_AUTOSAVE_MAX_ANSWERS = 500
+
+    # 考试到时自动交卷：每批交卷的人数、从数据库重新同步计时器的间隔（秒）、
+    # 截止后仍接受保存/交卷请求的余量（秒），到时自动交卷在余量结束后执行
+    EXAM_TIMER_BATCH_SIZE = 500
+    EXAM_TIMER_RESYNC_INTERVAL = 60
+    EXAM_SUBMIT_GRACE_SECONDS = 30
+
+    # 作业查重：相似度达到 PLAGIARISM_THRESHOLD 的配对出现在查重报告中（报告页可临时调整），
+    # 相似度低于 PLAGIARISM_MIN_SIMILARITY 的配对不保存；有效文字少于 PLAGIARISM_MIN_LENGTH 的提交不参与查重
+    PLAGIARISM_ENABLED = os.environ.get('PLAGIARISM_ENABLED', '1') == '1'
+    PLAGIARISM_THRESHOLD = float(os.environ.get('PLAGIARISM_THRESHOLD', 0.8))
+    PLAGIARISM_MIN_SIMILARITY = float(os.environ.get('PLAGIARISM_MIN_SIMILARITY', 0.5))
+    PLAGIARISM_MIN_LENGTH = int(os.environ.get('PLAGIARISM_MIN_LENGTH', 50))
+
+    # 全文检索（需要 SQLite 启用 FTS5），每页结果数
+    SEARCH_ENABLED = os.environ.get('SEARCH_ENABLED', '1') == '1'
+    SEARCH_PAGE_SIZE = int(os.environ.get('SEARCH_PAGE_SIZE', 20))
+
+    # 题库：列表每页题目数、一次最多导入的题目数
+    QUESTION_BANK_PAGE_SIZE = int(os.environ.get('QUESTION_BANK_PAGE_SIZE', 50))
+    QUESTION_BANK_MAX_IMPORT = int(os.environ.get('QUESTION_BANK_MAX_IMPORT', 5000))
+
+    # 作业批改允许的最高分
+    GRADE_MAX_SCORE = float(os.environ.get('GRADE_MAX_SCORE', 100))
+
+    # 学生端作业/考试列表片段缓存最多保存的班级数，每隔多少秒向数据库核对一次班级的修订号
+    CLASS_FRAGMENT_CACHE_SIZE = int(os.environ.get('CLASS_FRAGMENT_CACHE_SIZE', 1000))
+    CLASS_FRAGMENT_CHECK_INTERVAL = float(os.environ.get('CLASS_FRAGMENT_CHECK_INTERVAL', 1))
+
+    # 数据库引擎：SQLite 的 PRAGMA（busy_timeout 单位毫秒，cache_size 为负数时单位 KB），
+    # 连接池参数（SQLite 文件数据库只使用大小和溢出）
+    DB_SQLITE_JOURNAL_MODE = os.environ.get('DB_SQLITE_JOURNAL_MODE', 'WAL')
+    DB_SQLITE_SYNCHRONOUS = os.environ.get('DB_SQLITE_SYNCHRONOUS', 'NORMAL')
+    DB_SQLITE_BUSY_TIMEOUT = int(os.environ.get('DB_SQLITE_BUSY_TIMEOUT', 5000))
+    DB_SQLITE_CACHE_SIZE = int(os.environ.get('DB_SQLITE_CACHE_SIZE', -20000))
+    DB_SQLITE_FOREIGN_KEYS = os.environ.get('DB_SQLITE_FOREIGN_KEYS', '0') == '1'
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+    # 只读副本（可选），用 @read_only 标记的列表和统计页面从副本读取
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+    # 用户提交写入后多少秒内，其只读路由仍读主库（覆盖副本的同步延迟）
+    DB_REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', 10))
+
+    # SQL 查询分析：同一语句在一个请求中执行多少次视为 N+1 嫌疑，慢查询阈值（毫秒）和日志文件
+    # （默认不写文件；日志里的绑定参数只记录类型，不记录值），是否在响应中返回 Server-Timing 头（只在调试时开启）
+    QUERY_PROFILER_ENABLED = os.environ.get('QUERY_PROFILER_ENABLED', '1') == '1'
+    QUERY_PROFILER_N_PLUS_ONE = int(os.environ.get('QUERY_PROFILER_N_PLUS_ONE', 5))
+    QUERY_PROFILER_SLOW_MS = float(os.environ.get('QUERY_PROFILER_SLOW_MS', 100))
+    QUERY_PROFILER_SLOW_LOG = os.environ.get('QUERY_PROFILER_SLOW_LOG', '')
+    QUERY_PROFILER_SERVER_TIMING = os.environ.get('QUERY_PROFILER_SERVER_TIMING', '0') == '1'
+
+    # 请求指标：配置了令牌时 /metrics 要求 Authorization: Bearer <令牌>，否则只允许这些地址直接访问（逗号分隔）。
+    # 放在反向代理后面时请配置令牌（或用 ProxyFix 还原客户端地址），代理转发的请求来源地址是代理本身
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    METRICS_ALLOWED_IPS = os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+
+    # 静态资源指纹和预压缩（flask build-assets 生成），指纹文件的缓存时间（秒）
+    STATIC_ASSETS_ENABLED = os.environ.get('STATIC_ASSETS_ENABLED', '1') == '1'
+    STATIC_ASSETS_DIR = os.environ.get('STATIC_ASSETS_DIR', 'dist')
+    STATIC_ASSETS_MAX_AGE = int(os.environ.get('STATIC_ASSETS_MAX_AGE', 365 * 24 * 3600))
+
+    # Jinja 模板字节码缓存目录（各 worker 共享，留空则不缓存）；是否在启动时就载入全部模板
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR', 'instance/jinja_cache')
+    JINJA_PRELOAD_TEMPLATES = os.environ.get('JINJA_PRELOAD_TEMPLATES', '0') == '1'
+
+    # 后台线程（自动保存写库、到时自动交卷、试卷预编译）在进程处理第一个请求时启动，flask 命令不会启动。
+    # 关闭后自动保存只在交卷时写库、到时也不会自动交卷，只用于测试
+    BACKGROUND_WORKERS = os.environ.get('BACKGROUND_WORKERS', '1') == '1'
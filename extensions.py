@@ -1,6 +1,8 @@
 # extensions.py
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
+from services.database import RoutingSession
 
-db = SQLAlchemy()
+# 会话支持把只读请求的查询发往只读副本（见 services/database.py）
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
@@ -1,64 +1,128 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
-from flask_login import login_user, logout_user, login_required, current_user
-from app import db
-from models import User
-from forms import LoginForm, RegistrationForm
-
-auth_bp = Blueprint('auth', __name__)
-
-
-@auth_bp.route('/login', methods=['GET', 'POST'])
-def login():
-    if current_user.is_authenticated:
-        if current_user.role == 'student':
-            return redirect(url_for('student.dashboard'))
-        else:
-            return redirect(url_for('teacher.dashboard'))
-
-    form = LoginForm()
-    if form.validate_on_submit():
-        user = User.query.filter_by(username=form.username.data).first()
-        if user is None or not user.check_password(form.password.data):
-            flash('用户名或密码错误', 'danger')
-            return redirect(url_for('auth.login'))
-
-        login_user(user, remember=form.remember_me.data)
-        flash('登录成功!', 'success')
-
-        if user.role == 'student':
-            return redirect(url_for('student.dashboard'))
-        else:
-            return redirect(url_for('teacher.dashboard'))
-
-    return render_template('auth/login.html', form=form)
-
-
-@auth_bp.route('/register', methods=['GET', 'POST'])
-def register():
-    if current_user.is_authenticated:
-        return redirect(url_for('index'))
-
-    form = RegistrationForm()
-    if form.validate_on_submit():
-        user = User(
-            username=form.username.data,
-            email=form.email.data,
-            role=form.role.data
-        )
-        user.set_password(form.password.data)
-
-        db.session.add(user)
-        db.session.commit()
-
-        flash('注册成功! 请登录', 'success')
-        return redirect(url_for('auth.login'))
-
-    return render_template('auth/register.html', form=form)
-
-
-@auth_bp.route('/logout')
-@login_required
-def logout():
-    logout_user()
-    flash('您已成功退出', 'info')
-    return redirect(url_for('index'))
\ No newline at end of file
+# 表单定义
+# 学院用文本框（前端从 /catalog 做级联选择），专业、班级下拉框的选项由路由按当前目录填充，
+# 这类字段关闭 validate_choice，提交后由路由自己校验。
+
+from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+from wtforms import BooleanField, DateTimeLocalField, FloatField, IntegerField, PasswordField, SelectField, \
+    StringField, SubmitField, TextAreaField
+from wtforms.validators import DataRequired, EqualTo, Length, NumberRange, Optional, Regexp, ValidationError
+
+PHONE_VALIDATOR = Regexp(r'^1\d{10}$', message='请输入 11 位手机号')
+DATETIME_FORMAT = '%Y-%m-%dT%H:%M'
+
+
+class LoginForm(FlaskForm):
+    phone = StringField('手机号', validators=[DataRequired('请输入手机号'), PHONE_VALIDATOR])
+    password = PasswordField('密码', validators=[DataRequired('请输入密码')])
+    remember_me = BooleanField('记住我')
+    submit = SubmitField('登录')
+
+
+class RegistrationForm(FlaskForm):
+    name = StringField('姓名', validators=[DataRequired('请输入姓名'), Length(max=64)])
+    phone = StringField('手机号', validators=[DataRequired('请输入手机号'), PHONE_VALIDATOR])
+    role = SelectField('身份', choices=[('student', '学生'), ('teacher', '教师')], default='student')
+    password = PasswordField('密码', validators=[DataRequired('请输入密码'), Length(min=6, message='密码至少 6 位')])
+    confirm_password = PasswordField('确认密码', validators=[
+        DataRequired('请再次输入密码'),
+        EqualTo('password', message='两次输入的密码不一致')
+    ])
+    submit = SubmitField('注册')
+
+
+class AssignmentSubmissionForm(FlaskForm):
+    text_answer = TextAreaField('文字答案', validators=[Optional()])
+    file = FileField('作业附件', validators=[FileAllowed(['docx'], '只支持 .docx 文件')])
+    submit = SubmitField('提交作业')
+
+
+class StudentProfileForm(FlaskForm):
+    name = StringField('姓名', validators=[DataRequired('请输入姓名'), Length(max=64)])
+    phone = StringField('手机号', validators=[DataRequired('请输入手机号'), PHONE_VALIDATOR])
+    student_id = StringField('学号', validators=[DataRequired('请输入学号'), Length(max=20)])
+    college = StringField('学院', validators=[DataRequired('请选择学院')])
+    major = SelectField('专业', choices=[], validators=[DataRequired('请选择专业')], validate_choice=False)
+    class_name = SelectField('班级', choices=[], validators=[DataRequired('请选择班级')], validate_choice=False)
+    submit = SubmitField('保存')
+
+    _user_id = None
+
+    def set_user_id(self, user_id):
+        """手机号、学号查重时排除当前用户自己"""
+        self._user_id = user_id
+
+    def _taken(self, field_name, value):
+        from models import User
+        query = User.query.filter(getattr(User, field_name) == value)
+        if self._user_id is not None:
+            query = query.filter(User.id != self._user_id)
+        return query.first() is not None
+
+    def validate_phone(self, field):
+        if self._taken('phone', field.data):
+            raise ValidationError('手机号已被其他账号使用')
+
+    def validate_student_id(self, field):
+        if self._taken('student_id', field.data):
+            raise ValidationError('学号已被其他账号使用')
+
+
+class StudentInfoForm(FlaskForm):
+    college = StringField('学院', validators=[DataRequired('请选择学院')])
+    major = StringField('专业', validators=[DataRequired('请选择专业')])
+    class_id = SelectField('班级', choices=[], coerce=int, validators=[DataRequired('请选择班级')],
+                           validate_choice=False)
+    submit = SubmitField('保存修改')
+
+
+class AssignmentForm(FlaskForm):
+    title = StringField('作业标题', validators=[DataRequired('请输入作业标题'), Length(max=200)])
+    description = TextAreaField('作业要求', validators=[Optional()])
+    deadline = DateTimeLocalField('截止时间', format=DATETIME_FORMAT, validators=[DataRequired('请选择截止时间')])
+    class_id = SelectField('班级', coerce=int, validators=[DataRequired('请选择班级')])
+    submit = SubmitField('布置作业')
+
+
+class ExamForm(FlaskForm):
+    title = StringField('考试名称', validators=[DataRequired('请输入考试名称'), Length(max=200)])
+    description = TextAreaField('考试说明', validators=[Optional()])
+    start_time = DateTimeLocalField('开始时间', format=DATETIME_FORMAT, validators=[DataRequired('请选择开始时间')])
+    end_time = DateTimeLocalField('结束时间', format=DATETIME_FORMAT, validators=[DataRequired('请选择结束时间')])
+    duration = IntegerField('考试时长（分钟）', validators=[DataRequired('请输入考试时长'), NumberRange(min=1, max=600)])
+    class_id = SelectField('班级', coerce=int, validators=[DataRequired('请选择班级')])
+    submit = SubmitField('创建考试')
+
+    def validate_end_time(self, field):
+        if self.start_time.data and field.data and field.data <= self.start_time.data:
+            raise ValidationError('结束时间必须晚于开始时间')
+
+
+class QuestionForm(FlaskForm):
+    question_type = SelectField('题型', choices=[
+        ('single_choice', '单选题'),
+        ('multiple_choice', '多选题'),
+        ('judge', '判断题'),
+        ('short_answer', '简答题'),
+    ])
+    content = TextAreaField('题目内容', validators=[DataRequired('请输入题目内容')])
+    options = TextAreaField('选项（每行一个）', validators=[Optional()])
+    answer = StringField('答案', validators=[Optional(), Length(max=200)])
+    score = FloatField('分值', default=2.0, validators=[DataRequired('请输入分值'), NumberRange(min=0)])
+    submit = SubmitField('添加题目')
+
+
+class ClassInfoForm(FlaskForm):
+    college = StringField('学院', validators=[DataRequired('请输入学院'), Length(max=64)])
+    major = SelectField('专业', choices=[], validators=[DataRequired('请选择专业')], validate_choice=False)
+    class_name = StringField('班级', validators=[DataRequired('请输入班级名称'), Length(max=64)])
+    description = TextAreaField('班级描述', validators=[Optional(), Length(max=200)])
+    submit = SubmitField('创建班级')
+
+
+class StudentImportForm(FlaskForm):
+    file = FileField('学生名单文件', validators=[
+        FileRequired('请选择要导入的文件'),
+        FileAllowed(['csv', 'xlsx'], '只支持 .csv 和 .xlsx 文件')
+    ])
+    submit = SubmitField('开始导入')
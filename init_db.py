@@ -1,10 +1,11 @@
-from app import app
+from app import create_app
 from extensions import db
 from models import User, ClassInfo
 from datetime import datetime
 
 
 def init_database():
+    app = create_app()
     with app.app_context():
         # 删除所有表并重新创建
         db.drop_all()
@@ -1,29 +1,281 @@
 # 定义数据库模型
 
-from app import db, login_manager
+from datetime import datetime
+
+from extensions import db
+from flask import current_app
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 
 class User(UserMixin, db.Model):
+    # 学生名单按 (class_id, student_id) 做游标分页，需要复合索引支撑
+    __table_args__ = (
+        db.Index('ix_user_role_class_student', 'role', 'class_id', 'student_id', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(64), unique=True, index=True)
-    password_hash = db.Column(db.String(128))
+    name = db.Column(db.String(64))
+    phone = db.Column(db.String(20), unique=True, index=True)  # 登录账号
+    password_hash = db.Column(db.String(256))
     role = db.Column(db.String(10))  # 'student' or 'teacher'
-    class_id = db.Column(db.Integer, db.ForeignKey('class.id'))
+    student_id = db.Column(db.String(20), unique=True)  # 学号，教师为空
+    college = db.Column(db.String(64))
+    major = db.Column(db.String(64))
+    class_id = db.Column(db.Integer, db.ForeignKey('class_info.id'))
+
+    class_info = db.relationship('ClassInfo')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        method = current_app.config.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+        self.password_hash = generate_password_hash(password, method)
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
-class Class(db.Model):
+
+class ClassInfo(db.Model):
+    __tablename__ = 'class_info'
+    __table_args__ = (
+        db.UniqueConstraint('college', 'major', 'class_name', name='uq_class_info_name'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    college = db.Column(db.String(64), nullable=False)
+    major = db.Column(db.String(64), nullable=False)
+    class_name = db.Column(db.String(64), nullable=False)
+    description = db.Column(db.String(200))
+    # 学生端列表修订号：班级的作业、考试每次增删改都在同一事务里加一，缓存的列表片段据此判断是否过期
+    feed_revision = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+
+class Assignment(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    deadline = db.Column(db.DateTime, nullable=False)
+    class_id = db.Column(db.Integer, db.ForeignKey('class_info.id'), index=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
+
+
+class AssignmentQuestion(db.Model):
+    __tablename__ = 'assignment_question'
+
+    id = db.Column(db.Integer, primary_key=True)
+    assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), index=True)
+    content = db.Column(db.Text, nullable=False)
+
+
+class AssignmentSubmission(db.Model):
+    __tablename__ = 'assignment_submission'
+    __table_args__ = (
+        db.Index('ix_assignment_submission_student', 'assignment_id', 'student_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    text_answer = db.Column(db.Text)
+    file_path = db.Column(db.String(256))
+    submitted_at = db.Column(db.DateTime)
+    graded = db.Column(db.Boolean, nullable=False, default=False)
+    score = db.Column(db.Float)
+
+    assignment = db.relationship('Assignment')
+
+
+class Exam(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+    duration = db.Column(db.Integer, nullable=False)  # 分钟
+    class_id = db.Column(db.Integer, db.ForeignKey('class_info.id'), index=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
+    # 试卷修订号：考试信息、题目或试卷变体每次修改都在同一事务里加一，编译好的试卷据此判断是否过期
+    paper_revision = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+
+class ExamQuestion(db.Model):
+    __tablename__ = 'exam_question'
+
+    id = db.Column(db.Integer, primary_key=True)
+    exam_id = db.Column(db.Integer, db.ForeignKey('exam.id'), index=True)
+    question_type = db.Column(db.String(20), nullable=False)  # single_choice / multiple_choice / judge / short_answer
+    content = db.Column(db.Text, nullable=False)
+    options = db.Column(db.Text)  # JSON
+    answer = db.Column(db.String(200))
+    score = db.Column(db.Float, default=2.0)
+
+
+class ExamSubmission(db.Model):
+    __tablename__ = 'exam_submission'
+    __table_args__ = (
+        db.UniqueConstraint('exam_id', 'student_id', name='uq_exam_submission_student'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    exam_id = db.Column(db.Integer, db.ForeignKey('exam.id'), nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    answers = db.Column(db.Text)  # JSON：{题目 ID: 答案}
+    answer_times = db.Column(db.Text)  # JSON：{题目 ID: 保存时间戳}，不同进程的保存按时间先后合并
+    score = db.Column(db.Float)  # 总分 = 客观题得分 + 主观题得分
+    objective_score = db.Column(db.Float)  # 自动评分写入，重新评分只改这一项
+    subjective_score = db.Column(db.Float)  # 教师手动批改写入
+    graded = db.Column(db.Boolean, nullable=False, default=False)
+    submitted_at = db.Column(db.DateTime)  # 为空表示还在作答
+    # 自动保存、到时交卷和手动交卷可能在不同进程同时改写答案，版本号不一致时提交失败（StaleDataError）
+    version = db.Column(db.Integer, nullable=False)
+
+    __mapper_args__ = {'version_id_col': version}
+
+
+# 用户加载回调统一在 app.py 中注册（带身份缓存），这里不再重复注册
+
+# 教师面板计数器，在创建作业/考试和学生提交时增量维护
+class TeacherStats(db.Model):
+    __tablename__ = 'teacher_stats'
+
+    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    active_assignments = db.Column(db.Integer, nullable=False, default=0)  # 未截止的作业数
+    next_deadline = db.Column(db.DateTime)  # 最近一个未截止作业的截止时间，过了之后需要重算
+    upcoming_exams = db.Column(db.Integer, nullable=False, default=0)  # 未开始的考试数
+    next_exam_start = db.Column(db.DateTime)  # 最近一场未开始考试的开始时间
+    ungraded_submissions = db.Column(db.Integer, nullable=False, default=0)  # 待批改的作业提交数
+    refreshed_at = db.Column(db.DateTime)
+
+
+# 作业提交附件（.docx）的文本和 HTML 预览，由后台线程生成
+class SubmissionPreview(db.Model):
+    __tablename__ = 'submission_preview'
+
+    submission_id = db.Column(db.Integer, db.ForeignKey('assignment_submission.id'), primary_key=True)
+    file_path = db.Column(db.String(256))  # 生成预览时的附件路径，附件更换后需要重新生成
+    status = db.Column(db.String(10), nullable=False, default='pending')  # pending / ready / failed
+    text = db.Column(db.Text)
+    html = db.Column(db.Text)
+    error = db.Column(db.String(256))
+    updated_at = db.Column(db.DateTime)
+
+
+# 后台批量导入学生的任务。导入报告（不含密码）以 JSON 保存在 report 中，
+# 随机生成的初始密码只写在 BULK_IMPORT_RESULT_DIR 下的文件里，教师查看一次后删除
+class ImportJob(db.Model):
+    __tablename__ = 'import_job'
+
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(64), unique=True)
-    students = db.relationship('User', backref='class_ref', lazy='dynamic')
+    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    filename = db.Column(db.String(256))
+    status = db.Column(db.String(10), nullable=False, default='pending')  # pending / running / done / failed
+    total = db.Column(db.Integer, nullable=False, default=0)
+    report = db.Column(db.Text)  # JSON
+    error = db.Column(db.String(256))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+
+# 学生的考试记录：开始时间和个人截止时间（开始时间 + 考试时长，不超过考试结束时间）
+class ExamAttempt(db.Model):
+    __tablename__ = 'exam_attempt'
+    __table_args__ = (
+        db.UniqueConstraint('exam_id', 'student_id', name='uq_exam_attempt_student'),
+        db.Index('ix_exam_attempt_open', 'finalized_at', 'deadline'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    exam_id = db.Column(db.Integer, db.ForeignKey('exam.id'), nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    started_at = db.Column(db.DateTime, nullable=False)
+    deadline = db.Column(db.DateTime, nullable=False)
+    finalized_at = db.Column(db.DateTime)  # 交卷（手动或到时自动）的时间
+
+
+# 作业查重索引：每份提交的 MinHash 签名
+class SubmissionSignature(db.Model):
+    __tablename__ = 'submission_signature'
+
+    submission_id = db.Column(db.Integer, db.ForeignKey('assignment_submission.id'), primary_key=True)
+    assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), index=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    signature = db.Column(db.LargeBinary, nullable=False)
+
+
+# 作业查重索引：LSH 分桶，(band, bucket) 相同的提交互为候选
+class SignatureBand(db.Model):
+    __tablename__ = 'signature_band'
+
+    band = db.Column(db.SmallInteger, primary_key=True)
+    bucket = db.Column(db.BigInteger, primary_key=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey('assignment_submission.id'), primary_key=True, index=True)
+
+
+# 查重发现的相似提交
+class SimilarPair(db.Model):
+    __tablename__ = 'similar_pair'
+
+    id = db.Column(db.Integer, primary_key=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey('assignment_submission.id'), index=True)
+    assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), index=True)
+    other_submission_id = db.Column(db.Integer, db.ForeignKey('assignment_submission.id'), index=True)
+    other_assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), index=True)
+    similarity = db.Column(db.Float, nullable=False)
+    detected_at = db.Column(db.DateTime)
+
+
+# 题库：可在多场考试中复用的题目，按知识点 / 难度 / 题型打标签
+class BankQuestion(db.Model):
+    __tablename__ = 'question_bank'
+    __table_args__ = (
+        # 组卷时按标签取题目 ID，索引包含 id，查询只读索引
+        db.Index('ix_question_bank_tags', 'knowledge_point', 'difficulty', 'question_type', 'id'),
+        db.Index('ix_question_bank_difficulty', 'difficulty', 'question_type', 'id'),
+        db.Index('ix_question_bank_type', 'question_type', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
+    question_type = db.Column(db.String(20), nullable=False)
+    knowledge_point = db.Column(db.String(100))
+    difficulty = db.Column(db.SmallInteger, nullable=False, default=2)  # 1 简单 2 中等 3 困难
+    content = db.Column(db.Text, nullable=False)
+    options = db.Column(db.Text)  # JSON
+    answer = db.Column(db.String(200))
+    score = db.Column(db.Float, default=2.0)
+    content_hash = db.Column(db.String(40), unique=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# 学生的试卷变体：该学生需要作答的考试题目 ID（按组卷方案从题库抽取），student_id 为空的是默认变体
+class PaperVariant(db.Model):
+    __tablename__ = 'paper_variant'
+    __table_args__ = (db.UniqueConstraint('exam_id', 'student_id', name='uq_paper_variant_exam_student'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    exam_id = db.Column(db.Integer, db.ForeignKey('exam.id'), nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    seed = db.Column(db.String(64))
+    question_ids = db.Column(db.Text, nullable=False)  # JSON
+
+
+# 班级成绩累计统计：每个 (作业/考试, 班级) 一行，批改时增量更新
+class GradeAggregate(db.Model):
+    __tablename__ = 'grade_aggregate'
+
+    kind = db.Column(db.String(10), primary_key=True)  # assignment / exam
+    item_id = db.Column(db.Integer, primary_key=True)
+    class_id = db.Column(db.Integer, db.ForeignKey('class_info.id'), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0.0)
+    total_sq = db.Column(db.Float, nullable=False, default=0.0)  # 平方和，用来算标准差
+    updated_at = db.Column(db.DateTime)
+
 
-# 其他模型类似，根据上述设计创建
+# 班级成绩分数计数：每个 (作业/考试, 班级, round(分数 / 0.5)) 一行，用来算百分位数和分数分布
+class GradeCount(db.Model):
+    __tablename__ = 'grade_count'
 
-@login_manager.user_loader
-def load_user(id):
-    return User.query.get(int(id))
\ No newline at end of file
+    kind = db.Column(db.String(10), primary_key=True)
+    item_id = db.Column(db.Integer, primary_key=True)
+    class_id = db.Column(db.Integer, db.ForeignKey('class_info.id'), primary_key=True)
+    score_key = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
@@ -1,15 +1 @@
-# 初始化Flask应用
-
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from flask_login import LoginManager
-
-app = Flask(__name__)
-app.config.from_object('config.Config')
-
-db = SQLAlchemy(app)
-
-login_manager = LoginManager(app)
-login_manager.login_view = 'login'
-
-from app import routes
+# 路由蓝图：auth、student、teacher，由 app.create_app() 注册
@@ -3,6 +3,8 @@ from flask_login import login_user, logout_user, login_required, current_user
 from extensions import db
 from models import User  # 只导入User，不导入Class
 from forms import LoginForm, RegistrationForm
+from services.identity_cache import identity_cache
+from services.password_pool import password_verifier, VerifierOverloaded
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -22,11 +24,21 @@ def login():
         # 查找用户
         user = User.query.filter_by(phone=form.phone.data).first()
 
-        # 检查用户是否存在且密码正确
-        if user is None or not user.check_password(form.password.data):
+        # 检查用户是否存在且密码正确（密码校验在受限的线程池中执行）
+        try:
+            valid = user is not None and password_verifier.verify(user.password_hash, form.password.data)
+        except VerifierOverloaded:
+            flash('当前登录人数较多，请稍后再试', 'warning')
+            return render_template('auth/login.html', form=form), 503, {'Retry-After': '5'}
+
+        if not valid:
             flash('手机号或密码错误', 'danger')
             return render_template('auth/login.html', form=form)
 
+        # 哈希参数与当前配置不一致时顺便升级
+        if password_verifier.upgrade(user, form.password.data):
+            db.session.commit()
+
         # 登录用户
         login_user(user, remember=form.remember_me.data)
         flash('登录成功!', 'success')
@@ -75,6 +87,8 @@ def register():
 
             db.session.add(user)
             db.session.commit()
+            # 清掉该 ID 可能残留的旧快照（例如数据库重建后 ID 被复用）
+            identity_cache.invalidate(user.id)
 
             flash('注册成功! 请登录', 'success')
             return redirect(url_for('auth.login'))
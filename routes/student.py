@@ -1,12 +1,25 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app, Response, \
+    abort
 from flask_login import login_required, current_user
 from extensions import db
 from models import Assignment, AssignmentSubmission, Exam, ExamSubmission, ClassInfo, User
 from forms import AssignmentSubmissionForm, StudentProfileForm
+import json
 import os
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
 from models import User  # 假设User模型有college、major、class_id字段
 from forms import StudentInfoForm
+from services import chunked_upload, grade_stats, submission_files, teacher_stats
+from services.catalog import catalog
+from services.database import read_only
+from services.class_feed import class_feed
+from services.docx_preview import preview_worker
+from services.autosave import apply_answers, autosave_buffer
+from services.exam_paper import paper_cache
+from services.exam_timer import claim_attempt, exam_timer
+from services.identity_cache import identity_cache
+from services.metrics import io_timer
 
 
 student_bp = Blueprint('student', __name__)
@@ -14,29 +27,31 @@ student_bp = Blueprint('student', __name__)
 
 @student_bp.route('/dashboard')
 @login_required
+@read_only
 def dashboard():
     if current_user.role != 'student':
         flash('无权访问学生面板', 'danger')
         return redirect(url_for('index'))
 
-    # 获取学生的作业和考试信息
-    assignments = Assignment.query.filter_by(class_id=current_user.class_id).all()
-    exams = Exam.query.filter_by(class_id=current_user.class_id).all()
+    # 获取学生的作业和考试信息（全班共用部分来自缓存，每次只查询本人的提交状态）
+    items = class_feed(current_user.class_id, current_user.id)
 
     return render_template('student/dashboard.html',
-                           assignments=assignments,
-                           exams=exams)
+                           assignments=[item for item in items if item[0]['kind'] == 'assignment'],
+                           exams=[item for item in items if item[0]['kind'] == 'exam'],
+                           now=datetime.now())
 
 
 @student_bp.route('/assignments')
 @login_required
+@read_only
 def assignments():
     if current_user.role != 'student':
         flash('无权访问学生面板', 'danger')
         return redirect(url_for('index'))
 
-    assignments = Assignment.query.filter_by(class_id=current_user.class_id).all()
-    return render_template('student/assignments.html', assignments=assignments)
+    assignments = class_feed(current_user.class_id, current_user.id, kind='assignment')
+    return render_template('student/assignments.html', assignments=assignments, now=datetime.now())
 
 
 @student_bp.route('/assignment/<int:assignment_id>', methods=['GET', 'POST'])
@@ -57,30 +72,19 @@ def assignment_detail(assignment_id):
         # 处理文件上传
         file_path = None
         if form.file.data:
-            filename = f"assignment_{assignment_id}_student_{current_user.id}_{datetime.now().strftime('%Y%m%d%H%M%S')}.docx"
-            file_path = os.path.join('static/uploads/assignments', filename)
-            form.file.data.save(file_path)
+            file_path = _submission_file_path(assignment_id)
+            with io_timer():
+                form.file.data.save(file_path)
 
         if submission:
-            # 更新现有提交
-            submission.text_answer = form.text_answer.data
-            submission.file_path = file_path if file_path else submission.file_path
-            submission.submitted_at = datetime.utcnow()
-            submission.graded = False
             flash('作业已更新!', 'success')
         else:
-            # 创建新提交
-            submission = AssignmentSubmission(
-                assignment_id=assignment_id,
-                student_id=current_user.id,
-                text_answer=form.text_answer.data,
-                file_path=file_path,
-                submitted_at=datetime.utcnow()
-            )
-            db.session.add(submission)
             flash('作业提交成功!', 'success')
+        submission = _save_submission(assignment, submission, form.text_answer.data, file_path)
 
         db.session.commit()
+        # 附件预览和查重索引在后台生成，不阻塞本次请求
+        preview_worker.schedule(submission.id)
         return redirect(url_for('student.assignment_detail', assignment_id=assignment_id))
 
     return render_template('student/assignment_detail.html',
@@ -89,8 +93,172 @@ def assignment_detail(assignment_id):
                            form=form)
 
 
+def _submission_file_path(assignment_id):
+    filename = f"assignment_{assignment_id}_student_{current_user.id}_{datetime.now().strftime('%Y%m%d%H%M%S')}.docx"
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], 'assignments', filename)
+
+
+def _save_submission(assignment, submission, text_answer, file_path):
+    """创建或更新当前学生的作业提交（不提交事务），返回提交记录"""
+    if submission:
+        # 更新现有提交（已批改的作业重新提交后回到待批改状态，原成绩移出班级统计）
+        if submission.graded:
+            teacher_stats.ungraded_changed(assignment.teacher_id, 1)
+            grade_stats.record_changes('assignment', assignment.id, assignment.class_id, [(submission.score, None)])
+        if text_answer is not None:
+            submission.text_answer = text_answer
+        submission.file_path = file_path if file_path else submission.file_path
+        submission.submitted_at = datetime.utcnow()
+        submission.graded = False
+    else:
+        # 创建新提交
+        submission = AssignmentSubmission(
+            assignment_id=assignment.id,
+            student_id=current_user.id,
+            text_answer=text_answer,
+            file_path=file_path,
+            submitted_at=datetime.utcnow()
+        )
+        db.session.add(submission)
+        teacher_stats.ungraded_changed(assignment.teacher_id, 1)
+    return submission
+
+
+# 下载自己提交的附件（支持断点续传）
+@student_bp.route('/assignment/<int:assignment_id>/file')
+@login_required
+def submission_file(assignment_id):
+    if current_user.role != 'student':
+        flash('无权访问学生面板', 'danger')
+        return redirect(url_for('index'))
+
+    submission = AssignmentSubmission.query.filter_by(
+        assignment_id=assignment_id,
+        student_id=current_user.id
+    ).first_or_404()
+    extension = os.path.splitext(submission.file_path or '')[1]
+    download_name = submission_files.archive_name(current_user.student_id, current_user.id, extension, set())
+    response = submission_files.send_submission_file(submission.file_path, download_name)
+    if response is None:
+        abort(404)
+    return response
+
+
+# 分片上传：创建上传会话
+@student_bp.route('/assignment/<int:assignment_id>/upload', methods=['POST'])
+@login_required
+def start_upload(assignment_id):
+    if current_user.role != 'student':
+        return jsonify({'error': '无权访问'}), 403
+
+    Assignment.query.get_or_404(assignment_id)
+    data = request.get_json(silent=True) or {}
+    filename = str(data.get('filename') or '')
+    if not filename.lower().endswith('.docx'):
+        return jsonify({'error': '只能上传 .docx 文件'}), 400
+
+    try:
+        manifest = chunked_upload.create_session(
+            current_app.config['CHUNK_UPLOAD_FOLDER'],
+            owner_id=current_user.id,
+            assignment_id=assignment_id,
+            filename=filename,
+            total_size=int(data.get('size') or 0),
+            chunk_size=current_app.config['CHUNK_UPLOAD_CHUNK_SIZE'],
+            max_size=current_app.config['CHUNK_UPLOAD_MAX_SIZE']
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'upload_id': manifest['upload_id'],
+        'chunk_size': manifest['chunk_size'],
+        'total_chunks': manifest['total_chunks']
+    }), 201
+
+
+def _load_own_upload(upload_id):
+    manifest = chunked_upload.load_session(current_app.config['CHUNK_UPLOAD_FOLDER'], upload_id)
+    if manifest is None or manifest['owner_id'] != current_user.id:
+        return None
+    return manifest
+
+
+# 分片上传：查询已收到的分片，用于断点续传
+@student_bp.route('/upload/<upload_id>')
+@login_required
+def upload_status(upload_id):
+    manifest = _load_own_upload(upload_id)
+    if manifest is None:
+        return jsonify({'error': '上传会话不存在或已过期'}), 404
+
+    return jsonify({
+        'upload_id': upload_id,
+        'chunk_size': manifest['chunk_size'],
+        'total_chunks': manifest['total_chunks'],
+        'received': chunked_upload.received_chunks(current_app.config['CHUNK_UPLOAD_FOLDER'], manifest)
+    })
+
+
+# 分片上传：上传单个分片，请求体为分片原始内容，X-Chunk-SHA256 头为分片校验值
+@student_bp.route('/upload/<upload_id>/chunks/<int:index>', methods=['PUT'])
+@login_required
+def upload_chunk(upload_id, index):
+    manifest = _load_own_upload(upload_id)
+    if manifest is None:
+        return jsonify({'error': '上传会话不存在或已过期'}), 404
+
+    checksum = request.headers.get('X-Chunk-SHA256')
+    if not checksum:
+        return jsonify({'error': '缺少分片校验值'}), 400
+
+    try:
+        with io_timer():
+            digest = chunked_upload.write_chunk(
+                current_app.config['CHUNK_UPLOAD_FOLDER'], manifest, index, request.stream, checksum
+            )
+    except chunked_upload.ChunkUploadError as e:
+        return jsonify({'error': str(e)}), 422
+
+    return jsonify({'index': index, 'sha256': digest})
+
+
+# 分片上传：所有分片到齐后拼接文件并保存作业提交
+@student_bp.route('/upload/<upload_id>/complete', methods=['POST'])
+@login_required
+def complete_upload(upload_id):
+    manifest = _load_own_upload(upload_id)
+    if manifest is None:
+        return jsonify({'error': '上传会话不存在或已过期'}), 404
+
+    assignment = Assignment.query.get_or_404(manifest['assignment_id'])
+    file_path = _submission_file_path(assignment.id)
+    try:
+        with io_timer():
+            file_sha256 = chunked_upload.assemble(current_app.config['CHUNK_UPLOAD_FOLDER'], manifest, file_path)
+    except chunked_upload.ChunkUploadError as e:
+        return jsonify({'error': str(e)}), 409
+
+    data = request.get_json(silent=True) or {}
+    submission = AssignmentSubmission.query.filter_by(
+        assignment_id=assignment.id,
+        student_id=current_user.id
+    ).first()
+    submission = _save_submission(assignment, submission, data.get('text_answer'), file_path)
+
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'提交失败: {str(e)}'}), 500
+
+    preview_worker.schedule(submission.id)
+    return jsonify({'submission_id': submission.id, 'sha256': file_sha256})
+
+
 @student_bp.route('/grades')
 @login_required
+@read_only
 def grades():
     if current_user.role != 'student':
         flash('无权访问学生面板', 'danger')
@@ -105,13 +273,14 @@ def grades():
 
 @student_bp.route('/exams')
 @login_required
+@read_only
 def exams():
     if current_user.role != 'student':
         flash('无权访问学生面板', 'danger')
         return redirect(url_for('index'))
 
-    exams = Exam.query.filter_by(class_id=current_user.class_id).all()
-    return render_template('student/exams.html', exams=exams)
+    exams = class_feed(current_user.class_id, current_user.id, kind='exam')
+    return render_template('student/exams.html', exams=exams, now=datetime.now())
 
 
 @student_bp.route('/exam/<int:exam_id>')
@@ -125,6 +294,140 @@ def exam_detail(exam_id):
     return render_template('student/exam_detail.html', exam=exam)
 
 
+# 考试试卷（JSON）：来自预编译缓存，按学生打乱题目顺序，不查询数据库
+@student_bp.route('/exam/<int:exam_id>/paper')
+@login_required
+def exam_paper(exam_id):
+    if current_user.role != 'student':
+        return jsonify({'error': '无权访问'}), 403
+
+    paper, error = _open_exam_paper(exam_id)
+    if error:
+        return error
+
+    # 第一次打开试卷即开始计时，之后的请求直接使用内存中的截止时间
+    deadline = exam_timer.start_attempt(paper, current_user.id)
+    if datetime.now() > deadline:
+        return jsonify({'error': '考试时间已到'}), 403
+
+    response = Response(paper.render_for(current_user.id, current_app.config['SECRET_KEY']),
+                        mimetype='application/json')
+    response.headers['X-Exam-Deadline'] = deadline.isoformat()
+    response.set_etag(f'{paper.version}-{current_user.id}')
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def _open_exam_paper(exam_id):
+    """返回 (试卷, 错误响应)，用预编译试卷检查班级和考试时间，不查询数据库"""
+    paper = paper_cache.get(exam_id)
+    if paper is None:
+        return None, (jsonify({'error': '考试不存在'}), 404)
+    if paper.class_id != current_user.class_id:
+        return None, (jsonify({'error': '不是本班的考试'}), 403)
+    if not paper.is_open():
+        return None, (jsonify({'error': '不在考试时间内'}), 403)
+    return paper, None
+
+
+def _past_deadline(paper):
+    # 个人截止时间（第一次访问时会创建考试记录），留一点网络延迟的余量
+    deadline = exam_timer.start_attempt(paper, current_user.id)
+    grace = timedelta(seconds=current_app.config['EXAM_SUBMIT_GRACE_SECONDS'])
+    return datetime.now() > deadline + grace
+
+
+def _answers_from_request(paper):
+    """返回 (答案, 错误响应)；请求中没有答案或格式不正确时答案为 None。
+    答案只能针对该学生试卷（变体）中的题目"""
+    data = request.get_json(silent=True) or {}
+    answers = data.get('answers')
+    if not isinstance(answers, dict) or len(answers) > current_app.config['EXAM_AUTOSAVE_MAX_ANSWERS']:
+        return None, None
+    allowed = paper.question_ids_for(current_user.id)
+    unknown = [key for key in answers if str(key) not in allowed]
+    if unknown:
+        return None, (jsonify({'error': '答案中有不属于本试卷的题目', 'questions': unknown[:20]}), 400)
+    return answers, None
+
+
+# 考试答案自动保存：只写入缓冲区和日志，由后台批量写库
+@student_bp.route('/exam/<int:exam_id>/autosave', methods=['POST'])
+@login_required
+def exam_autosave(exam_id):
+    if current_user.role != 'student':
+        return jsonify({'error': '无权访问'}), 403
+
+    paper, error = _open_exam_paper(exam_id)
+    if error:
+        return error
+
+    if _past_deadline(paper):
+        return jsonify({'error': '考试时间已到，试卷已自动提交'}), 403
+    # 已交卷（或正在到时交卷）的答卷不再接受保存
+    if not exam_timer.is_open(exam_id, current_user.id):
+        return jsonify({'error': '已经交卷'}), 409
+
+    answers, error = _answers_from_request(paper)
+    if error:
+        return error
+    if answers is None:
+        return jsonify({'error': '答案格式不正确'}), 400
+
+    autosave_buffer.save(exam_id, current_user.id, answers)
+    return jsonify({'saved': len(answers)})
+
+
+# 交卷：合并缓冲区中的答案后立即写库
+@student_bp.route('/exam/<int:exam_id>/submit', methods=['POST'])
+@login_required
+def submit_exam(exam_id):
+    if current_user.role != 'student':
+        return jsonify({'error': '无权访问'}), 403
+
+    paper, error = _open_exam_paper(exam_id)
+    if error:
+        return error
+
+    if _past_deadline(paper):
+        return jsonify({'error': '考试时间已到，试卷已自动提交'}), 403
+
+    answers, error = _answers_from_request(paper)
+    if error:
+        return error
+    if answers is None:
+        answers = {}
+
+    # 先认领考试记录，与到时交卷（可能在其他进程）之间只有一方成功
+    if not claim_attempt(exam_id, current_user.id, datetime.now()):
+        db.session.rollback()
+        exam_timer.cancel(exam_id, current_user.id)
+        return jsonify({'error': '已经交卷'}), 409
+
+    buffered = autosave_buffer.take(exam_id, current_user.id)
+    submission = ExamSubmission.query.filter_by(exam_id=exam_id, student_id=current_user.id).first()
+    if submission is None:
+        submission = ExamSubmission(exam_id=exam_id, student_id=current_user.id, answers='{}')
+        db.session.add(submission)
+
+    # 交卷请求中的答案最新，覆盖之前的自动保存
+    submitted_at = time.time()
+    apply_answers(submission, buffered)
+    apply_answers(submission, {str(k): (v, submitted_at) for k, v in answers.items()})
+    submission.submitted_at = datetime.utcnow()
+
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        autosave_buffer.restore(exam_id, current_user.id, buffered)
+        return jsonify({'error': f'交卷失败: {str(e)}'}), 500
+
+    exam_timer.cancel(exam_id, current_user.id)
+    return jsonify({'submitted': True, 'answers': len(json.loads(submission.answers))})
+
+
 @student_bp.route('/profile', methods=['GET', 'POST'])
 @login_required
 def profile():
@@ -134,34 +437,25 @@ def profile():
 
     form = StudentProfileForm()
 
-    # 设置专业选项的初始值
-    if current_user.class_info and current_user.class_info.college:
-        form.college.data = current_user.class_info.college
-        if current_user.class_info.college == '计算机学院':
-            form.major.choices = [
-                ('', '请选择专业'),
-                ('计算机科学与技术专业', '计算机科学与技术专业'),
-                ('物联网专业', '物联网专业'),
-                ('大数据专业', '大数据专业')
-            ]
-        else:
-            form.major.choices = [
-                ('', '请选择专业'),
-                ('汉语言专业', '汉语言专业'),
-                ('历史专业', '历史专业')
-            ]
-        form.major.data = current_user.class_info.major if current_user.class_info else ''
+    # 专业、班级选项来自内存中的学院/专业/班级目录：提交时按提交的学院和专业，否则按学生当前的班级
+    if request.method == 'POST':
+        college, major = form.college.data, form.major.data
+    elif current_user.class_info:
+        college, major = current_user.class_info.college, current_user.class_info.major
+    else:
+        college, major = '', ''
+
+    if college:
+        form.major.choices = [('', '请选择专业')] + [(m['id'], m['name']) for m in catalog.majors(college)]
     else:
-        form.college.data = ''
         form.major.choices = [('', '请先选择学院')]
 
-    # 设置班级选项
-    form.class_name.choices = [
-        ('', '请选择班级'),
-        ('1班', '1班'),
-        ('2班', '2班'),
-        ('3班', '3班')
-    ]
+    if college and major:
+        form.class_name.choices = [('', '请选择班级')] + [
+            (c['name'], c['name']) for c in catalog.classes(college, major)
+        ]
+    else:
+        form.class_name.choices = [('', '请先选择专业')]
 
     # 设置表单初始值
     if request.method == 'GET':
@@ -195,15 +489,22 @@ def profile():
             )
             db.session.add(class_info)
             db.session.flush()  # 获取ID但不提交事务
+            created_class = True
+        else:
+            created_class = False
 
-        # 更新用户信息
-        current_user.name = form.name.data
-        current_user.phone = form.phone.data
-        current_user.student_id = form.student_id.data
-        current_user.class_id = class_info.id
+        # 更新用户信息（current_user 是缓存快照，需要修改数据库中的用户对象）
+        user = User.query.get(current_user.id)
+        user.name = form.name.data
+        user.phone = form.phone.data
+        user.student_id = form.student_id.data
+        user.class_id = class_info.id
 
         try:
             db.session.commit()
+            identity_cache.invalidate(user.id)
+            if created_class:
+                catalog.invalidate()
             flash('个人信息更新成功!', 'success')
             return redirect(url_for('student.profile'))
         except Exception as e:
@@ -230,10 +531,7 @@ def edit_info():
         # 班级选项需关联ClassInfo（根据当前班级ID回显）
         if current_user.class_id:
             form.class_id.choices = [
-                (c.id, c.class_name) for c in ClassInfo.query.filter_by(
-                    college=current_user.college,
-                    major=current_user.major
-                ).all()
+                (c['id'], c['name']) for c in catalog.classes(current_user.college, current_user.major)
             ]
             form.class_id.data = current_user.class_id
 
@@ -254,13 +552,15 @@ def edit_info():
             flash('所选班级与学院/专业不匹配', 'danger')
             return render_template('student/edit_info.html', form=form)
 
-        # 更新用户信息
-        current_user.college = college
-        current_user.major = major
-        current_user.class_id = class_id
+        # 更新用户信息（current_user 是缓存快照，需要修改数据库中的用户对象）
+        user = User.query.get(current_user.id)
+        user.college = college
+        user.major = major
+        user.class_id = class_id
 
         try:
             db.session.commit()
+            identity_cache.invalidate(user.id)
             flash('学院、专业、班级修改成功', 'success')
             return redirect(url_for('student.edit_info'))  # 重定向刷新页面
         except Exception as e:
@@ -277,17 +577,8 @@ def get_majors(college):
     if current_user.role != 'student':
         return jsonify({'majors': []}), 403  # 拒绝非学生访问
 
-    # 与教师创建班级时的专业逻辑保持一致（可抽为公共函数）
-    if college == '计算机学院':
-        majors = [{'id': '计算机科学与技术专业', 'name': '计算机科学与技术专业'},
-                  {'id': '物联网专业', 'name': '物联网专业'},
-                  {'id': '大数据专业', 'name': '大数据专业'}]
-    elif college == '人文学院':
-        majors = [{'id': '汉语言专业', 'name': '汉语言专业'},
-                  {'id': '历史专业', 'name': '历史专业'}]
-    else:
-        majors = []
-    return jsonify({'majors': majors})
+    # 与教师创建班级时使用同一份目录
+    return catalog.json_response(lambda tree: {'majors': catalog.majors(college, tree)})
 
 
 # 动态加载班级（根据学院和专业）
@@ -297,7 +588,5 @@ def get_classes(college, major):
     if current_user.role != 'student':
         return jsonify({'classes': []}), 403  # 拒绝非学生访问
 
-    # 从ClassInfo中查询对应学院和专业的班级
-    classes = ClassInfo.query.filter_by(college=college, major=major).all()
-    class_list = [{'id': c.id, 'name': c.class_name} for c in classes]
-    return jsonify({'classes': class_list})
\ No newline at end of file
+    # 班级列表来自内存中的目录，不查询数据库
+    return catalog.json_response(lambda tree: {'classes': catalog.classes(college, major, tree)})
\ No newline at end of file
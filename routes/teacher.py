@@ -1,9 +1,19 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app, \
+    Response, stream_with_context, abort, make_response
 from flask_login import login_required, current_user
 from extensions import db
-from models import User, ClassInfo, Assignment, AssignmentSubmission, Exam, ExamQuestion, AssignmentQuestion
-from forms import AssignmentForm, ExamForm, QuestionForm, ClassInfoForm
+from models import User, ClassInfo, Assignment, AssignmentSubmission, Exam, ExamQuestion, AssignmentQuestion, \
+    BankQuestion, ExamSubmission, ImportJob
+from forms import AssignmentForm, ExamForm, QuestionForm, ClassInfoForm, StudentImportForm
+from services import auto_grading, bulk_import, grade_stats, gradebook, plagiarism, question_bank, roster, \
+    submission_files, teacher_stats
+from services.streaming import attachment_headers, iter_csv, iter_xlsx
+from services.catalog import catalog
+from services.database import read_only
+from services.docx_preview import preview_worker
+from services.search import search_index, DOC_TYPE_LABELS
 import json
+import os
 from datetime import datetime
 
 teacher_bp = Blueprint('teacher', __name__)
@@ -16,30 +26,129 @@ def dashboard():
         flash('无权访问教师面板', 'danger')
         return redirect(url_for('index'))
 
-    # 获取教师相关的统计信息
-    classes = ClassInfo.query.all()
-    assignments = Assignment.query.filter_by(teacher_id=current_user.id).all()
-    exams = Exam.query.filter_by(teacher_id=current_user.id).all()
+    # 获取教师相关的统计信息：计数来自维护好的计数器和分组聚合，列表只取最近几条
+    recent_limit = current_app.config.get('DASHBOARD_RECENT_LIMIT', 5)
+    counters = teacher_stats.get_counters(current_user.id)
+    class_summary = teacher_stats.class_summary(current_user.id)
+    class_count = db.session.query(db.func.count(ClassInfo.id)).scalar()
+
+    assignments = Assignment.query.filter_by(teacher_id=current_user.id)\
+        .order_by(Assignment.id.desc())\
+        .limit(recent_limit)\
+        .all()
+    exams = Exam.query.filter_by(teacher_id=current_user.id)\
+        .order_by(Exam.id.desc())\
+        .limit(recent_limit)\
+        .all()
 
     return render_template('teacher/dashboard.html',
-                           classes=classes,
+                           counters=counters,
+                           class_summary=class_summary,
+                           class_count=class_count,
+                           assignment_count=sum(c['assignment_count'] for c in class_summary),
+                           exam_count=sum(c['exam_count'] for c in class_summary),
                            assignments=assignments,
                            exams=exams)
 
 
 @teacher_bp.route('/students')
 @login_required
+@read_only
 def students():
     if current_user.role != 'teacher':
         flash('无权访问此页面', 'danger')
         return redirect(url_for('index'))
 
-    students = User.query.filter_by(role='student').all()
-    return render_template('teacher/students.html', students=students)
+    filters = _roster_filters()
+    students, next_cursor = roster.fetch_page(
+        cursor=request.args.get('cursor'),
+        limit=request.args.get('limit', type=int),
+        **filters
+    )
+    return render_template('teacher/students.html',
+                           students=students,
+                           next_cursor=next_cursor,
+                           filters=filters)
+
+
+# 学生名单 JSON 接口，供前端滚动加载
+@teacher_bp.route('/api/students')
+@login_required
+@read_only
+def students_api():
+    if current_user.role != 'teacher':
+        return jsonify({'students': []}), 403
+
+    students, next_cursor = roster.fetch_page(
+        cursor=request.args.get('cursor'),
+        limit=request.args.get('limit', type=int),
+        **_roster_filters()
+    )
+    return jsonify({
+        'students': [roster.serialize_student(s) for s in students],
+        'next_cursor': next_cursor
+    })
+
+
+def _roster_filters():
+    return {
+        'college': request.args.get('college') or None,
+        'major': request.args.get('major') or None,
+        'class_id': request.args.get('class_id', type=int),
+    }
+
+
+# 批量导入学生（CSV / XLSX）
+@teacher_bp.route('/students/import', methods=['GET', 'POST'])
+@login_required
+def import_students():
+    if current_user.role != 'teacher':
+        flash('无权访问此页面', 'danger')
+        return redirect(url_for('index'))
+
+    form = StudentImportForm()
+
+    if form.validate_on_submit():
+        try:
+            rows = bulk_import.read_rows(form.file.data.stream, form.file.data.filename)
+        except bulk_import.ImportFileError as e:
+            flash(str(e), 'danger')
+            return render_template('teacher/import_students.html', form=form, job=None, report=None)
+
+        # 校验、哈希和写库在后台线程中进行，跳转到任务页查看进度
+        job_id = bulk_import.import_worker.submit(current_user.id, form.file.data.filename, rows)
+        flash(f'已开始导入 {len(rows)} 行，完成后本页显示导入结果', 'info')
+        return redirect(url_for('teacher.import_job', job_id=job_id))
+
+    return render_template('teacher/import_students.html', form=form, job=None, report=None)
+
+
+# 批量导入任务的进度和结果，随机生成的初始密码只在完成后第一次打开时显示
+@teacher_bp.route('/students/import/<int:job_id>')
+@login_required
+def import_job(job_id):
+    if current_user.role != 'teacher':
+        flash('无权访问此页面', 'danger')
+        return redirect(url_for('index'))
+
+    job = ImportJob.query.get_or_404(job_id)
+    if job.teacher_id != current_user.id:
+        abort(404)
+
+    report = json.loads(job.report) if job.report else None
+    if report is not None:
+        report['generated_passwords'] = bulk_import.import_worker.take_passwords(job.id)
+
+    response = make_response(render_template('teacher/import_students.html', form=StudentImportForm(),
+                                             job=job, report=report))
+    # 页面上可能有初始密码，进行中的页面也会自动刷新，都不允许缓存
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
 
 @teacher_bp.route('/classes')
 @login_required
+@read_only
 def classes():
     if current_user.role != 'teacher':
         flash('无权访问此页面', 'danger')
@@ -81,6 +190,7 @@ def create_class():
 
         db.session.add(class_info)
         db.session.commit()
+        catalog.invalidate()
 
         flash('班级创建成功!', 'success')
         return redirect(url_for('teacher.classes'))
@@ -90,40 +200,29 @@ def create_class():
 
 @teacher_bp.route('/class/<int:class_id>/students')
 @login_required
+@read_only
 def class_students(class_id):
     if current_user.role != 'teacher':
         flash('无权访问此页面', 'danger')
         return redirect(url_for('index'))
 
     class_info = ClassInfo.query.get_or_404(class_id)
-    students = User.query.filter_by(
-        role='student',
+    students, next_cursor = roster.fetch_page(
+        cursor=request.args.get('cursor'),
+        limit=request.args.get('limit', type=int),
         class_id=class_id
-    ).order_by(User.student_id).all()
+    )
 
     return render_template('teacher/class_students.html',
                            class_info=class_info,
-                           students=students)
+                           students=students,
+                           next_cursor=next_cursor)
 
 
 @teacher_bp.route('/get_majors/<college>')
 @login_required
 def get_majors(college):
-    if college == '计算机学院':
-        majors = [
-            {'id': '计算机科学与技术专业', 'name': '计算机科学与技术专业'},
-            {'id': '物联网专业', 'name': '物联网专业'},
-            {'id': '大数据专业', 'name': '大数据专业'}
-        ]
-    elif college == '人文学院':
-        majors = [
-            {'id': '汉语言专业', 'name': '汉语言专业'},
-            {'id': '历史专业', 'name': '历史专业'}
-        ]
-    else:
-        majors = []
-
-    return jsonify({'majors': majors})
+    return catalog.json_response(lambda tree: {'majors': catalog.majors(college, tree)})
 
 
 @teacher_bp.route('/assignment/create', methods=['GET', 'POST'])
@@ -145,6 +244,7 @@ def create_assignment():
             teacher_id=current_user.id
         )
         db.session.add(assignment)
+        teacher_stats.assignment_created(assignment)
         db.session.commit()
 
         flash('作业创建成功!', 'success')
@@ -156,6 +256,7 @@ def create_assignment():
 # 作业列表端点（已补充）
 @teacher_bp.route('/assignments')
 @login_required
+@read_only
 def assignments():
     if current_user.role != 'teacher':
         flash('无权访问此页面', 'danger')
@@ -192,6 +293,7 @@ def create_exam():
             teacher_id=current_user.id
         )
         db.session.add(exam)
+        teacher_stats.exam_created(exam)
         db.session.commit()
 
         flash('考试创建成功!', 'success')
@@ -203,6 +305,7 @@ def create_exam():
 # 新增：考试列表端点（补充 teacher.exams）
 @teacher_bp.route('/exams')
 @login_required
+@read_only
 def exams():
     if current_user.role != 'teacher':
         flash('无权访问此页面', 'danger')
@@ -218,4 +321,415 @@ def exams():
     return render_template('teacher/exams.html', exams=teacher_exams)
 
 
+# 客观题自动评分（单选、多选、判断），整场考试一次完成
+@teacher_bp.route('/exam/<int:exam_id>/grade', methods=['POST'])
+@login_required
+def grade_exam(exam_id):
+    if current_user.role != 'teacher':
+        flash('无权访问此页面', 'danger')
+        return redirect(url_for('index'))
+
+    exam = Exam.query.get_or_404(exam_id)
+    if exam.teacher_id != current_user.id:
+        flash('只能批改自己创建的考试', 'danger')
+        return redirect(url_for('teacher.exams'))
+
+    result = auto_grading.grade_exam(exam_id, current_app.config['AUTO_GRADING_PARTIAL_CREDIT'])
+    if not result['questions']:
+        flash('这场考试没有可以自动评分的客观题', 'warning')
+        return redirect(url_for('teacher.exams'))
+    message = f"已自动评分 {result['submissions']} 份已交答卷，平均分 {result['average']}"
+    if result['skipped_questions']:
+        message += f"，另有 {result['skipped_questions']} 道主观题需要手动批改"
+    flash(message, 'success')
+    return redirect(url_for('teacher.exams'))
+
+
+# 批改考试答卷的主观题（表单或 JSON 字段 score），总分 = 自动评分的客观题得分 + 主观题得分
+@teacher_bp.route('/exam-submission/<int:submission_id>/grade', methods=['POST'])
+@login_required
+def grade_exam_submission(submission_id):
+    if current_user.role != 'teacher':
+        return jsonify({'error': '无权访问'}), 403
+
+    submission = ExamSubmission.query.get_or_404(submission_id)
+    exam = Exam.query.get(submission.exam_id)
+    if exam is None or exam.teacher_id != current_user.id:
+        return jsonify({'error': '无权批改该答卷'}), 403
+    if submission.submitted_at is None:
+        return jsonify({'error': '答卷尚未提交'}), 400
+
+    data = request.get_json(silent=True) or request.form
+    try:
+        subjective_score = float(data.get('score'))
+    except (TypeError, ValueError):
+        return jsonify({'error': '分数格式不正确'}), 400
+    if not 0 <= subjective_score <= current_app.config['GRADE_MAX_SCORE']:
+        return jsonify({'error': f"分数必须在 0 到 {current_app.config['GRADE_MAX_SCORE']} 之间"}), 400
+
+    # 之前没有批改完成的答卷（只有客观题得分）不在班级统计中
+    old_score = submission.score if submission.graded else None
+    submission.subjective_score = subjective_score
+    submission.score = round((submission.objective_score or 0) + subjective_score, 2)
+    submission.graded = True
+    grade_stats.record_changes('exam', exam.id, exam.class_id, [(old_score, submission.score)])
+    db.session.commit()
+
+    return jsonify({'submission_id': submission.id, 'objective_score': submission.objective_score,
+                    'subjective_score': subjective_score, 'score': submission.score})
+
+
+# 题库列表（JSON），可按知识点 / 难度 / 题型筛选，按 ID 游标分页
+@teacher_bp.route('/api/question-bank')
+@login_required
+@read_only
+def question_bank_api():
+    if current_user.role != 'teacher':
+        return jsonify({'questions': []}), 403
+
+    limit = min(request.args.get('limit', current_app.config['QUESTION_BANK_PAGE_SIZE'], type=int), 200)
+    query = BankQuestion.query
+    if request.args.get('knowledge_point'):
+        query = query.filter(BankQuestion.knowledge_point == request.args['knowledge_point'])
+    if request.args.get('difficulty'):
+        query = query.filter(BankQuestion.difficulty == question_bank.parse_difficulty(request.args['difficulty']))
+    if request.args.get('type'):
+        query = query.filter(BankQuestion.question_type == request.args['type'])
+    after_id = request.args.get('after_id', type=int)
+    if after_id:
+        query = query.filter(BankQuestion.id > after_id)
+
+    questions = query.order_by(BankQuestion.id).limit(limit).all()
+    return jsonify({
+        'questions': [{
+            'id': q.id,
+            'question_type': q.question_type,
+            'knowledge_point': q.knowledge_point,
+            'difficulty': question_bank.DIFFICULTY_LABELS.get(q.difficulty),
+            'content': q.content,
+            'options': json.loads(q.options) if q.options else None,
+            'answer': q.answer,
+            'score': q.score
+        } for q in questions],
+        'next_after_id': questions[-1].id if len(questions) == limit else None
+    })
+
+
+# 批量加入题库（JSON：{"questions": [{question_type, content, options, answer, score, knowledge_point, difficulty}]}）
+@teacher_bp.route('/question-bank/import', methods=['POST'])
+@login_required
+def import_bank_questions():
+    if current_user.role != 'teacher':
+        return jsonify({'error': '无权访问'}), 403
+
+    rows = (request.get_json(silent=True) or {}).get('questions')
+    if not isinstance(rows, list) or not rows:
+        return jsonify({'error': '没有题目'}), 400
+    if len(rows) > current_app.config['QUESTION_BANK_MAX_IMPORT']:
+        return jsonify({'error': f"一次最多导入 {current_app.config['QUESTION_BANK_MAX_IMPORT']} 道题"}), 400
+    for i, row in enumerate(rows, start=1):
+        if not isinstance(row, dict) or not row.get('question_type') or not row.get('content'):
+            return jsonify({'error': f'第 {i} 道题缺少题型或题干'}), 400
+
+    created, duplicates = question_bank.add_questions(rows, current_user.id)
+    return jsonify({'created': created, 'duplicates': duplicates})
+
+
+# 按组卷方案从题库出题（JSON：{"blueprint": [...], "seed": ..., "per_student": true}）
+# per_student 为 true 时为考试班级的每个学生生成一份变体
+@teacher_bp.route('/exam/<int:exam_id>/generate', methods=['POST'])
+@login_required
+def generate_exam_paper(exam_id):
+    if current_user.role != 'teacher':
+        return jsonify({'error': '无权访问'}), 403
+
+    exam = Exam.query.get_or_404(exam_id)
+    if exam.teacher_id != current_user.id:
+        return jsonify({'error': '只能为自己创建的考试出题'}), 403
+
+    data = request.get_json(silent=True) or {}
+    seed = data.get('seed') or f'{exam_id}-{datetime.utcnow().timestamp()}'
+    student_ids = None
+    if data.get('per_student'):
+        student_ids = [row.id for row in User.query.with_entities(User.id)
+                       .filter(User.role == 'student', User.class_id == exam.class_id)]
+    try:
+        blueprint = question_bank.parse_blueprint(data.get('blueprint'))
+        result = question_bank.build_exam_from_bank(exam_id, blueprint, seed, student_ids)
+    except question_bank.BlueprintError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify(dict(result, seed=str(seed)))
+
+
+# 批改作业提交（表单或 JSON 字段 score），同时更新待批改计数和班级成绩统计
+@teacher_bp.route('/submission/<int:submission_id>/grade', methods=['POST'])
+@login_required
+def grade_submission(submission_id):
+    if current_user.role != 'teacher':
+        return jsonify({'error': '无权访问'}), 403
+
+    submission = AssignmentSubmission.query.get_or_404(submission_id)
+    assignment = Assignment.query.get(submission.assignment_id)
+    if assignment is None or assignment.teacher_id != current_user.id:
+        return jsonify({'error': '无权批改该提交'}), 403
+
+    data = request.get_json(silent=True) or request.form
+    try:
+        score = float(data.get('score'))
+    except (TypeError, ValueError):
+        return jsonify({'error': '分数格式不正确'}), 400
+    if not 0 <= score <= current_app.config['GRADE_MAX_SCORE']:
+        return jsonify({'error': f"分数必须在 0 到 {current_app.config['GRADE_MAX_SCORE']} 之间"}), 400
+
+    old_score = submission.score if submission.graded else None
+    if not submission.graded:
+        teacher_stats.ungraded_changed(current_user.id, -1)
+    submission.score = score
+    submission.graded = True
+    grade_stats.record_changes('assignment', assignment.id, assignment.class_id, [(old_score, score)])
+    db.session.commit()
+
+    return jsonify({'submission_id': submission.id, 'score': score})
+
+
+# 成绩统计：各作业/考试按班级的平均分、标准差、百分位数和分数分布（只读预先累计的统计）
+@teacher_bp.route('/analytics')
+@login_required
+@read_only
+def analytics():
+    if current_user.role != 'teacher':
+        flash('无权访问此页面', 'danger')
+        return redirect(url_for('index'))
+
+    return render_template('teacher/analytics.html', rows=grade_stats.teacher_analytics(current_user.id))
+
+# 作业附件预览（批改页面通过该接口加载，预览未生成时返回 202，前端稍后重试）
+@teacher_bp.route('/submission/<int:submission_id>/preview')
+@login_required
+def submission_preview(submission_id):
+    if current_user.role != 'teacher':
+        return jsonify({'error': '无权访问'}), 403
+
+    submission = AssignmentSubmission.query.get_or_404(submission_id)
+    assignment = Assignment.query.get(submission.assignment_id)
+    if assignment is None or assignment.teacher_id != current_user.id:
+        return jsonify({'error': '无权查看该提交'}), 403
+
+    if not submission.file_path:
+        return jsonify({'status': 'none', 'text_answer': submission.text_answer})
+
+    preview = preview_worker.get_preview(submission)
+    if preview is None:
+        return jsonify({'status': 'pending'}), 202
+
+    return jsonify({
+        'status': preview.status,
+        'html': preview.html,
+        'error': preview.error,
+        'text_answer': submission.text_answer
+    })
+
+
+
+# 作业查重报告：直接读取提交时增量计算好的相似配对
+@teacher_bp.route('/assignment/<int:assignment_id>/similarity')
+@login_required
+def assignment_similarity(assignment_id):
+    if current_user.role != 'teacher':
+        return jsonify({'error': '无权访问'}), 403
+
+    assignment = Assignment.query.get_or_404(assignment_id)
+    if assignment.teacher_id != current_user.id:
+        return jsonify({'error': '无权查看该作业'}), 403
+
+    threshold = request.args.get('threshold', current_app.config['PLAGIARISM_THRESHOLD'], type=float)
+    threshold = max(current_app.config['PLAGIARISM_MIN_SIMILARITY'], min(threshold, 1.0))
+    pairs = plagiarism.similar_pairs(assignment_id, threshold)
+
+    submission_ids = {p.submission_id for p in pairs} | {p.other_submission_id for p in pairs}
+    rows = db.session.query(AssignmentSubmission.id, AssignmentSubmission.assignment_id,
+                            User.student_id, User.name)\
+        .join(User, User.id == AssignmentSubmission.student_id)\
+        .filter(AssignmentSubmission.id.in_(submission_ids)).all() if submission_ids else []
+    owners = {row.id: {'submission_id': row.id, 'assignment_id': row.assignment_id,
+                       'student_id': row.student_id, 'name': row.name} for row in rows}
+
+    return jsonify({
+        'assignment_id': assignment_id,
+        'threshold': threshold,
+        'pairs': [{
+            'similarity': p.similarity,
+            'submission': owners.get(p.submission_id, {'submission_id': p.submission_id}),
+            'other': owners.get(p.other_submission_id, {'submission_id': p.other_submission_id}),
+            'detected_at': p.detected_at.isoformat() if p.detected_at else None
+        } for p in pairs]
+    })
+
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def _export_response(filename, fmt, header, rows, sheet_name):
+    if fmt == 'csv':
+        body = iter_csv(header, rows)
+    else:
+        body = iter_xlsx(header, rows, sheet_name=sheet_name)
+    return Response(stream_with_context(body),
+                    mimetype=EXPORT_MIMETYPES[fmt],
+                    headers=attachment_headers(f'{filename}.{fmt}'))
+
+
+# 导出班级成绩册（学生 × 该教师的作业和考试），边查询边输出
+@teacher_bp.route('/class/<int:class_id>/gradebook.<fmt>')
+@login_required
+@read_only
+def export_gradebook(class_id, fmt):
+    if current_user.role != 'teacher':
+        flash('无权访问此页面', 'danger')
+        return redirect(url_for('index'))
+    if fmt not in EXPORT_MIMETYPES:
+        abort(404)
+
+    class_info = ClassInfo.query.get_or_404(class_id)
+    columns = gradebook.gradebook_columns(class_id, current_user.id)
+    name = f"{class_info.college}{class_info.major}{class_info.class_name}成绩册"
+
+    return _export_response(name, fmt,
+                            gradebook.gradebook_header(columns),
+                            gradebook.iter_gradebook_rows(class_id, columns),
+                            sheet_name='成绩册')
+
+
+# 导出单个作业的成绩
+@teacher_bp.route('/assignment/<int:assignment_id>/grades.<fmt>')
+@login_required
+@read_only
+def export_assignment_grades(assignment_id, fmt):
+    if current_user.role != 'teacher':
+        flash('无权访问此页面', 'danger')
+        return redirect(url_for('index'))
+    if fmt not in EXPORT_MIMETYPES:
+        abort(404)
+
+    assignment = Assignment.query.get_or_404(assignment_id)
+    if assignment.teacher_id != current_user.id:
+        flash('只能导出自己布置的作业', 'danger')
+        return redirect(url_for('teacher.assignments'))
+
+    return _export_response(f'{assignment.title}成绩', fmt,
+                            gradebook.ASSIGNMENT_HEADER,
+                            gradebook.iter_assignment_rows(assignment),
+                            sheet_name='作业成绩')
+
+
+
+# 打包下载作业的全部提交（附件按学号命名），边查询边压缩输出
+@teacher_bp.route('/assignment/<int:assignment_id>/submissions.zip')
+@login_required
+@read_only
+def download_submissions(assignment_id):
+    if current_user.role != 'teacher':
+        flash('无权访问此页面', 'danger')
+        return redirect(url_for('index'))
+
+    assignment = Assignment.query.get_or_404(assignment_id)
+    if assignment.teacher_id != current_user.id:
+        flash('只能下载自己布置的作业', 'danger')
+        return redirect(url_for('teacher.assignments'))
+
+    return Response(stream_with_context(submission_files.iter_submission_archive(assignment)),
+                    mimetype='application/zip',
+                    headers=attachment_headers(f'{assignment.title}提交.zip'))
+
+
+# 下载单个提交的附件（支持断点续传）
+@teacher_bp.route('/submission/<int:submission_id>/file')
+@login_required
+def download_submission_file(submission_id):
+    if current_user.role != 'teacher':
+        return jsonify({'error': '无权访问'}), 403
+
+    submission = AssignmentSubmission.query.get_or_404(submission_id)
+    assignment = Assignment.query.get(submission.assignment_id)
+    if assignment is None or assignment.teacher_id != current_user.id:
+        return jsonify({'error': '无权查看该提交'}), 403
+
+    student = User.query.get(submission.student_id)
+    extension = os.path.splitext(submission.file_path or '')[1]
+    download_name = submission_files.archive_name(student.student_id if student else None,
+                                                  submission.student_id, extension, set())
+    response = submission_files.send_submission_file(submission.file_path, download_name)
+    if response is None:
+        abort(404)
+    return response
+
+# 全文检索：作业、考试、题目和学生提交，只返回当前教师自己的内容
+@teacher_bp.route('/search')
+@login_required
+def search():
+    if current_user.role != 'teacher':
+        flash('无权访问此页面', 'danger')
+        return redirect(url_for('index'))
+
+    query, doc_type, page, per_page = _search_args()
+    results, total = search_index.search(query, current_user.id, doc_type, page, per_page)
+    return render_template('teacher/search.html',
+                           query=query,
+                           doc_type=doc_type,
+                           doc_types=DOC_TYPE_LABELS,
+                           results=[_search_result(r) for r in results],
+                           total=total,
+                           page=page,
+                           pages=(total + per_page - 1) // per_page,
+                           available=search_index.available)
+
+
+@teacher_bp.route('/api/search')
+@login_required
+def search_api():
+    if current_user.role != 'teacher':
+        return jsonify({'results': []}), 403
+
+    query, doc_type, page, per_page = _search_args()
+    results, total = search_index.search(query, current_user.id, doc_type, page, per_page)
+    return jsonify({
+        'results': [_search_result(r) for r in results],
+        'total': total,
+        'page': page,
+        'per_page': per_page
+    })
+
+
+def _search_args():
+    per_page = min(request.args.get('per_page', current_app.config['SEARCH_PAGE_SIZE'], type=int), 100)
+    return (request.args.get('q', '').strip(),
+            request.args.get('type') or None,
+            max(request.args.get('page', 1, type=int), 1),
+            max(per_page, 1))
+
+
+def _search_result(row):
+    # 提交链接到附件预览，其余链接到所属的作业/考试列表
+    if row['doc_type'] == 'submission':
+        url = url_for('teacher.submission_preview', submission_id=row['doc_id'])
+    elif row['doc_type'] in ('exam', 'exam_question'):
+        url = url_for('teacher.exams')
+    else:
+        url = url_for('teacher.assignments')
+    return {
+        'type': row['doc_type'],
+        'type_label': DOC_TYPE_LABELS.get(row['doc_type'], row['doc_type']),
+        'id': row['doc_id'],
+        'parent_id': row['parent_id'],
+        'label': row['label'],
+        'excerpt': row['excerpt'],
+        'url': url,
+        'score': round(-row['rank'], 3)
+    }
+
+
 # 其他教师端路由（如 exam_questions 等）保持不变...
\ No newline at end of file
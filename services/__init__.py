@@ -0,0 +1 @@
+# 业务服务层：缓存、后台任务、统计等与具体路由无关的公共逻辑
@@ -0,0 +1,275 @@
+# 考试答案自动保存（写后缓冲）
+# 自动保存请求只把答案增量合并进进程内缓冲区，并追加写入日志文件；
+# 后台线程按时间间隔或缓冲区大小把缓冲区批量写入数据库，一批一个事务。
+# 同一学生的多次保存在缓冲区内合并，数据库只写最后的结果。
+# 每个答案带保存时间，答卷上也记录每道题的保存时间：多个进程的缓冲区不论谁先写库，同一道题都是较新的保存生效。
+# 进程崩溃后，启动后台线程时重放遗留的日志文件（包括接管后没处理完的日志），已确认保存的答案不会丢失。
+# 后台线程由 start() 启动（应用开始处理请求时），flask 命令只初始化配置，不会启动线程或接管日志。
+# 答卷交卷后，只合并交卷之前就已被接受、但还在其他进程缓冲区中的保存，之后的保存不再生效。
+
+import glob
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import timezone
+
+from sqlalchemy import tuple_
+
+
+# journal-<写入进程>-<随机串>.log，被接管后改名为 journal-...log.recovering-<接管进程>
+_JOURNAL_RE = re.compile(r'^(journal-(\d+)-\w+\.log)(?:\.recovering-(\d+))?$')
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class AutosaveBuffer:
+    def __init__(self, directory='instance/autosave', interval=5, threshold=500, fsync=True):
+        self.directory = directory
+        self.interval = interval
+        self.threshold = threshold
+        self.fsync = fsync
+        self._app = None
+        self._pending = {}  # (exam_id, student_id) -> {题目ID: 答案}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._journal = None
+        self._journal_path = None
+        self._old_journals = []  # 内容已取出、等待成功写库后删除的日志
+        self._thread = None
+        self.saves = 0
+        self.flushes = 0
+        self.rows_written = 0
+
+    def init_app(self, app):
+        self._app = app
+        self.directory = app.config.get('EXAM_AUTOSAVE_DIR', self.directory)
+        self.interval = app.config.get('EXAM_AUTOSAVE_FLUSH_INTERVAL', self.interval)
+        self.threshold = app.config.get('EXAM_AUTOSAVE_FLUSH_THRESHOLD', self.threshold)
+        self.fsync = app.config.get('EXAM_AUTOSAVE_FSYNC', self.fsync)
+        app.extensions['exam_autosave'] = self
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def start(self):
+        """重放遗留日志并启动写库线程（每个进程一次）"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._recover()
+            if self._journal is None:
+                self._open_journal()
+            self._thread = threading.Thread(target=self._run, name='exam-autosave-flush', daemon=True)
+        self._thread.start()
+
+    # ---- 日志 ----
+
+    def _open_journal(self):
+        self._journal_path = os.path.join(self.directory, f'journal-{os.getpid()}-{uuid.uuid4().hex[:8]}.log')
+        self._journal = open(self._journal_path, 'a', encoding='utf-8')
+
+    def _rotate_journal(self):
+        # 调用方持有 self._lock
+        if self._journal is None:
+            return
+        self._journal.close()
+        self._old_journals.append(self._journal_path)
+        self._open_journal()
+
+    def _recover(self):
+        """接管已退出进程留下的日志（以及接管后没处理完就退出的日志），把其中的答案重新放回缓冲区"""
+        for path in sorted(glob.glob(os.path.join(self.directory, 'journal-*.log*'))):
+            match = _JOURNAL_RE.match(os.path.basename(path))
+            if match is None:
+                continue
+            owner = int(match.group(3) or match.group(2))
+            if owner != os.getpid() and _pid_alive(owner):
+                continue
+
+            # 改名成功才算接管，避免多个进程同时重放同一个日志
+            claimed = os.path.join(self.directory, f'{match.group(1)}.recovering-{os.getpid()}')
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue
+
+            with open(claimed, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 崩溃时写了一半的最后一行
+                        continue
+                    self._merge(entry['e'], entry['s'], entry['a'], entry.get('t', 0))
+            self._old_journals.append(claimed)
+
+    # ---- 缓冲 ----
+
+    def _merge(self, exam_id, student_id, answers, saved_at):
+        # 调用方持有 self._lock（或还没有其他线程）；同一道题保留较新的保存
+        entries = self._pending.setdefault((exam_id, student_id), {})
+        for question_id, answer in answers.items():
+            current = entries.get(question_id)
+            if current is None or current[1] <= saved_at:
+                entries[question_id] = (answer, saved_at)
+
+    def save(self, exam_id, student_id, answers):
+        """记录一次答案增量，写入日志后返回（不访问数据库）"""
+        answers = {str(k): v for k, v in answers.items()}
+        saved_at = time.time()
+        line = json.dumps({'e': exam_id, 's': student_id, 'a': answers, 't': saved_at}, ensure_ascii=False) + '\n'
+        with self._lock:
+            if self._journal is None:
+                self._open_journal()
+            self._journal.write(line)
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            self._merge(exam_id, student_id, answers, saved_at)
+            self.saves += 1
+            full = len(self._pending) >= self.threshold
+        if full:
+            self._wakeup.set()
+
+    def take(self, exam_id, student_id):
+        """交卷时取出该学生缓冲中的答案 {题目ID: (答案, 保存时间)}，调用方用 apply_answers 写入答卷。
+        会先等待正在进行的批量写库完成，避免后台写入与交卷同时修改同一份答卷"""
+        with self._flush_lock:
+            with self._lock:
+                return self._pending.pop((exam_id, student_id), {})
+
+    def restore(self, exam_id, student_id, entries):
+        """交卷失败时放回取出的答案，缓冲区中之后保存的答案优先"""
+        with self._lock:
+            self._restore((exam_id, student_id), entries)
+
+    def _restore(self, key, entries):
+        # 调用方持有 self._lock
+        for question_id, (answer, saved_at) in entries.items():
+            self._merge(key[0], key[1], {question_id: answer}, saved_at)
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    # ---- 写库 ----
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                with self._app.app_context():
+                    self.flush()
+            except Exception:
+                self._app.logger.exception('自动保存写入数据库失败')
+
+    def flush(self):
+        """把缓冲区全部写入数据库（需要应用上下文），返回写入的答卷数"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch = self._pending
+                self._pending = {}
+                self._rotate_journal()
+                journals = list(self._old_journals)
+
+            try:
+                written = write_batch(batch)
+            except Exception:
+                # 放回缓冲区，缓冲区中更新的答案优先；旧日志保留到下次成功写库
+                with self._lock:
+                    for key, entries in batch.items():
+                        self._restore(key, entries)
+                raise
+
+            with self._lock:
+                self._old_journals = [path for path in self._old_journals if path not in journals]
+            for path in journals:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+            self.flushes += 1
+            self.rows_written += written
+            return written
+
+    def stats(self):
+        return {
+            'pending': self.pending_count(),
+            'saves': self.saves,
+            'flushes': self.flushes,
+            'rows_written': self.rows_written,
+        }
+
+
+def _timestamp(submitted_at):
+    # submitted_at 按 UTC 保存（datetime.utcnow()）
+    return submitted_at.replace(tzinfo=timezone.utc).timestamp()
+
+
+def apply_answers(submission, entries, until=None):
+    """把 {题目ID: (答案, 保存时间)} 合并进答卷：同一道题较新的保存生效，until（时间戳）之后的保存忽略。
+    返回实际更新的题数"""
+    answers = json.loads(submission.answers or '{}')
+    times = json.loads(submission.answer_times or '{}')
+    changed = 0
+    for question_id, (answer, saved_at) in entries.items():
+        if until is not None and saved_at > until:
+            continue
+        if saved_at >= times.get(question_id, 0):
+            answers[question_id] = answer
+            times[question_id] = saved_at
+            changed += 1
+    if changed:
+        submission.answers = json.dumps(answers, ensure_ascii=False)
+        submission.answer_times = json.dumps(times)
+    return changed
+
+
+def write_batch(batch):
+    """一个事务内把 {(exam_id, student_id): {题目ID: (答案, 保存时间)}} 合并写入 ExamSubmission"""
+    from extensions import db
+    from models import ExamSubmission
+
+    keys = list(batch)
+    existing = {}
+    for start in range(0, len(keys), 500):
+        chunk = keys[start:start + 500]
+        for submission in ExamSubmission.query.filter(
+                tuple_(ExamSubmission.exam_id, ExamSubmission.student_id).in_(chunk)):
+            existing[(submission.exam_id, submission.student_id)] = submission
+
+    written = 0
+    for (exam_id, student_id), entries in batch.items():
+        submission = existing.get((exam_id, student_id))
+        until = None
+        if submission is None:
+            submission = ExamSubmission(exam_id=exam_id, student_id=student_id, answers='{}')
+            db.session.add(submission)
+        elif submission.submitted_at is not None:
+            # 已交卷（可能是其他进程交的卷）：交卷前已接受的保存仍要计入，批改后不再修改
+            if submission.graded:
+                continue
+            until = _timestamp(submission.submitted_at)
+        if apply_answers(submission, entries, until):
+            written += 1
+
+    db.session.commit()
+    return written
+
+
+autosave_buffer = AutosaveBuffer()
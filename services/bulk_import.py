@@ -0,0 +1,373 @@
+# 批量导入学生
+# 逐个调用 set_password 并逐行提交时，绝大部分时间花在密码哈希上。
+# 这里先校验全部数据，再用进程池并行计算密码哈希，一次性解析/创建所需班级，
+# 最后按批次插入用户，每批一个事务。哈希进程池第一次用到时创建，之后整个进程复用。
+# 网页上传的名单由 ImportWorker 在后台线程中导入，请求只负责读取文件、创建 ImportJob 后立即返回。
+# 密码列为空的学生生成随机初始密码，写在导入报告里（只显示这一次，数据库只保存哈希）。
+
+import csv
+import io
+import json
+import multiprocessing
+import os
+import re
+import secrets
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from functools import partial
+
+from sqlalchemy import insert, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.security import generate_password_hash
+
+from extensions import db
+from models import ClassInfo, ImportJob, User
+
+# 表头（中文或英文均可）到字段名的映射
+HEADER_ALIASES = {
+    '姓名': 'name', 'name': 'name',
+    '手机号': 'phone', '手机': 'phone', 'phone': 'phone',
+    '学号': 'student_id', 'student_id': 'student_id',
+    '学院': 'college', 'college': 'college',
+    '专业': 'major', 'major': 'major',
+    '班级': 'class_name', 'class_name': 'class_name', 'class': 'class_name',
+    '密码': 'password', 'password': 'password',
+}
+REQUIRED_FIELDS = ('name', 'phone', 'student_id', 'college', 'major', 'class_name')
+
+_PHONE_RE = re.compile(r'^1\d{10}$')
+# 随机初始密码的字符集，去掉了容易看错的 0/O、1/l/I
+PASSWORD_ALPHABET = 'ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnpqrstuvwxyz23456789'
+GENERATED_PASSWORD_LENGTH = 10
+
+
+class ImportFileError(ValueError):
+    pass
+
+
+def _normalize_header(header):
+    fields = []
+    for title in header:
+        title = str(title or '').strip()
+        fields.append(HEADER_ALIASES.get(title) or HEADER_ALIASES.get(title.lower()))
+    missing = [f for f in REQUIRED_FIELDS if f not in fields]
+    if missing:
+        raise ImportFileError(f'缺少必填列: {", ".join(missing)}')
+    return fields
+
+
+def _rows_from_csv(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    yield from csv.reader(text)
+
+
+def _rows_from_xlsx(stream):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFileError('服务器未安装 openpyxl，请上传 CSV 文件')
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield ['' if value is None else str(value) for value in row]
+    finally:
+        workbook.close()
+
+
+def read_rows(stream, filename):
+    """读取导入文件，返回 [(行号, {字段: 值})]"""
+    if filename.lower().endswith('.xlsx'):
+        raw_rows = _rows_from_xlsx(stream)
+    elif filename.lower().endswith('.csv'):
+        raw_rows = _rows_from_csv(stream)
+    else:
+        raise ImportFileError('只支持 .csv 和 .xlsx 文件')
+
+    header = next(raw_rows, None)
+    if header is None:
+        raise ImportFileError('文件为空')
+    fields = _normalize_header(header)
+
+    rows = []
+    for line_no, values in enumerate(raw_rows, 2):
+        if not any(str(v).strip() for v in values):
+            continue
+        row = {}
+        for field, value in zip(fields, values):
+            if field:
+                row[field] = str(value).strip()
+        rows.append((line_no, row))
+    return rows
+
+
+def generate_password(length=GENERATED_PASSWORD_LENGTH):
+    return ''.join(secrets.choice(PASSWORD_ALPHABET) for _ in range(length))
+
+
+def _existing(column, values):
+    """分批查询数据库中已存在的值"""
+    existing = set()
+    values = list(values)
+    for start in range(0, len(values), 500):
+        existing.update(value for (value,) in db.session.query(column).filter(column.in_(values[start:start + 500])))
+    return existing
+
+
+def validate_rows(rows, min_password_length=6):
+    """校验数据，返回 (有效行, 错误列表)。手机号和学号在文件内、在数据库中都不能重复；
+    密码列为空时生成随机初始密码（行中的 generated_password 为 True）"""
+    valid = []
+    errors = []
+    seen_phones = {}
+    seen_student_ids = {}
+
+    for line_no, row in rows:
+        missing = [f for f in REQUIRED_FIELDS if not row.get(f)]
+        if missing:
+            errors.append((line_no, f'缺少: {", ".join(missing)}'))
+            continue
+        if not _PHONE_RE.match(row['phone']):
+            errors.append((line_no, f'手机号格式错误: {row["phone"]}'))
+            continue
+        if row['phone'] in seen_phones:
+            errors.append((line_no, f'手机号与第 {seen_phones[row["phone"]]} 行重复'))
+            continue
+        if row['student_id'] in seen_student_ids:
+            errors.append((line_no, f'学号与第 {seen_student_ids[row["student_id"]]} 行重复'))
+            continue
+
+        if row.get('password'):
+            row['generated_password'] = False
+            if len(row['password']) < min_password_length:
+                errors.append((line_no, f'密码至少 {min_password_length} 位'))
+                continue
+        else:
+            row['password'] = generate_password()
+            row['generated_password'] = True
+
+        seen_phones[row['phone']] = line_no
+        seen_student_ids[row['student_id']] = line_no
+        valid.append((line_no, row))
+
+    existing_phones = _existing(User.phone, seen_phones)
+    existing_student_ids = _existing(User.student_id, seen_student_ids)
+    if existing_phones or existing_student_ids:
+        remaining = []
+        for line_no, row in valid:
+            if row['phone'] in existing_phones:
+                errors.append((line_no, f'手机号已被注册: {row["phone"]}'))
+            elif row['student_id'] in existing_student_ids:
+                errors.append((line_no, f'学号已存在: {row["student_id"]}'))
+            else:
+                remaining.append((line_no, row))
+        valid = remaining
+
+    return valid, errors
+
+
+_hash_pool = None
+_hash_pool_lock = threading.Lock()
+
+
+def _get_hash_pool(workers):
+    """进程内共用的哈希进程池，第一次调用时按 workers 创建"""
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            # 用 spawn 启动子进程，避免在多线程的 Web 进程中 fork
+            _hash_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        return _hash_pool
+
+
+def hash_passwords(passwords, workers=None, method=None):
+    """在进程池中并行计算密码哈希，保持输入顺序"""
+    global _hash_pool
+    hasher = partial(generate_password_hash, method=method) if method else generate_password_hash
+    if len(passwords) < 50:
+        return [hasher(p) for p in passwords]
+
+    pool = _get_hash_pool(workers)
+    try:
+        return list(pool.map(hasher, passwords, chunksize=32))
+    except BrokenProcessPool:
+        # 子进程异常退出后进程池不能再用，丢弃后下次重新创建
+        with _hash_pool_lock:
+            if _hash_pool is pool:
+                _hash_pool = None
+        raise
+
+
+def resolve_classes(rows):
+    """一次查询找出已有班级，缺少的一次性创建，返回 {(学院, 专业, 班级): class_id} 和新建数量"""
+    keys = {(row['college'], row['major'], row['class_name']) for _, row in rows}
+    if not keys:
+        return {}, 0
+
+    class_ids = {}
+    key_list = list(keys)
+    for start in range(0, len(key_list), 500):
+        chunk = key_list[start:start + 500]
+        for c in ClassInfo.query.filter(
+                tuple_(ClassInfo.college, ClassInfo.major, ClassInfo.class_name).in_(chunk)):
+            class_ids[(c.college, c.major, c.class_name)] = c.id
+
+    new_classes = [
+        ClassInfo(college=college, major=major, class_name=class_name,
+                  description=f'{college}{major}{class_name}')
+        for college, major, class_name in keys - set(class_ids)
+    ]
+    if new_classes:
+        db.session.add_all(new_classes)
+        db.session.flush()
+        for c in new_classes:
+            class_ids[(c.college, c.major, c.class_name)] = c.id
+        db.session.commit()
+
+    return class_ids, len(new_classes)
+
+
+def import_students(rows, batch_size=1000, workers=None, hash_method=None):
+    """导入已读取的行，返回导入报告"""
+    started = time.perf_counter()
+    report = {'total': len(rows), 'created': 0, 'classes_created': 0, 'errors': [], 'generated_passwords': []}
+
+    valid, errors = validate_rows(rows)
+    report['errors'].extend(errors)
+
+    hash_started = time.perf_counter()
+    hashes = hash_passwords([row['password'] for _, row in valid], workers=workers, method=hash_method)
+    report['hash_seconds'] = round(time.perf_counter() - hash_started, 3)
+
+    class_ids, report['classes_created'] = resolve_classes(valid)
+
+    for start in range(0, len(valid), batch_size):
+        batch = valid[start:start + batch_size]
+        values = [{
+            'name': row['name'],
+            'phone': row['phone'],
+            'student_id': row['student_id'],
+            'college': row['college'],
+            'major': row['major'],
+            'class_id': class_ids[(row['college'], row['major'], row['class_name'])],
+            'role': 'student',
+            'password_hash': password_hash,
+        } for (_, row), password_hash in zip(batch, hashes[start:start + batch_size])]
+
+        try:
+            db.session.execute(insert(User), values)
+            db.session.commit()
+            report['created'] += len(values)
+            report['generated_passwords'].extend(
+                (line_no, row['student_id'], row['name'], row['password'])
+                for line_no, row in batch if row['generated_password'])
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            message = f'批量写入失败: {e.__class__.__name__}'
+            report['errors'].extend((line_no, message) for line_no, _ in batch)
+
+    report['errors'].sort()
+    report['elapsed'] = round(time.perf_counter() - started, 3)
+    report['rows_per_second'] = round(report['created'] / report['elapsed'], 1) if report['elapsed'] else 0
+    return report
+
+
+class ImportWorker:
+    """在后台线程中逐个执行网页上传的导入任务，结果写回 ImportJob"""
+
+    def __init__(self):
+        self._app = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self.result_dir = None
+
+    def init_app(self, app):
+        self._app = app
+        self.result_dir = app.config.get('BULK_IMPORT_RESULT_DIR', 'instance/import_results')
+        app.extensions['bulk_import'] = self
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # 同一进程中的导入依次执行，哈希本身已经用满了进程池
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='bulk-import')
+            return self._executor
+
+    def submit(self, teacher_id, filename, rows):
+        """创建导入任务并排队，返回任务 ID"""
+        job = ImportJob(teacher_id=teacher_id, filename=filename, total=len(rows))
+        db.session.add(job)
+        db.session.commit()
+        self._get_executor().submit(self._run, job.id, rows)
+        return job.id
+
+    def _password_path(self, job_id):
+        return os.path.join(self.result_dir, f'{job_id}.csv')
+
+    def _run(self, job_id, rows):
+        try:
+            with self._app.app_context():
+                self._import(job_id, rows)
+        except Exception:
+            self._app.logger.exception('批量导入学生失败: job=%s', job_id)
+
+    def _import(self, job_id, rows):
+        from services.catalog import catalog
+
+        config = self._app.config
+        job = ImportJob.query.get(job_id)
+        job.status = 'running'
+        db.session.commit()
+        try:
+            report = import_students(rows,
+                                     batch_size=config['BULK_IMPORT_BATCH_SIZE'],
+                                     workers=config['BULK_IMPORT_WORKERS'],
+                                     hash_method=config['PASSWORD_HASH_METHOD'])
+        except Exception as e:
+            db.session.rollback()
+            job = ImportJob.query.get(job_id)
+            job.status = 'failed'
+            job.error = f'{e.__class__.__name__}: {e}'[:256]
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            raise
+
+        if report['classes_created']:
+            catalog.invalidate()
+        passwords = report.pop('generated_passwords')
+        if passwords:
+            self._write_passwords(job_id, passwords)
+        report['generated_password_count'] = len(passwords)
+
+        job = ImportJob.query.get(job_id)
+        job.status = 'done'
+        job.report = json.dumps(report, ensure_ascii=False)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+    def _write_passwords(self, job_id, passwords):
+        os.makedirs(self.result_dir, exist_ok=True)
+        # 只有运行 Web 服务的用户可读
+        fd = os.open(self._password_path(job_id), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(fd, 'w', encoding='utf-8', newline='') as f:
+            csv.writer(f).writerows(passwords)
+
+    def take_passwords(self, job_id):
+        """读取并删除任务的随机初始密码 [(行号, 学号, 姓名, 密码)]，已经取过或没有时返回空列表"""
+        path = self._password_path(job_id)
+        # 先改名再读取，同时打开两次页面时只有一个请求能拿到
+        taken = f'{path}.{secrets.token_hex(4)}'
+        try:
+            os.rename(path, taken)
+        except FileNotFoundError:
+            return []
+        try:
+            with open(taken, encoding='utf-8', newline='') as f:
+                return [tuple(row) for row in csv.reader(f)]
+        finally:
+            os.remove(taken)
+
+
+import_worker = ImportWorker()
@@ -0,0 +1,91 @@
+# 学院 → 专业 → 班级 目录
+# 级联下拉框需要的数据全部来自这里：启动后第一次使用时从 ClassInfo 一次性加载到内存，
+# 之后的请求不再查询数据库。新建班级时显式失效；多进程部署时其他进程依靠 TTL 重新加载。
+# 配置中的 CATALOG_SEED 提供还没有任何班级的学院和专业，保证可以创建第一个班级。
+
+import hashlib
+import json
+import threading
+import time
+
+from flask import jsonify, request
+
+
+class Catalog:
+    def __init__(self, seed=None, ttl=300):
+        self.seed = seed or {}
+        self.ttl = ttl
+        # (目录树, ETag, 加载时间)，整体替换，读取方拿到的树和 ETag 总是同一次加载的结果
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.seed = app.config.get('CATALOG_SEED', self.seed)
+        self.ttl = app.config.get('CATALOG_TTL', self.ttl)
+        app.extensions['catalog'] = self
+
+    def _load(self):
+        from extensions import db
+        from models import ClassInfo
+
+        tree = {}
+        for college, majors in self.seed.items():
+            college_node = tree.setdefault(college, {})
+            for major in majors:
+                college_node.setdefault(major, [])
+
+        rows = db.session.query(ClassInfo.id, ClassInfo.college, ClassInfo.major, ClassInfo.class_name)\
+            .order_by(ClassInfo.college, ClassInfo.major, ClassInfo.class_name)\
+            .all()
+        for class_id, college, major, class_name in rows:
+            tree.setdefault(college, {}).setdefault(major, []).append({'id': class_id, 'name': class_name})
+
+        etag = hashlib.sha1(json.dumps(tree, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+        return tree, etag
+
+    def _current(self):
+        """返回 (目录树, ETag)"""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - snapshot[2] < self.ttl:
+            return snapshot[0], snapshot[1]
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or time.monotonic() - snapshot[2] >= self.ttl:
+                tree, etag = self._load()
+                snapshot = self._snapshot = (tree, etag, time.monotonic())
+            return snapshot[0], snapshot[1]
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+    @property
+    def etag(self):
+        return self._current()[1]
+
+    def tree(self):
+        return self._current()[0]
+
+    def colleges(self):
+        return [{'id': college, 'name': college} for college in self.tree()]
+
+    def majors(self, college, tree=None):
+        tree = self.tree() if tree is None else tree
+        return [{'id': major, 'name': major} for major in tree.get(college, {})]
+
+    def classes(self, college, major, tree=None):
+        tree = self.tree() if tree is None else tree
+        return list(tree.get(college, {}).get(major, []))
+
+    def json_response(self, build, max_age=60):
+        """带 ETag 和 Cache-Control 的 JSON 响应，目录没变化时返回 304。
+        build(目录树) 返回响应内容，内容和 ETag 来自同一次加载的目录"""
+        tree, etag = self._current()
+        response = jsonify(build(tree))
+        response.set_etag(etag)
+        response.cache_control.private = True
+        response.cache_control.max_age = max_age
+        return response.make_conditional(request)
+
+
+catalog = Catalog()
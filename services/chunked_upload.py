@@ -0,0 +1,177 @@
+# 分片断点续传上传
+# 每个上传会话在临时目录下有一个子目录：manifest.json 记录文件信息，
+# 每个分片单独保存为 NNNNNN.part。分片按固定大小的块流式写盘并计算 SHA-256，
+# 校验通过后才改名为正式分片，因此磁盘上存在的正式分片就是已收到的分片，
+# 中断的分片不会被当成已收到，并发上传不同分片也不需要改写 manifest。
+# 所有分片到齐后再顺序拼接成最终文件，整个过程内存占用与文件大小无关。
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+
+# 读写磁盘时每次处理的字节数
+BLOCK_SIZE = 64 * 1024
+
+_UPLOAD_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+class ChunkUploadError(ValueError):
+    pass
+
+
+def _session_dir(root, upload_id):
+    return os.path.join(root, upload_id)
+
+
+def _part_path(root, upload_id, index):
+    return os.path.join(_session_dir(root, upload_id), f'{index:06d}.part')
+
+
+def _write_manifest(root, manifest):
+    path = os.path.join(_session_dir(root, manifest['upload_id']), 'manifest.json')
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def create_session(root, owner_id, assignment_id, filename, total_size, chunk_size, max_size):
+    if total_size <= 0:
+        raise ChunkUploadError('文件大小无效')
+    if total_size > max_size:
+        raise ChunkUploadError(f'文件大小超过限制（最大 {max_size // (1024 * 1024)}MB）')
+
+    upload_id = uuid.uuid4().hex
+    os.makedirs(_session_dir(root, upload_id), exist_ok=True)
+
+    manifest = {
+        'upload_id': upload_id,
+        'owner_id': owner_id,
+        'assignment_id': assignment_id,
+        'filename': filename,
+        'total_size': total_size,
+        'chunk_size': chunk_size,
+        'total_chunks': (total_size + chunk_size - 1) // chunk_size,
+        'created_at': time.time(),
+    }
+    _write_manifest(root, manifest)
+    return manifest
+
+
+def load_session(root, upload_id):
+    """读取上传会话，ID 不合法或会话不存在时返回 None"""
+    if not _UPLOAD_ID_RE.match(upload_id or ''):
+        return None
+    try:
+        with open(os.path.join(_session_dir(root, upload_id), 'manifest.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def received_chunks(root, manifest):
+    """已完整收到的分片序号（以磁盘上的正式分片文件为准）"""
+    names = os.listdir(_session_dir(root, manifest['upload_id']))
+    return sorted(int(name[:-5]) for name in names if name.endswith('.part'))
+
+
+def _expected_length(manifest, index):
+    if index < manifest['total_chunks'] - 1:
+        return manifest['chunk_size']
+    return manifest['total_size'] - manifest['chunk_size'] * (manifest['total_chunks'] - 1)
+
+
+def write_chunk(root, manifest, index, stream, checksum):
+    """把一个分片从请求流写到磁盘，返回实际的 SHA-256"""
+    if not 0 <= index < manifest['total_chunks']:
+        raise ChunkUploadError('分片序号超出范围')
+
+    expected_length = _expected_length(manifest, index)
+    part_path = _part_path(root, manifest['upload_id'], index)
+    tmp_path = f'{part_path}.{uuid.uuid4().hex}.tmp'
+    digest = hashlib.sha256()
+    length = 0
+
+    try:
+        with open(tmp_path, 'wb') as f:
+            while True:
+                block = stream.read(BLOCK_SIZE)
+                if not block:
+                    break
+                length += len(block)
+                if length > expected_length:
+                    raise ChunkUploadError('分片大小与声明不符')
+                digest.update(block)
+                f.write(block)
+
+        if length != expected_length:
+            raise ChunkUploadError('分片不完整，请重新上传该分片')
+        if checksum and digest.hexdigest() != checksum.lower():
+            raise ChunkUploadError('分片校验失败，请重新上传该分片')
+
+        os.replace(tmp_path, part_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return digest.hexdigest()
+
+
+def assemble(root, manifest, dest_path):
+    """所有分片到齐后按顺序拼接到 dest_path，返回整个文件的 SHA-256"""
+    missing = sorted(set(range(manifest['total_chunks'])) - set(received_chunks(root, manifest)))
+    if missing:
+        raise ChunkUploadError(f'还有 {len(missing)} 个分片未上传')
+
+    upload_id = manifest['upload_id']
+    tmp_path = f'{dest_path}.{upload_id}.tmp'
+    digest = hashlib.sha256()
+
+    try:
+        with open(tmp_path, 'wb') as out:
+            for index in range(manifest['total_chunks']):
+                with open(_part_path(root, upload_id, index), 'rb') as part:
+                    while True:
+                        block = part.read(BLOCK_SIZE)
+                        if not block:
+                            break
+                        digest.update(block)
+                        out.write(block)
+
+        if os.path.getsize(tmp_path) != manifest['total_size']:
+            raise ChunkUploadError('文件大小与声明不符')
+
+        os.replace(tmp_path, dest_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    discard_session(root, upload_id)
+    return digest.hexdigest()
+
+
+def discard_session(root, upload_id):
+    shutil.rmtree(_session_dir(root, upload_id), ignore_errors=True)
+
+
+def cleanup_stale(root, max_age):
+    """删除超过 max_age 秒未完成的上传会话，返回删除的数量"""
+    if not os.path.isdir(root):
+        return 0
+
+    removed = 0
+    deadline = time.time() - max_age
+    for upload_id in os.listdir(root):
+        manifest = load_session(root, upload_id)
+        if manifest is not None:
+            created_at = manifest.get('created_at', 0)
+        else:
+            created_at = os.path.getmtime(_session_dir(root, upload_id))
+        if created_at < deadline:
+            discard_session(root, upload_id)
+            removed += 1
+    return removed
@@ -0,0 +1,198 @@
+# 学生端作业/考试列表
+# 全班相同的部分（标题、说明、时间）按班级和类别缓存：未命中时一次查询加载，渲染成 HTML 片段保存在内存中。
+# 每个请求只查询当前学生自己的提交状态（只查所需类别的提交表），与缓存的条目合并，
+# 与学生和当前时间有关的部分（是否提交、得分、是否截止）由模板现算。
+# 作业、考试增删改时在同一事务里把班级的 feed_revision 加一，事务提交后本进程的缓存立即失效；
+# 其他进程每隔 CLASS_FRAGMENT_CHECK_INTERVAL 秒向数据库核对一次修订号，不一致时重新加载。
+
+import threading
+import time
+from collections import OrderedDict
+
+# 列表中考试在前、作业在后
+KINDS = ('exam', 'assignment')
+
+
+def load_shared(class_id, kind):
+    """班级某一类条目的全班共用字段，作业按截止时间、考试按开始时间倒序"""
+    from extensions import db
+    from models import Assignment, Exam
+
+    if kind == 'assignment':
+        query = db.session.query(Assignment.id, Assignment.title, Assignment.description, Assignment.deadline)\
+            .filter(Assignment.class_id == class_id)\
+            .order_by(Assignment.deadline.desc(), Assignment.id.desc())
+        return [{'kind': kind, 'id': id_, 'title': title, 'description': description,
+                 'starts_at': None, 'ends_at': deadline, 'duration': None}
+                for id_, title, description, deadline in query]
+
+    query = db.session.query(Exam.id, Exam.title, Exam.description, Exam.start_time, Exam.end_time, Exam.duration)\
+        .filter(Exam.class_id == class_id)\
+        .order_by(Exam.start_time.desc(), Exam.id.desc())
+    return [{'kind': kind, 'id': id_, 'title': title, 'description': description,
+             'starts_at': start_time, 'ends_at': end_time, 'duration': duration}
+            for id_, title, description, start_time, end_time, duration in query]
+
+
+def load_status(class_id, student_id, kind):
+    """当前学生在班级某一类条目上的提交状态 {条目ID: (提交时间, 是否已批改, 得分)}"""
+    from extensions import db
+    from models import Assignment, AssignmentSubmission, Exam, ExamSubmission
+
+    if kind == 'assignment':
+        query = db.session.query(AssignmentSubmission.assignment_id, AssignmentSubmission.submitted_at,
+                                 AssignmentSubmission.graded, AssignmentSubmission.score)\
+            .join(Assignment, Assignment.id == AssignmentSubmission.assignment_id)\
+            .filter(AssignmentSubmission.student_id == student_id, Assignment.class_id == class_id)
+    else:
+        query = db.session.query(ExamSubmission.exam_id, ExamSubmission.submitted_at,
+                                 ExamSubmission.graded, ExamSubmission.score)\
+            .join(Exam, Exam.id == ExamSubmission.exam_id)\
+            .filter(ExamSubmission.student_id == student_id, Exam.class_id == class_id)
+    return {item_id: (submitted_at, graded, score) for item_id, submitted_at, graded, score in query}
+
+
+class FragmentCache:
+    def __init__(self, max_classes=1000, check_interval=1.0):
+        self.max_classes = max_classes
+        self.check_interval = check_interval
+        # {(班级ID, 类别): (修订号, 条目列表, {条目ID: HTML 片段})}
+        self._entries = OrderedDict()
+        # {班级ID: (数据库中的修订号, 查询时间)}
+        self._revisions = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        from sqlalchemy import event
+        from extensions import db
+        from models import Assignment, Exam
+
+        self.max_classes = app.config.get('CLASS_FRAGMENT_CACHE_SIZE', self.max_classes)
+        self.check_interval = app.config.get('CLASS_FRAGMENT_CHECK_INTERVAL', self.check_interval)
+        app.extensions['class_fragments'] = self
+
+        # 作业、考试增删改时记下班级 ID，flush 结束时在同一事务里增加修订号，提交后再让本进程的缓存失效。
+        # 监听器只注册一次，重复调用 create_app() 不会叠加
+        for model in (Assignment, Exam):
+            for name in ('after_insert', 'after_update', 'after_delete'):
+                if not event.contains(model, name, self._remember_class):
+                    event.listen(model, name, self._remember_class)
+        if not event.contains(db.session, 'after_commit', self._invalidate_changed):
+            event.listen(db.session, 'after_flush', self._bump_revisions)
+            event.listen(db.session, 'after_commit', self._invalidate_changed)
+            event.listen(db.session, 'after_rollback', self._forget_changed)
+
+    @staticmethod
+    def _remember_class(mapper, connection, target):
+        from sqlalchemy import inspect
+        from extensions import db
+
+        class_ids = db.session.info.setdefault('flushed_class_ids', set())
+        class_ids.add(target.class_id)
+        # 条目换了班级时原班级也要更新
+        class_ids.update(inspect(target).attrs.class_id.history.deleted)
+        class_ids.discard(None)
+
+    @staticmethod
+    def _bump_revisions(session, flush_context):
+        from sqlalchemy import update
+        from models import ClassInfo
+
+        class_ids = session.info.pop('flushed_class_ids', None)
+        if not class_ids:
+            return
+        table = ClassInfo.__table__
+        session.connection().execute(
+            update(table).where(table.c.id.in_(class_ids)).values(feed_revision=table.c.feed_revision + 1))
+        session.info.setdefault('changed_class_ids', set()).update(class_ids)
+
+    def _invalidate_changed(self, session):
+        for class_id in session.info.pop('changed_class_ids', ()):
+            self.invalidate(class_id)
+
+    @staticmethod
+    def _forget_changed(session):
+        session.info.pop('flushed_class_ids', None)
+        session.info.pop('changed_class_ids', None)
+
+    def _revision(self, class_id):
+        """数据库中班级的 feed_revision，同一班级每 check_interval 秒最多查询一次"""
+        now = time.monotonic()
+        checked = self._revisions.get(class_id)
+        if checked is not None and now - checked[1] < self.check_interval:
+            return checked[0]
+
+        from sqlalchemy import select
+        from extensions import db
+        from models import ClassInfo
+        revision = db.session.execute(select(ClassInfo.feed_revision).where(ClassInfo.id == class_id)).scalar()
+        self._revisions[class_id] = (revision, now)
+        return revision
+
+    def entries(self, class_id, kind, render):
+        """返回 (条目列表, {条目ID: HTML 片段})；修订号不变时直接用缓存，否则重新加载并调用 render(row) 渲染"""
+        revision = self._revision(class_id)
+        key = (class_id, kind)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == revision:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+            self.misses += 1
+
+        rows = load_shared(class_id, kind)
+        fragments = {row['id']: render(row) for row in rows}
+        with self._lock:
+            self._entries[key] = (revision, rows, fragments)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_classes * len(KINDS):
+                self._entries.popitem(last=False)
+        return rows, fragments
+
+    def invalidate(self, class_id):
+        with self._lock:
+            self._revisions.pop(class_id, None)
+            removed = [self._entries.pop((class_id, kind), None) for kind in KINDS]
+            if any(entry is not None for entry in removed):
+                self.invalidations += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_rate': round(self.hits / total, 4) if total else None,
+        }
+
+
+def render_fragment(row):
+    from flask import get_template_attribute
+
+    macro = get_template_attribute('student/_class_items.html', f"{row['kind']}_item")
+    return macro(row)
+
+
+def class_feed(class_id, student_id, kind=None):
+    """学生端列表数据：[(行, 缓存的 HTML 片段)]，kind 为 assignment / exam 时只查询和返回该类"""
+    if not class_id:
+        return []
+    items = []
+    for item_kind in ((kind,) if kind else KINDS):
+        rows, fragments = class_fragments.entries(class_id, item_kind, render_fragment)
+        if not rows:
+            continue
+        status = load_status(class_id, student_id, item_kind)
+        for row in rows:
+            submitted_at, graded, score = status.get(row['id'], (None, None, None))
+            items.append(({**row, 'submitted_at': submitted_at, 'graded': graded, 'score': score},
+                          fragments[row['id']]))
+    return items
+
+
+class_fragments = FragmentCache()
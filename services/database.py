@@ -0,0 +1,187 @@
+# 数据库引擎配置
+# SQLite：每个连接设置 WAL、busy_timeout 和 synchronous，读写可以并发，写锁冲突时等待而不是直接报
+# "database is locked"。服务器数据库（PostgreSQL / MySQL）：连接池大小、溢出、回收和 pre-ping。
+# 配置了 DATABASE_REPLICA_URL 时，用 @read_only 标记的只读路由把查询发往只读副本；
+# 请求中一旦有写入（flush 或 UPDATE/DELETE 语句），之后的查询都回到主库，保证能读到自己的写入。
+# 写入提交后还会在会话 cookie 里记下 DB_REPLICA_PIN_SECONDS 秒的期限，期限内该用户的只读路由也读主库，
+# 这样提交表单后重定向到的列表页（副本可能还没同步）也能看到刚写入的数据。
+# insert_or_ignore / insert_or_increment 生成按主库方言的冲突处理 INSERT，
+# 并发插入同一主键/唯一键时不会报 IntegrityError，计数也不需要先读后写。
+
+import time
+from functools import wraps
+
+from flask import g, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+REPLICA_BIND_KEY = 'replica'
+
+
+def engine_options(uri, config):
+    """根据数据库类型生成 create_engine 参数"""
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite':
+        # 内存数据库由 Flask-SQLAlchemy 使用单连接池，这里只处理文件数据库
+        if url.database in (None, '', ':memory:'):
+            return {}
+        return {
+            # sqlite3 的 timeout 与 busy_timeout 作用相同，连接池大小对 SQLite 也有效
+            'connect_args': {'timeout': config['DB_SQLITE_BUSY_TIMEOUT'] / 1000, 'check_same_thread': False},
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+        }
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+
+
+def configure_engines(app):
+    """在 db.init_app 之前调用：写入 SQLALCHEMY_ENGINE_OPTIONS，配置了只读副本时加入 replica 绑定"""
+    config = app.config
+    config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    for key, value in engine_options(config['SQLALCHEMY_DATABASE_URI'], config).items():
+        config['SQLALCHEMY_ENGINE_OPTIONS'].setdefault(key, value)
+
+    replica_uri = config.get('DATABASE_REPLICA_URL')
+    if replica_uri:
+        binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+        binds[REPLICA_BIND_KEY] = dict(engine_options(replica_uri, config), url=replica_uri)
+        config['SQLALCHEMY_BINDS'] = binds
+
+
+def install_sqlite_pragmas(engine, config):
+    """为 SQLite 引擎的每个新连接设置 PRAGMA（在第一次连接之前调用）"""
+    if engine.dialect.name != 'sqlite' or engine.url.database in (None, '', ':memory:'):
+        return
+
+    pragmas = [
+        f"PRAGMA journal_mode={config['DB_SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={config['DB_SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA busy_timeout={int(config['DB_SQLITE_BUSY_TIMEOUT'])}",
+        f"PRAGMA cache_size={int(config['DB_SQLITE_CACHE_SIZE'])}",
+        'PRAGMA foreign_keys=ON' if config['DB_SQLITE_FOREIGN_KEYS'] else 'PRAGMA foreign_keys=OFF',
+    ]
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def init_engines(app, db):
+    """在 db.init_app 之后调用"""
+    with app.app_context():
+        for engine in db.engines.values():
+            install_sqlite_pragmas(engine, app.config)
+
+    if app.config.get('DATABASE_REPLICA_URL'):
+        app.extensions['db_replica_pin_seconds'] = app.config.get('DB_REPLICA_PIN_SECONDS', 10)
+        # 监听器只注册一次，重复调用 create_app() 不会叠加
+        if not event.contains(db.session, 'after_commit', _remember_commit):
+            event.listen(db.session, 'after_flush', _mark_written)
+            event.listen(db.session, 'do_orm_execute', _mark_dml)
+            event.listen(db.session, 'after_commit', _remember_commit)
+            event.listen(db.session, 'after_rollback', _forget_written)
+        app.after_request(_pin_to_primary)
+
+
+def _mark_written(session_, flush_context):
+    session_.info['db_written'] = True
+
+
+def _mark_dml(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['db_written'] = True
+
+
+def _remember_commit(session_):
+    if session_.info.pop('db_written', False) and has_request_context():
+        g.db_committed_write = True
+
+
+def _forget_written(session_):
+    session_.info.pop('db_written', None)
+
+
+def _pin_to_primary(response):
+    if g.get('db_committed_write'):
+        from flask import current_app
+        session['db_primary_until'] = int(time.time()) + current_app.extensions['db_replica_pin_seconds']
+    return response
+
+
+def read_only(view):
+    """标记只读路由：配置了只读副本时，本次请求的查询发往副本（用户刚写入过数据时仍读主库）"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if session.get('db_primary_until', 0) <= time.time():
+            g.db_read_only = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+class RoutingSession(Session):
+    """只读请求中的查询使用 replica 绑定，写入和写入之后的查询使用主库"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._use_replica(clause):
+            replica = self._db.engines.get(REPLICA_BIND_KEY)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _use_replica(self, clause):
+        if not (has_request_context() and g.get('db_read_only')):
+            return False
+        if self.info.get('db_wrote'):
+            return False
+        if self._flushing or self.new or self.dirty or self.deleted or getattr(clause, 'is_dml', False):
+            self.info['db_wrote'] = True
+            return False
+        return True
+
+
+def _dialect_insert(table):
+    from extensions import db
+
+    name = db.engine.dialect.name
+    if name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif name in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert
+    else:
+        raise NotImplementedError(f'不支持的数据库: {name}')
+    return name, insert(table)
+
+
+def insert_or_ignore(table, conflict_columns):
+    """INSERT 语句：与 conflict_columns（主键或唯一键）冲突的行直接跳过，配合 executemany 使用"""
+    name, stmt = _dialect_insert(table)
+    if name in ('mysql', 'mariadb'):
+        return stmt.prefix_with('IGNORE')
+    return stmt.on_conflict_do_nothing(index_elements=list(conflict_columns))
+
+
+def insert_or_increment(table, conflict_columns, increment_columns, replace_columns=()):
+    """INSERT 语句：与 conflict_columns 冲突时把 increment_columns 加上新值，replace_columns 换成新值，
+    整个过程是一条语句，并发执行不会丢失更新"""
+    name, stmt = _dialect_insert(table)
+    if name in ('mysql', 'mariadb'):
+        values = {column: table.c[column] + stmt.inserted[column] for column in increment_columns}
+        values.update({column: stmt.inserted[column] for column in replace_columns})
+        return stmt.on_duplicate_key_update(values)
+    values = {column: table.c[column] + stmt.excluded[column] for column in increment_columns}
+    values.update({column: stmt.excluded[column] for column in replace_columns})
+    return stmt.on_conflict_do_update(index_elements=list(conflict_columns), set_=values)
@@ -0,0 +1,154 @@
+# Word 附件文本提取和 HTML 预览
+# .docx 本质上是 zip 包，正文在 word/document.xml 中，这里直接流式解析 XML，
+# 不依赖第三方库。提取在后台线程池中进行，上传请求保存完文件即可返回；
+# 旧文件在第一次查看预览时才排队生成。
+
+import os
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from xml.etree import ElementTree
+
+from markupsafe import escape
+
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+def extract_paragraphs(path):
+    """返回 [(样式, 文本)] 列表，样式为段落的 pStyle（没有时为空字符串）"""
+    paragraphs = []
+    with zipfile.ZipFile(path) as docx:
+        with docx.open('word/document.xml') as xml:
+            style = ''
+            parts = []
+            for event, elem in ElementTree.iterparse(xml, events=('start', 'end')):
+                if event == 'start':
+                    if elem.tag == _W + 'p':
+                        style = ''
+                        parts = []
+                    continue
+
+                if elem.tag == _W + 't':
+                    parts.append(elem.text or '')
+                elif elem.tag == _W + 'tab':
+                    parts.append('\t')
+                elif elem.tag in (_W + 'br', _W + 'cr'):
+                    parts.append('\n')
+                elif elem.tag == _W + 'pStyle':
+                    style = elem.get(_W + 'val', '')
+                elif elem.tag == _W + 'p':
+                    paragraphs.append((style, ''.join(parts)))
+                    # 已处理的段落及时释放，大文件也只占用少量内存
+                    elem.clear()
+    return paragraphs
+
+
+def build_html(paragraphs):
+    html = ['<div class="docx-preview">']
+    for style, text in paragraphs:
+        if not text.strip():
+            continue
+        content = escape(text).replace('\n', '<br>')
+        if style.lower().startswith(('heading', 'title')) or style.startswith('标题'):
+            html.append(f'<h5>{content}</h5>')
+        else:
+            html.append(f'<p>{content}</p>')
+    html.append('</div>')
+    return '\n'.join(html)
+
+
+class PreviewWorker:
+    def __init__(self, max_workers=2):
+        self.max_workers = max_workers
+        self._app = None
+        self._executor = None
+        self._pending = set()
+        self._lock = threading.Lock()
+        self.plagiarism_options = None
+
+    def init_app(self, app):
+        self._app = app
+        self.max_workers = app.config.get('DOCX_PREVIEW_WORKERS', self.max_workers)
+        if app.config.get('PLAGIARISM_ENABLED', True):
+            self.plagiarism_options = {
+                'min_length': app.config.get('PLAGIARISM_MIN_LENGTH', 50),
+                'min_similarity': app.config.get('PLAGIARISM_MIN_SIMILARITY', 0.5),
+            }
+        app.extensions['docx_preview'] = self
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix='docx-preview')
+        return self._executor
+
+    def schedule(self, submission_id):
+        """把提交加入后台处理队列（生成附件预览、更新查重索引），同一提交不会重复排队"""
+        with self._lock:
+            if submission_id in self._pending:
+                return
+            self._pending.add(submission_id)
+            self._get_executor().submit(self._run, submission_id)
+
+    def _run(self, submission_id):
+        try:
+            with self._app.app_context():
+                build_preview(submission_id)
+                if self.plagiarism_options is not None:
+                    # 查重索引要用到附件文本，所以放在预览生成之后
+                    from services import plagiarism
+                    plagiarism.index_submission(submission_id, **self.plagiarism_options)
+        except Exception:
+            self._app.logger.exception('处理作业提交失败: submission=%s', submission_id)
+        finally:
+            with self._lock:
+                self._pending.discard(submission_id)
+
+    def get_preview(self, submission):
+        """返回可用的预览记录；还没有或附件已更换时排队生成并返回 None"""
+        from models import SubmissionPreview
+
+        preview = SubmissionPreview.query.get(submission.id)
+        if preview is not None and preview.file_path == submission.file_path and preview.status != 'pending':
+            return preview
+        if submission.file_path:
+            self.schedule(submission.id)
+        return None
+
+
+def build_preview(submission_id):
+    """提取提交附件的文本并生成预览（在应用上下文中调用）"""
+    from extensions import db
+    from models import AssignmentSubmission, SubmissionPreview
+
+    submission = AssignmentSubmission.query.get(submission_id)
+    if submission is None or not submission.file_path:
+        return None
+
+    preview = SubmissionPreview.query.get(submission_id)
+    if preview is None:
+        preview = SubmissionPreview(submission_id=submission_id)
+        db.session.add(preview)
+
+    preview.file_path = submission.file_path
+    try:
+        if not os.path.exists(submission.file_path):
+            raise FileNotFoundError('附件文件不存在')
+        paragraphs = extract_paragraphs(submission.file_path)
+        preview.text = '\n'.join(text for _, text in paragraphs)
+        preview.html = build_html(paragraphs)
+        preview.status = 'ready'
+        preview.error = None
+    except (OSError, KeyError, zipfile.BadZipFile, ElementTree.ParseError) as e:
+        preview.text = None
+        preview.html = None
+        preview.status = 'failed'
+        preview.error = str(e)[:256]
+    preview.updated_at = datetime.utcnow()
+
+    db.session.commit()
+    return preview
+
+
+preview_worker = PreviewWorker()
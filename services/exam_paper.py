@@ -0,0 +1,299 @@
+# 预编译的考试试卷
+# 考试开始时全班会在几秒内同时打开同一份试卷。这里在开考前把试卷（题目、选项、分值，不含答案）
+# 编译成不可变的带版本号的载荷：每道题预先序列化成 JSON 片段，保存在内存和磁盘上。
+# 学生请求试卷时只按种子打乱题目顺序并拼接片段，不需要任何 ORM 查询。
+# 按题库组卷生成了学生试卷变体时，变体（每个学生的题目下标）也编译进试卷。
+# 题目、考试信息或试卷变体被修改时，在同一事务里把考试的 paper_revision 加一；编译结果（内存和磁盘）
+# 记录编译时的修订号，读取时与数据库比较，不一致就重新编译。这样其他进程的修改、以及晚到的旧编译结果
+# 覆盖了磁盘文件，都不会让过期试卷留下来。同一考试每 EXAM_PAPER_CHECK_INTERVAL 秒只查询一次修订号，
+# 本进程提交的修改则在事务提交后立即生效。
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+class CompiledPaper:
+    __slots__ = ('exam_id', 'version', 'meta', 'fragments', 'variants', 'class_id', 'start_time', 'end_time',
+                 'meta_json', 'question_ids', 'revision')
+
+    def __init__(self, exam_id, version, meta, fragments, variants=None, revision=None):
+        self.exam_id = exam_id
+        self.version = version
+        # 编译时考试的 paper_revision
+        self.revision = revision
+        self.meta = meta
+        self.fragments = tuple(fragments)
+        # {学生ID: 题目下标元组}，键 0 为默认变体；没有任何变体时作答全部题目
+        self.variants = {int(k): tuple(v) for k, v in (variants or {}).items()}
+        self.class_id = meta['class_id']
+        self.start_time = datetime.fromisoformat(meta['start_time']) if meta.get('start_time') else None
+        self.end_time = datetime.fromisoformat(meta['end_time']) if meta.get('end_time') else None
+        self.meta_json = json.dumps(meta, ensure_ascii=False)
+        # 与 fragments 对应的题目 ID（字符串，与答案 JSON 的键一致）
+        self.question_ids = tuple(str(json.loads(fragment)['id']) for fragment in self.fragments)
+
+    def is_open(self, now=None):
+        now = now or datetime.now()
+        return (self.start_time is None or self.start_time <= now) and \
+               (self.end_time is None or now <= self.end_time)
+
+    def _positions_for(self, student_id):
+        return self.variants.get(student_id) or self.variants.get(0, range(len(self.fragments)))
+
+    def question_ids_for(self, student_id):
+        """学生需要作答的题目 ID 集合（字符串）"""
+        return {self.question_ids[i] for i in self._positions_for(student_id)}
+
+    def order_for(self, student_id, secret=''):
+        """学生的题目顺序：由考试和学生决定的固定随机排列，刷新页面顺序不变"""
+        order = list(self._positions_for(student_id))
+        random.Random(f'{secret}:{self.exam_id}:{student_id}').shuffle(order)
+        return order
+
+    def render_for(self, student_id, secret=''):
+        questions = ','.join(self.fragments[i] for i in self.order_for(student_id, secret))
+        return f'{{"version":"{self.version}","exam":{self.meta_json},"questions":[{questions}]}}'.encode('utf-8')
+
+    def to_dict(self):
+        return {'exam_id': self.exam_id, 'version': self.version, 'revision': self.revision, 'meta': self.meta,
+                'fragments': list(self.fragments), 'variants': {str(k): list(v) for k, v in self.variants.items()}}
+
+
+def _parse_options(options):
+    if options is None or isinstance(options, (list, dict)):
+        return options
+    try:
+        return json.loads(options)
+    except ValueError:
+        return options
+
+
+def build_paper(exam_id, meta, questions, variants=None, revision=None):
+    """由考试信息和题目列表（字典）生成编译后的试卷，题目中不包含答案；
+    variants 为 {学生ID: 题目ID列表}，revision 为编译时考试的 paper_revision"""
+    fragments = [json.dumps({
+        'id': q['id'],
+        'type': q.get('question_type'),
+        'content': q.get('content'),
+        'options': _parse_options(q.get('options')),
+        'score': q.get('score'),
+    }, ensure_ascii=False) for q in questions]
+
+    positions = {q['id']: i for i, q in enumerate(questions)}
+    variant_positions = {student_id: [positions[i] for i in ids if i in positions]
+                         for student_id, ids in (variants or {}).items()}
+
+    digest = hashlib.sha1(json.dumps(meta, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+    for fragment in fragments:
+        digest.update(fragment.encode('utf-8'))
+    digest.update(json.dumps(sorted(variant_positions.items())).encode('utf-8'))
+    return CompiledPaper(exam_id, digest.hexdigest()[:12], meta, fragments, variant_positions, revision)
+
+
+def compile_paper(exam_id):
+    """从数据库读取考试和题目并编译（需要应用上下文），考试不存在时返回 None"""
+    from models import Exam, ExamQuestion, PaperVariant
+
+    exam = Exam.query.get(exam_id)
+    if exam is None:
+        return None
+
+    meta = {
+        'id': exam.id,
+        'title': exam.title,
+        'description': exam.description,
+        'class_id': exam.class_id,
+        'start_time': exam.start_time.isoformat() if exam.start_time else None,
+        'end_time': exam.end_time.isoformat() if exam.end_time else None,
+        'duration': exam.duration,
+    }
+    questions = [{
+        'id': q.id,
+        'question_type': q.question_type,
+        'content': q.content,
+        'options': q.options,
+        'score': q.score,
+    } for q in ExamQuestion.query.filter_by(exam_id=exam_id).order_by(ExamQuestion.id).all()]
+    variants = {v.student_id or 0: json.loads(v.question_ids)
+                for v in PaperVariant.query.filter_by(exam_id=exam_id).all()}
+
+    return build_paper(exam_id, meta, questions, variants, exam.paper_revision)
+
+
+class PaperCache:
+    def __init__(self, directory='instance/exam_papers'):
+        self.directory = directory
+        self._papers = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._prewarm = (None, 0, 15)
+        self._prewarm_started = False
+        # {考试ID: (数据库中的修订号, 查询时间)}
+        self._revisions = {}
+        self.check_interval = 1.0
+        self.compiles = 0
+
+    def init_app(self, app):
+        from sqlalchemy import event
+        from extensions import db
+        from models import Exam, ExamQuestion, PaperVariant
+
+        self.directory = app.config.get('EXAM_PAPER_CACHE_DIR', self.directory)
+        self.check_interval = app.config.get('EXAM_PAPER_CHECK_INTERVAL', self.check_interval)
+        os.makedirs(self.directory, exist_ok=True)
+        app.extensions['exam_papers'] = self
+
+        # 题目增删改、考试信息修改、试卷变体重新生成时记下考试 ID，flush 结束时在同一事务里增加修订号，
+        # 事务提交后再让本进程的缓存失效。监听器只注册一次，重复调用 create_app() 不会叠加
+        for model in (ExamQuestion, Exam, PaperVariant):
+            for name in ('after_insert', 'after_update', 'after_delete'):
+                if not event.contains(model, name, self._remember_exam):
+                    event.listen(model, name, self._remember_exam)
+        if not event.contains(db.session, 'after_commit', self._invalidate_changed):
+            event.listen(db.session, 'after_flush', self._bump_revisions)
+            event.listen(db.session, 'after_commit', self._invalidate_changed)
+            event.listen(db.session, 'after_rollback', self._forget_changed)
+
+        self._prewarm = (app, app.config.get('EXAM_PAPER_PREWARM_INTERVAL', 0),
+                         app.config.get('EXAM_PAPER_PREWARM_WINDOW', 15))
+
+    def start(self):
+        """启动定时预编译线程（配置了 EXAM_PAPER_PREWARM_INTERVAL 时，每个进程一次）"""
+        app, interval, window = self._prewarm
+        with self._lock:
+            if not interval or self._prewarm_started:
+                return
+            self._prewarm_started = True
+        self._start_prewarm(app, interval, window)
+
+    @staticmethod
+    def _remember_exam(mapper, connection, target):
+        from extensions import db
+        from models import Exam
+        exam_id = target.id if isinstance(target, Exam) else target.exam_id
+        db.session.info.setdefault('flushed_exam_ids', set()).add(exam_id)
+
+    @staticmethod
+    def _bump_revisions(session, flush_context):
+        from sqlalchemy import update
+        from models import Exam
+
+        exam_ids = session.info.pop('flushed_exam_ids', None)
+        if not exam_ids:
+            return
+        table = Exam.__table__
+        session.connection().execute(
+            update(table).where(table.c.id.in_(exam_ids)).values(paper_revision=table.c.paper_revision + 1))
+        session.info.setdefault('changed_exam_ids', set()).update(exam_ids)
+
+    def _invalidate_changed(self, session):
+        for exam_id in session.info.pop('changed_exam_ids', ()):
+            self.invalidate(exam_id)
+
+    @staticmethod
+    def _forget_changed(session):
+        session.info.pop('flushed_exam_ids', None)
+        session.info.pop('changed_exam_ids', None)
+
+    def _path(self, exam_id):
+        return os.path.join(self.directory, f'{exam_id}.json')
+
+    def _lock_for(self, exam_id):
+        with self._lock:
+            return self._locks.setdefault(exam_id, threading.Lock())
+
+    def _read_disk(self, exam_id):
+        try:
+            with open(self._path(exam_id), encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return CompiledPaper(data['exam_id'], data['version'], data['meta'], data['fragments'], data.get('variants'),
+                             data.get('revision'))
+
+    def _write_disk(self, paper):
+        path = self._path(paper.exam_id)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(paper.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _revision(self, exam_id):
+        """数据库中考试的 paper_revision，同一考试每 check_interval 秒最多查询一次；考试不存在时返回 None"""
+        now = time.monotonic()
+        checked = self._revisions.get(exam_id)
+        if checked is not None and now - checked[1] < self.check_interval:
+            return checked[0]
+
+        from sqlalchemy import select
+        from extensions import db
+        from models import Exam
+        revision = db.session.execute(select(Exam.paper_revision).where(Exam.id == exam_id)).scalar()
+        self._revisions[exam_id] = (revision, now)
+        return revision
+
+    def get(self, exam_id):
+        """返回编译好的试卷：内存 → 磁盘 → 重新编译（同一考试只会有一个线程在编译）。
+        修订号与数据库不一致的编译结果视为过期"""
+        revision = self._revision(exam_id)
+        if revision is None:
+            return None
+        paper = self._papers.get(exam_id)
+        if paper is not None and paper.revision == revision:
+            return paper
+
+        with self._lock_for(exam_id):
+            paper = self._papers.get(exam_id)
+            if paper is not None and paper.revision == revision:
+                return paper
+
+            paper = self._read_disk(exam_id)
+            if paper is None or paper.revision != revision:
+                paper = compile_paper(exam_id)
+                if paper is None:
+                    return None
+                self._write_disk(paper)
+                self.compiles += 1
+                # 编译时读到的修订号就是数据库的最新值
+                self._revisions[exam_id] = (paper.revision, time.monotonic())
+            self._papers[exam_id] = paper
+            return paper
+
+    def invalidate(self, exam_id):
+        """本进程内立即失效；磁盘文件不用删除，其中的修订号已经过期，下次读取时会重新编译"""
+        with self._lock_for(exam_id):
+            self._papers.pop(exam_id, None)
+            self._revisions.pop(exam_id, None)
+
+    def precompile_upcoming(self, window_minutes=15):
+        """编译即将开始（以及正在进行）的考试，返回编译的考试数"""
+        from models import Exam
+
+        now = datetime.now()
+        exam_ids = [exam_id for (exam_id,) in Exam.query.with_entities(Exam.id).filter(
+            Exam.start_time <= now + timedelta(minutes=window_minutes),
+            Exam.end_time >= now
+        )]
+        for exam_id in exam_ids:
+            self.get(exam_id)
+        return len(exam_ids)
+
+    def _start_prewarm(self, app, interval, window_minutes):
+        def run():
+            while True:
+                try:
+                    with app.app_context():
+                        self.precompile_upcoming(window_minutes)
+                except Exception:
+                    app.logger.exception('预编译考试试卷失败')
+                time.sleep(interval)
+
+        threading.Thread(target=run, name='exam-paper-prewarm', daemon=True).start()
+
+
+paper_cache = PaperCache()
@@ -0,0 +1,232 @@
+# 考试到时自动交卷
+# 每个学生第一次打开试卷时记录 ExamAttempt，个人截止时间 = 开始时间 + 考试时长，且不晚于考试结束时间。
+# 进程内用最小堆保存所有未交卷学生的截止时间，后台线程睡到最近的截止时间，
+# 把到期的学生成批交卷（合并本进程自动保存缓冲中的答案，其他进程缓冲中的答案由它们写库时补进答卷）。几万个计时器只是堆里的几万个元组。
+# 计时线程启动时（应用开始处理请求时）以及之后定期从 ExamAttempt 重建，其他进程开始的考试和重启前的考试都不会漏掉；
+# 到时交卷在个人截止时间再加 EXAM_SUBMIT_GRACE_SECONDS 之后执行，余量内被接受的保存都能计入答卷。
+# 交卷前先用条件 UPDATE 认领考试记录（finalized_at 为空才更新），只有认领成功的进程合并答案，
+# 多个进程同时处理同一个学生时只有一个会交卷。
+
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import tuple_, update
+from sqlalchemy.exc import IntegrityError
+
+
+class ExamTimer:
+    def __init__(self, batch_size=500, resync_interval=60, grace=30):
+        self.batch_size = batch_size
+        self.resync_interval = resync_interval
+        self.grace = grace
+        self._app = None
+        self._heap = []  # (截止时间戳, exam_id, student_id)
+        self._deadlines = {}  # (exam_id, student_id) -> 截止时间戳；不在这里的堆元素视为已取消
+        self._cond = threading.Condition()
+        self._thread = None
+        self.finalized = 0
+
+    def init_app(self, app):
+        self._app = app
+        self.batch_size = app.config.get('EXAM_TIMER_BATCH_SIZE', self.batch_size)
+        self.resync_interval = app.config.get('EXAM_TIMER_RESYNC_INTERVAL', self.resync_interval)
+        self.grace = app.config.get('EXAM_SUBMIT_GRACE_SECONDS', self.grace)
+        app.extensions['exam_timer'] = self
+
+    def start(self):
+        """启动计时线程（每个进程一次），线程启动后先从数据库载入未交卷的考试"""
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='exam-timer', daemon=True)
+        self._thread.start()
+
+    # ---- 计时器 ----
+
+    def schedule(self, exam_id, student_id, deadline):
+        # 堆里保存的是交卷时间（截止时间 + 余量）
+        due = deadline.timestamp() + self.grace
+        key = (exam_id, student_id)
+        with self._cond:
+            if self._deadlines.get(key) == due:
+                return
+            self._deadlines[key] = due
+            heapq.heappush(self._heap, (due, exam_id, student_id))
+            if self._heap[0][0] == due:
+                self._cond.notify()
+
+    def cancel(self, exam_id, student_id):
+        with self._cond:
+            self._deadlines.pop((exam_id, student_id), None)
+
+    def deadline_for(self, exam_id, student_id):
+        due = self._deadlines.get((exam_id, student_id))
+        return datetime.fromtimestamp(due - self.grace) if due is not None else None
+
+    def is_open(self, exam_id, student_id):
+        """本进程的计时器中还有这名学生（未交卷、未开始交卷）"""
+        return (exam_id, student_id) in self._deadlines
+
+    def _pop_due(self, now):
+        # 调用方持有 self._cond
+        due_keys = []
+        while self._heap and self._heap[0][0] <= now and len(due_keys) < self.batch_size:
+            due, exam_id, student_id = heapq.heappop(self._heap)
+            key = (exam_id, student_id)
+            if self._deadlines.get(key) == due:
+                del self._deadlines[key]
+                due_keys.append(key)
+        return due_keys
+
+    def _run(self):
+        next_resync = 0
+        while True:
+            if time.time() >= next_resync:
+                try:
+                    with self._app.app_context():
+                        self.rebuild()
+                except Exception:
+                    self._app.logger.exception('重建考试计时器失败')
+                next_resync = time.time() + self.resync_interval
+
+            with self._cond:
+                now = time.time()
+                due_keys = self._pop_due(now)
+                if not due_keys:
+                    timeout = next_resync - now
+                    if self._heap:
+                        timeout = min(timeout, self._heap[0][0] - now)
+                    self._cond.wait(max(timeout, 0.01))
+                    continue
+
+            try:
+                with self._app.app_context():
+                    self.finalized += finalize(due_keys)
+            except Exception:
+                self._app.logger.exception('自动交卷失败，稍后重试')
+                # 放回堆中，几秒后重试
+                retry_at = datetime.now() + timedelta(seconds=5 - self.grace)
+                for exam_id, student_id in due_keys:
+                    self.schedule(exam_id, student_id, retry_at)
+
+    def rebuild(self):
+        """从数据库加载所有未交卷的考试记录，并移除已在其他进程交卷的学生（需要应用上下文）"""
+        from models import ExamAttempt
+
+        rows = ExamAttempt.query.with_entities(
+            ExamAttempt.exam_id, ExamAttempt.student_id, ExamAttempt.deadline
+        ).filter(ExamAttempt.finalized_at.is_(None)).yield_per(5000)
+        count = 0
+        for exam_id, student_id, deadline in rows:
+            self.schedule(exam_id, student_id, deadline)
+            count += 1
+
+        with self._cond:
+            keys = list(self._deadlines)
+        for start in range(0, len(keys), 500):
+            finalized = ExamAttempt.query.with_entities(ExamAttempt.exam_id, ExamAttempt.student_id).filter(
+                tuple_(ExamAttempt.exam_id, ExamAttempt.student_id).in_(keys[start:start + 500]),
+                ExamAttempt.finalized_at.isnot(None)
+            )
+            for exam_id, student_id in finalized:
+                self.cancel(exam_id, student_id)
+        return count
+
+    # ---- 考试记录 ----
+
+    def start_attempt(self, paper, student_id):
+        """学生开始考试：创建考试记录并加入计时器，返回个人截止时间（需要应用上下文）"""
+        from extensions import db
+        from models import ExamAttempt
+
+        deadline = self.deadline_for(paper.exam_id, student_id)
+        if deadline is not None:
+            return deadline
+
+        attempt = ExamAttempt.query.filter_by(exam_id=paper.exam_id, student_id=student_id).first()
+        if attempt is None:
+            now = datetime.now()
+            deadline = now + timedelta(minutes=paper.meta.get('duration') or 0)
+            if paper.end_time is not None and (not paper.meta.get('duration') or deadline > paper.end_time):
+                deadline = paper.end_time
+            attempt = ExamAttempt(exam_id=paper.exam_id, student_id=student_id, started_at=now, deadline=deadline)
+            db.session.add(attempt)
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # 同一学生的并发请求已经创建了记录
+                db.session.rollback()
+                attempt = ExamAttempt.query.filter_by(exam_id=paper.exam_id, student_id=student_id).one()
+
+        if attempt.finalized_at is None:
+            self.schedule(attempt.exam_id, attempt.student_id, attempt.deadline)
+        return attempt.deadline
+
+    def stats(self):
+        with self._cond:
+            active = len(self._deadlines)
+            next_due = min(self._deadlines.values()) if self._deadlines else None
+        return {
+            'active_timers': active,
+            'next_deadline': datetime.fromtimestamp(next_due).isoformat() if next_due else None,
+            'finalized': self.finalized,
+        }
+
+
+def claim_attempt(exam_id, student_id, now):
+    """认领一次交卷：只有 finalized_at 仍为空时才写入，返回是否认领成功（与答案写入在同一事务中）"""
+    from extensions import db
+    from models import ExamAttempt
+
+    result = db.session.execute(
+        update(ExamAttempt)
+        .where(ExamAttempt.exam_id == exam_id, ExamAttempt.student_id == student_id,
+               ExamAttempt.finalized_at.is_(None))
+        .values(finalized_at=now)
+    )
+    return result.rowcount == 1
+
+
+def finalize(keys):
+    """把一批 (exam_id, student_id) 交卷：逐个认领考试记录，合并缓冲中的答案，一个事务写入，返回交卷数"""
+    from extensions import db
+    from models import ExamSubmission
+    from services.autosave import apply_answers, autosave_buffer
+
+    now = datetime.now()
+    claimed = [key for key in keys if claim_attempt(key[0], key[1], now)]
+    if not claimed:
+        db.session.rollback()
+        return 0
+
+    submissions = {
+        (s.exam_id, s.student_id): s
+        for s in ExamSubmission.query.filter(tuple_(ExamSubmission.exam_id, ExamSubmission.student_id).in_(claimed))
+    }
+
+    taken = {}
+    for exam_id, student_id in claimed:
+        buffered = taken[(exam_id, student_id)] = autosave_buffer.take(exam_id, student_id)
+        submission = submissions.get((exam_id, student_id))
+        if submission is None:
+            submission = ExamSubmission(exam_id=exam_id, student_id=student_id, answers='{}')
+            db.session.add(submission)
+        elif submission.submitted_at is not None:
+            continue
+        apply_answers(submission, buffered)
+        submission.submitted_at = datetime.utcnow()
+
+    try:
+        db.session.commit()
+    except Exception:
+        # 版本冲突等失败时事务回滚、认领作废，把取出的答案放回缓冲区，由计时器稍后重试
+        db.session.rollback()
+        for (exam_id, student_id), buffered in taken.items():
+            autosave_buffer.restore(exam_id, student_id, buffered)
+        raise
+    return len(claimed)
+
+
+exam_timer = ExamTimer()
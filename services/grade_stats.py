@@ -0,0 +1,148 @@
+# 班级成绩统计
+# 每个 (作业/考试, 班级) 保存一行累计值：人数、总分、平方和；另外按 0.5 分取整保存每个分数的人数
+# （用来求中位数、百分位数和 10 分一档的分数分布，误差不超过 0.25 分）。
+# 批改或重新批改时只把旧分数减掉、新分数加上。累计值都用“插入，冲突时累加”的单条语句更新，
+# 不需要先读后写：两个请求同时第一次批改不会插入重复主键，同时重新批改也不会丢失更新。
+# 只有批改完成（graded 为真）的成绩计入统计，统计页面只读这些累计值，不扫描提交表。
+
+import math
+from collections import Counter
+from datetime import datetime
+
+from extensions import db
+from models import Assignment, AssignmentSubmission, ClassInfo, Exam, ExamSubmission, GradeAggregate, GradeCount
+from services.database import insert_or_increment
+
+HISTOGRAM_BUCKETS = 10
+HISTOGRAM_WIDTH = 10
+SKETCH_RESOLUTION = 0.5
+PERCENTILES = (25, 50, 75, 90)
+KEY_COLUMNS = ('kind', 'item_id', 'class_id')
+
+
+def _histogram_bucket(score):
+    return min(max(int(score // HISTOGRAM_WIDTH), 0), HISTOGRAM_BUCKETS - 1)
+
+
+def _sketch_key(score):
+    return int(round(score / SKETCH_RESOLUTION))
+
+
+def record_changes(kind, item_id, class_id, changes):
+    """把一批分数变化 [(旧分数, 新分数)] 计入统计（不提交事务）；旧分数为 None 表示之前没有计入统计，
+    新分数为 None 表示成绩移出统计（如重新提交后等待批改）"""
+    changes = [(old, new) for old, new in changes if old != new]
+    if not changes:
+        return
+
+    count, total, total_sq = 0, 0.0, 0.0
+    sketch = Counter()
+    for old, new in changes:
+        for score, sign in ((old, -1), (new, 1)):
+            if score is None:
+                continue
+            count += sign
+            total += sign * score
+            total_sq += sign * score * score
+            sketch[_sketch_key(score)] += sign
+
+    key = {'kind': kind, 'item_id': item_id, 'class_id': class_id}
+    db.session.execute(
+        insert_or_increment(GradeAggregate.__table__, KEY_COLUMNS, ('count', 'total', 'total_sq'), ('updated_at',)),
+        [dict(key, count=count, total=total, total_sq=total_sq, updated_at=datetime.utcnow())])
+    counts = [dict(key, score_key=score_key, count=n) for score_key, n in sorted(sketch.items()) if n]
+    if counts:
+        db.session.execute(
+            insert_or_increment(GradeCount.__table__, KEY_COLUMNS + ('score_key',), ('count',)), counts)
+
+
+def rebuild(kind, item_id):
+    """用提交表重新计算一个作业/考试的统计（数据修复用，需要提交事务）"""
+    if kind == 'assignment':
+        item = Assignment.query.get(item_id)
+        scores = db.session.query(AssignmentSubmission.score).filter(
+            AssignmentSubmission.assignment_id == item_id,
+            AssignmentSubmission.graded.is_(True),
+            AssignmentSubmission.score.isnot(None)
+        )
+    else:
+        item = Exam.query.get(item_id)
+        scores = db.session.query(ExamSubmission.score).filter(
+            ExamSubmission.exam_id == item_id,
+            ExamSubmission.graded.is_(True),
+            ExamSubmission.score.isnot(None)
+        )
+    GradeAggregate.query.filter_by(kind=kind, item_id=item_id).delete(synchronize_session=False)
+    GradeCount.query.filter_by(kind=kind, item_id=item_id).delete(synchronize_session=False)
+    if item is not None:
+        record_changes(kind, item_id, item.class_id, [(None, score) for (score,) in scores])
+
+
+def quantile(sketch, count, q):
+    """从分数计数 {round(分数 / 0.5): 人数} 中取第 q 分位数（0 <= q <= 1），取最近秩"""
+    if not count:
+        return None
+    rank = max(math.ceil(q * count), 1)
+    seen = 0
+    for key in sorted(sketch):
+        seen += sketch[key]
+        if seen >= rank:
+            return key * SKETCH_RESOLUTION
+    return None
+
+
+def summarize(aggregate, sketch):
+    count = aggregate.count
+    histogram = [0] * HISTOGRAM_BUCKETS
+    for key, n in sketch.items():
+        histogram[_histogram_bucket(key * SKETCH_RESOLUTION)] += n
+    summary = {
+        'count': count,
+        'histogram': [{
+            'range': f'{i * HISTOGRAM_WIDTH}-{(i + 1) * HISTOGRAM_WIDTH}' if i < HISTOGRAM_BUCKETS - 1
+            else f'{i * HISTOGRAM_WIDTH}+',
+            'count': c
+        } for i, c in enumerate(histogram)],
+    }
+    if count:
+        mean = aggregate.total / count
+        summary.update({
+            'mean': round(mean, 2),
+            'std': round(math.sqrt(max(aggregate.total_sq / count - mean * mean, 0.0)), 2),
+            'min': quantile(sketch, count, 0),
+            'max': quantile(sketch, count, 1),
+        })
+        summary.update({f'p{p}': quantile(sketch, count, p / 100) for p in PERCENTILES})
+    return summary
+
+
+def _sketches(kind, item_ids):
+    """{(作业/考试ID, 班级ID): {分数键: 人数}}"""
+    sketches = {}
+    item_ids = list(item_ids)
+    for start in range(0, len(item_ids), 500):
+        rows = db.session.query(GradeCount.item_id, GradeCount.class_id, GradeCount.score_key, GradeCount.count)\
+            .filter(GradeCount.kind == kind, GradeCount.item_id.in_(item_ids[start:start + 500]),
+                    GradeCount.count != 0)
+        for item_id, class_id, score_key, count in rows:
+            sketches.setdefault((item_id, class_id), {})[score_key] = count
+    return sketches
+
+
+def teacher_analytics(teacher_id):
+    """该教师所有作业和考试的班级成绩统计（只读统计表，加上标题和班级名）"""
+    rows = []
+    for kind, model, order_column in (('assignment', Assignment, Assignment.deadline),
+                                      ('exam', Exam, Exam.start_time)):
+        query = db.session.query(GradeAggregate, model.title, ClassInfo.class_name)\
+            .join(model, db.and_(GradeAggregate.kind == kind, GradeAggregate.item_id == model.id))\
+            .outerjoin(ClassInfo, ClassInfo.id == GradeAggregate.class_id)\
+            .filter(model.teacher_id == teacher_id)\
+            .order_by(order_column.desc())\
+            .all()
+        sketches = _sketches(kind, {aggregate.item_id for aggregate, _, _ in query})
+        for aggregate, title, class_name in query:
+            sketch = sketches.get((aggregate.item_id, aggregate.class_id), {})
+            rows.append(dict(summarize(aggregate, sketch), kind=kind, item_id=aggregate.item_id, title=title,
+                             class_id=aggregate.class_id, class_name=class_name))
+    return rows
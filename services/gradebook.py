@@ -0,0 +1,114 @@
+# 成绩册导出
+# 学生、作业成绩、考试成绩三路查询都按学生 ID 排序并用服务端游标分批读取，
+# 再做归并：同一时刻只在内存中保留一个学生的成绩，第一批数据查到就能开始输出。
+
+from sqlalchemy import select
+
+from extensions import db
+from models import Assignment, AssignmentSubmission, Exam, ExamSubmission, User
+
+# 服务端游标每批读取的行数
+YIELD_PER = 1000
+
+
+def _stream(statement):
+    return db.session.execute(
+        statement.execution_options(stream_results=True, yield_per=YIELD_PER)
+    )
+
+
+def gradebook_columns(class_id, teacher_id):
+    """成绩册的列：该教师在该班级布置的作业和考试"""
+    assignments = db.session.query(Assignment.id, Assignment.title)\
+        .filter(Assignment.class_id == class_id, Assignment.teacher_id == teacher_id)\
+        .order_by(Assignment.deadline, Assignment.id)\
+        .all()
+    exams = db.session.query(Exam.id, Exam.title)\
+        .filter(Exam.class_id == class_id, Exam.teacher_id == teacher_id)\
+        .order_by(Exam.start_time, Exam.id)\
+        .all()
+    return [('assignment', a.id, a.title) for a in assignments] + \
+           [('exam', e.id, e.title) for e in exams]
+
+
+def gradebook_header(columns):
+    header = ['学号', '姓名']
+    for kind, _, title in columns:
+        header.append(f"{'作业' if kind == 'assignment' else '考试'}: {title}")
+    return header
+
+
+def _group_by_student(rows):
+    """把按学生 ID 排好序的 (student_id, item_id, score) 流按学生分组"""
+    current_id = None
+    scores = {}
+    for student_id, item_id, score in rows:
+        if student_id != current_id:
+            if current_id is not None:
+                yield current_id, scores
+            current_id = student_id
+            scores = {}
+        scores[item_id] = score
+    if current_id is not None:
+        yield current_id, scores
+
+
+def iter_gradebook_rows(class_id, columns):
+    assignment_ids = [item_id for kind, item_id, _ in columns if kind == 'assignment']
+    exam_ids = [item_id for kind, item_id, _ in columns if kind == 'exam']
+
+    students = _stream(
+        select(User.id, User.student_id, User.name)
+        .where(User.role == 'student', User.class_id == class_id)
+        .order_by(User.id)
+    )
+    assignment_scores = _group_by_student(_stream(
+        select(AssignmentSubmission.student_id, AssignmentSubmission.assignment_id, AssignmentSubmission.score)
+        .where(AssignmentSubmission.assignment_id.in_(assignment_ids))
+        .order_by(AssignmentSubmission.student_id)
+    )) if assignment_ids else iter(())
+    exam_scores = _group_by_student(_stream(
+        select(ExamSubmission.student_id, ExamSubmission.exam_id, ExamSubmission.score)
+        .where(ExamSubmission.exam_id.in_(exam_ids))
+        .order_by(ExamSubmission.student_id)
+    )) if exam_ids else iter(())
+
+    next_assignment = next(assignment_scores, None)
+    next_exam = next(exam_scores, None)
+
+    for user_id, student_number, name in students:
+        # 跳过已不在本班的学生留下的成绩
+        while next_assignment is not None and next_assignment[0] < user_id:
+            next_assignment = next(assignment_scores, None)
+        while next_exam is not None and next_exam[0] < user_id:
+            next_exam = next(exam_scores, None)
+
+        own_assignments = next_assignment[1] if next_assignment and next_assignment[0] == user_id else {}
+        own_exams = next_exam[1] if next_exam and next_exam[0] == user_id else {}
+
+        row = [student_number, name]
+        for kind, item_id, _ in columns:
+            scores = own_assignments if kind == 'assignment' else own_exams
+            row.append(scores.get(item_id))
+        yield row
+
+
+ASSIGNMENT_HEADER = ['学号', '姓名', '提交时间', '是否批改', '成绩']
+
+
+def iter_assignment_rows(assignment):
+    """单个作业的成绩表：班级每个学生一行，未提交的留空"""
+    rows = _stream(
+        select(User.student_id, User.name, AssignmentSubmission.submitted_at,
+               AssignmentSubmission.graded, AssignmentSubmission.score)
+        .outerjoin(AssignmentSubmission, (AssignmentSubmission.student_id == User.id) &
+                   (AssignmentSubmission.assignment_id == assignment.id))
+        .where(User.role == 'student', User.class_id == assignment.class_id)
+        .order_by(User.student_id, User.id)
+    )
+    for student_number, name, submitted_at, graded, score in rows:
+        if submitted_at is None:
+            yield [student_number, name, '未提交', '', None]
+        else:
+            yield [student_number, name, submitted_at.strftime('%Y-%m-%d %H:%M'),
+                   '是' if graded else '否', score]
@@ -0,0 +1,117 @@
+# 登录用户身份缓存
+# Flask-Login 每个请求都会调用 user_loader，这里用一个带容量上限和过期时间的
+# LRU 缓存保存轻量的用户快照，避免每次请求都查询一次 User 表。
+# 缓存是进程内的：多进程部署时其他进程依靠 TTL 过期，本进程的修改会显式失效。
+
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+
+# 快照中保存的用户字段（不包含密码哈希）
+SNAPSHOT_FIELDS = ('id', 'name', 'phone', 'role', 'student_id', 'class_id', 'college', 'major')
+
+
+class UserSnapshot(UserMixin):
+    """脱离数据库会话的用户只读快照，供 current_user 使用"""
+
+    __slots__ = SNAPSHOT_FIELDS + ('_class_info',)
+
+    def __init__(self, **fields):
+        for field in SNAPSHOT_FIELDS:
+            setattr(self, field, fields.get(field))
+        self._class_info = None
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(**{field: getattr(user, field, None) for field in SNAPSHOT_FIELDS})
+
+    @property
+    def class_info(self):
+        # 班级信息只在页面真正用到时才查询，并在本次请求内复用
+        if self._class_info is None and self.class_id:
+            from models import ClassInfo
+            self._class_info = ClassInfo.query.get(self.class_id)
+        return self._class_info
+
+    def __eq__(self, other):
+        return getattr(other, 'id', None) == self.id and self.id is not None
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class IdentityCache:
+    def __init__(self, max_size=10000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        self.max_size = app.config.get('IDENTITY_CACHE_SIZE', self.max_size)
+        self.ttl = app.config.get('IDENTITY_CACHE_TTL', self.ttl)
+        app.extensions['identity_cache'] = self
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[user_id]
+            self.misses += 1
+        return None
+
+    def put(self, user_id, fields):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, fields)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def load(self, user_id, loader):
+        """返回用户快照；缓存未命中时调用 loader(user_id) 从数据库加载"""
+        fields = self.get(user_id)
+        if fields is None:
+            user = loader(user_id)
+            if user is None:
+                return None
+            snapshot = UserSnapshot.from_user(user)
+            fields = {field: getattr(snapshot, field) for field in SNAPSHOT_FIELDS}
+            self.put(user_id, fields)
+        # 每个请求拿到独立的快照对象，避免请求间共享懒加载的班级信息
+        return UserSnapshot(**fields)
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            'size': size,
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+identity_cache = IdentityCache()
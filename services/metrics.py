@@ -0,0 +1,244 @@
+# 请求指标
+# 按接口记录请求耗时直方图、处理中的请求数、响应大小和状态码，以及每个请求在数据库、模板渲染和文件读写上的耗时，
+# 通过 /metrics 以 Prometheus 文本格式输出，同时附带各个缓存/后台组件的运行统计。
+# 每个请求只做几次 perf_counter 和一次加锁累加，可以一直开启（开销见 benchmarks/bench_metrics.py）。
+# 指标是进程内的：多进程部署时每个进程单独暴露，由 Prometheus 按实例汇总。
+# 访问控制：配置了 METRICS_TOKEN 时必须带 Authorization: Bearer <token>；否则只按 METRICS_ALLOWED_IPS
+# 检查来源地址。同一台机器上的反向代理转发的请求来源地址都是 127.0.0.1，所以没有令牌时
+# 带 X-Forwarded-For / Forwarded 头的请求一律拒绝；如果确实要按客户端地址放行，
+# 需要先用 werkzeug 的 ProxyFix 让 remote_addr 变成真实客户端地址。
+
+import hmac
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, abort, g, has_request_context, request
+from flask import before_render_template, template_rendered
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'total', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+
+
+class EndpointMetrics:
+    __slots__ = ('latency', 'size', 'statuses', 'in_flight', 'db_seconds', 'template_seconds', 'io_seconds')
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.statuses = {}
+        self.in_flight = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.io_seconds = 0.0
+
+
+class RequestTimer:
+    """单个请求的计时状态，整个请求只在 g 上存取这一个对象"""
+
+    __slots__ = ('endpoint', 'started', 'status', 'size', 'template_depth', 'template_started', 'template_time',
+                 'io_time')
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.status = None
+        self.size = None
+        self.template_depth = 0
+        self.template_started = 0.0
+        self.template_time = 0.0
+        self.io_time = 0.0
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self._endpoints = {}
+        self._lock = threading.Lock()
+        self._collectors = {}
+
+    def init_app(self, app):
+        self.enabled = app.config.get('METRICS_ENABLED', True)
+        self.allowed_ips = set(app.config.get('METRICS_ALLOWED_IPS', ('127.0.0.1', '::1')))
+        self.token = app.config.get('METRICS_TOKEN') or None
+        app.extensions['metrics'] = self
+        if not self.enabled:
+            return
+
+        app.before_request(self._start_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._finish_request)
+        before_render_template.connect(self._template_started, app)
+        template_rendered.connect(self._template_finished, app)
+        app.add_url_rule('/metrics', 'metrics', self.view)
+
+    def register(self, name, collect):
+        """登记一个组件的统计函数（返回数值字典），输出为 teaching_<name>_<key> 指标"""
+        self._collectors[name] = collect
+
+    def _metrics_for(self, endpoint):
+        metrics = self._endpoints.get(endpoint)
+        if metrics is None:
+            with self._lock:
+                metrics = self._endpoints.setdefault(endpoint, EndpointMetrics())
+        return metrics
+
+    def _start_request(self):
+        # 未匹配路由的请求（404）统一归到一个标签，避免路径导致标签数量无限增长
+        timer = g.request_timer = RequestTimer(request.endpoint or 'unmatched')
+        metrics = self._metrics_for(timer.endpoint)
+        with self._lock:
+            metrics.in_flight += 1
+
+    def _after_request(self, response):
+        timer = g.get('request_timer')
+        if timer is not None:
+            timer.status = response.status_code
+            timer.size = None if response.is_streamed else response.calculate_content_length()
+        return response
+
+    def _finish_request(self, exc):
+        timer = g.pop('request_timer', None)
+        if timer is None:
+            return
+        elapsed = time.perf_counter() - timer.started
+        status = str(timer.status or (500 if exc is not None else 200))
+        # 数据库耗时由 SQL 查询分析（services/query_profiler.py）统计
+        db_time = g.get('query_time', 0.0)
+
+        metrics = self._metrics_for(timer.endpoint)
+        with self._lock:
+            metrics.in_flight -= 1
+            metrics.latency.observe(elapsed)
+            if timer.size is not None:
+                metrics.size.observe(timer.size)
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+            metrics.db_seconds += db_time
+            metrics.template_seconds += timer.template_time
+            metrics.io_seconds += timer.io_time
+
+    def _template_started(self, sender, template, context, **extra):
+        timer = g.get('request_timer') if has_request_context() else None
+        if timer is not None:
+            # 嵌套渲染只计最外层，避免重复计时
+            if not timer.template_depth:
+                timer.template_started = time.perf_counter()
+            timer.template_depth += 1
+
+    def _template_finished(self, sender, template, context, **extra):
+        timer = g.get('request_timer') if has_request_context() else None
+        if timer is not None and timer.template_depth:
+            timer.template_depth -= 1
+            if not timer.template_depth:
+                timer.template_time += time.perf_counter() - timer.template_started
+
+    def render(self):
+        """Prometheus 文本格式"""
+        lines = []
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            snapshot = [(endpoint, m.latency.counts[:], m.latency.total, m.latency.count, m.size.counts[:],
+                         m.size.total, m.size.count, dict(m.statuses), m.in_flight, m.db_seconds,
+                         m.template_seconds, m.io_seconds) for endpoint, m in endpoints]
+
+        def histogram(name, help_text, bounds, index_counts, index_total, index_count):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for row in snapshot:
+                endpoint = _label(row[0])
+                cumulative = 0
+                for bound, count in zip(bounds + (float('inf'),), row[index_counts]):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="{le}"}} {cumulative}')
+                lines.append(f'{name}_sum{{endpoint="{endpoint}"}} {row[index_total]}')
+                lines.append(f'{name}_count{{endpoint="{endpoint}"}} {row[index_count]}')
+
+        histogram('http_request_duration_seconds', '请求处理耗时', LATENCY_BUCKETS, 1, 2, 3)
+        histogram('http_response_size_bytes', '响应大小（流式响应不计）', SIZE_BUCKETS, 4, 5, 6)
+
+        lines.append('# HELP http_requests_total 按状态码统计的请求数')
+        lines.append('# TYPE http_requests_total counter')
+        for row in snapshot:
+            for status, count in sorted(row[7].items()):
+                lines.append(f'http_requests_total{{endpoint="{_label(row[0])}",status="{status}"}} {count}')
+
+        lines.append('# HELP http_requests_in_flight 正在处理的请求数')
+        lines.append('# TYPE http_requests_in_flight gauge')
+        for row in snapshot:
+            lines.append(f'http_requests_in_flight{{endpoint="{_label(row[0])}"}} {row[8]}')
+
+        lines.append('# HELP http_request_component_seconds_total 请求耗时中数据库、模板渲染、文件读写的部分')
+        lines.append('# TYPE http_request_component_seconds_total counter')
+        for row in snapshot:
+            endpoint = _label(row[0])
+            for component, value in (('db', row[9]), ('template', row[10]), ('io', row[11])):
+                lines.append(f'http_request_component_seconds_total{{endpoint="{endpoint}",'
+                             f'component="{component}"}} {value}')
+
+        for name, collect in sorted(self._collectors.items()):
+            try:
+                values = collect()
+            except Exception:
+                continue
+            for key, value in sorted(values.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                lines.append(f'# TYPE teaching_{name}_{key} gauge')
+                lines.append(f'teaching_{name}_{key} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+    def authorized(self):
+        """当前请求能否读取指标（/metrics 和其他运行状态接口共用）"""
+        if self.token:
+            scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+            return scheme.lower() == 'bearer' and hmac.compare_digest(token.encode(), self.token.encode())
+        # 没有令牌时只允许本机（或配置的监控地址）直接抓取，经过代理转发的请求不算本机
+        if 'X-Forwarded-For' in request.headers or 'Forwarded' in request.headers:
+            return False
+        return request.remote_addr in self.allowed_ips
+
+    def view(self):
+        if not self.authorized():
+            abort(404)
+        return Response(self.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+@contextmanager
+def io_timer():
+    """统计一段文件读写耗时，计入当前请求的 io 部分"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer = g.get('request_timer') if has_request_context() else None
+        if timer is not None:
+            timer.io_time += time.perf_counter() - started
+
+
+metrics = Metrics()
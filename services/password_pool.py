@@ -0,0 +1,126 @@
+# 登录密码校验线程池
+# 密码哈希（PBKDF2 / scrypt）是纯 CPU 计算，集中登录时会占满 Web 进程。
+# 这里把校验放到固定大小的线程池里执行（hashlib 计算期间会释放 GIL，线程可以并行），
+# 排队数超过上限时直接拒绝，让登录请求快速失败而不是拖慢所有其他请求。
+# 登录成功后如果哈希参数与配置不一致，会用配置的参数重新计算哈希。
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class VerifierOverloaded(Exception):
+    pass
+
+
+class PasswordVerifier:
+    def __init__(self, workers=None, max_pending=64, timeout=10, method='pbkdf2:sha256:600000'):
+        self.workers = workers or os.cpu_count() or 2
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.method = method
+        self._method_prefix = None
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=4096)  # 最近的校验耗时（毫秒）
+        self.verified = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.rehashed = 0
+
+    def init_app(self, app):
+        self.workers = app.config.get('PASSWORD_VERIFY_WORKERS') or self.workers
+        self.max_pending = app.config.get('PASSWORD_VERIFY_MAX_PENDING', self.max_pending)
+        self.timeout = app.config.get('PASSWORD_VERIFY_TIMEOUT', self.timeout)
+        self.method = app.config.get('PASSWORD_HASH_METHOD', self.method)
+        app.extensions['password_verifier'] = self
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._slots = threading.BoundedSemaphore(self.max_pending)
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix='password-verify')
+        return self._executor
+
+    def _run(self, func, *args):
+        executor = self._get_executor()
+        # 排队中和执行中的任务总数受 max_pending 限制，名额在任务真正结束时才释放
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise VerifierOverloaded()
+        try:
+            future = executor.submit(func, *args)
+        except RuntimeError:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            self.timeouts += 1
+            raise VerifierOverloaded()
+
+    def verify(self, password_hash, password):
+        if not password_hash:
+            return False
+        started = time.perf_counter()
+        result = self._run(check_password_hash, password_hash, password)
+        self._latencies.append((time.perf_counter() - started) * 1000)
+        self.verified += 1
+        return result
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    @property
+    def method_prefix(self):
+        # 配置里可以写简写（如 'scrypt'），实际哈希前缀会带上默认参数，这里算一次真实前缀
+        if self._method_prefix is None:
+            self._method_prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return self._method_prefix
+
+    def needs_rehash(self, password_hash):
+        return password_hash.split('$', 1)[0] != self.method_prefix
+
+    def upgrade(self, user, password):
+        """登录成功后调用：哈希参数与配置不同时重新计算（调用方负责提交事务）"""
+        if not self.needs_rehash(user.password_hash):
+            return False
+        try:
+            user.password_hash = self.hash(password)
+        except VerifierOverloaded:
+            # 繁忙时不升级，下次登录再处理
+            return False
+        self.rehashed += 1
+        return True
+
+    def percentile(self, p):
+        latencies = sorted(self._latencies)
+        if not latencies:
+            return 0.0
+        index = min(len(latencies) - 1, int(round(p / 100 * (len(latencies) - 1))))
+        return round(latencies[index], 2)
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'method': self.method,
+            'verified': self.verified,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+            'rehashed': self.rehashed,
+            'p50_ms': self.percentile(50),
+            'p99_ms': self.percentile(99),
+        }
+
+
+password_verifier = PasswordVerifier()
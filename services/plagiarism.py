@@ -0,0 +1,214 @@
+# 作业查重：MinHash 签名 + LSH 分桶
+# 每份提交的文本（文字答案 + Word 附件文本）切成字符 n-gram，计算 128 个 MinHash 值作为签名，
+# 再把签名分成 32 段、每段 4 个值，每段的哈希就是一个桶。两份提交只要有一个桶相同就成为候选，
+# 只对候选用签名估算相似度，不需要两两比较全部文本。
+# 索引随提交增量更新：新提交只查询自己所在的桶，相似度够高的配对直接存入 SimilarPair，
+# 查重报告只读这张表。
+
+import functools
+import hashlib
+import re
+import struct
+import zlib
+from array import array
+from datetime import datetime
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 4
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_UINT64 = (1 << 64) - 1
+
+# 去掉空白和标点，只保留文字和数字
+_NOISE_RE = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def _permutations(seed=1, num_perm=NUM_PERM):
+    # 固定种子生成哈希参数，保证不同进程、不同时间计算的签名可以比较
+    import random
+    rng = random.Random(seed)
+    a = [rng.randint(1, _MERSENNE_PRIME - 1) for _ in range(num_perm)]
+    b = [rng.randint(0, _MERSENNE_PRIME - 1) for _ in range(num_perm)]
+    return a, b
+
+
+_A, _B = _permutations()
+
+
+@functools.lru_cache(maxsize=None)
+def _numpy_params():
+    # 第一次计算签名时才导入 NumPy（不拖慢应用启动），未安装时返回 None
+    try:
+        import numpy as np
+    except ImportError:  # pragma: no cover
+        return None
+    return np, np.array(_A, dtype=np.uint64), np.array(_B, dtype=np.uint64)
+
+
+def normalize(text):
+    return _NOISE_RE.sub('', (text or '').lower())
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """字符 n-gram 的 32 位哈希集合"""
+    text = normalize(text)
+    if len(text) < size:
+        return set()
+    return {zlib.crc32(text[i:i + size].encode('utf-8')) for i in range(len(text) - size + 1)}
+
+
+def signature(shingle_hashes):
+    """MinHash 签名（NUM_PERM 个 32 位整数）；NumPy 与纯 Python 实现结果一致"""
+    if not shingle_hashes:
+        return None
+    params = _numpy_params()
+    if params is not None:
+        np, a_np, b_np = params
+        hv = np.fromiter(shingle_hashes, dtype=np.uint64, count=len(shingle_hashes))
+        # uint64 乘法溢出会回绕，纯 Python 实现中用 & _UINT64 模拟同样的行为
+        phv = ((np.outer(a_np, hv) + b_np[:, None]) % np.uint64(_MERSENNE_PRIME)) & np.uint64(_MAX_HASH)
+        return array('I', phv.min(axis=1).astype(np.uint32).tobytes())
+    return array('I', (
+        min((((a * h) & _UINT64) + b & _UINT64) % _MERSENNE_PRIME & _MAX_HASH for h in shingle_hashes)
+        for a, b in zip(_A, _B)
+    ))
+
+
+def band_keys(sig):
+    """LSH 分段：返回 [(段号, 桶哈希)]，桶哈希为有符号 63 位整数以便存入 BIGINT"""
+    keys = []
+    for band in range(BANDS):
+        chunk = sig[band * ROWS:(band + 1) * ROWS].tobytes()
+        bucket = struct.unpack('<q', hashlib.blake2b(chunk, digest_size=8).digest())[0] >> 1
+        keys.append((band, bucket))
+    return keys
+
+
+def similarity(sig_a, sig_b):
+    """用签名估算 Jaccard 相似度"""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+def to_bytes(sig):
+    return sig.tobytes()
+
+
+def from_bytes(data):
+    sig = array('I')
+    sig.frombytes(data)
+    return sig
+
+
+class LshIndex:
+    """内存中的 LSH 索引（基准测试和离线分析使用；线上索引保存在数据库中）"""
+
+    def __init__(self):
+        self.signatures = {}
+        self.buckets = [dict() for _ in range(BANDS)]
+
+    def candidates(self, sig):
+        found = set()
+        for band, bucket in band_keys(sig):
+            found.update(self.buckets[band].get(bucket, ()))
+        return found
+
+    def add(self, item_id, sig, threshold=0.5):
+        """加入索引，返回与已有条目中相似度不低于 threshold 的 [(id, 相似度)]"""
+        matches = []
+        for other_id in self.candidates(sig):
+            score = similarity(sig, self.signatures[other_id])
+            if score >= threshold:
+                matches.append((other_id, score))
+        self.signatures[item_id] = sig
+        for band, bucket in band_keys(sig):
+            self.buckets[band].setdefault(bucket, []).append(item_id)
+        return matches
+
+
+def submission_text(submission):
+    """提交的全部文本：文字答案加上 Word 附件中提取的文本"""
+    from models import SubmissionPreview
+
+    parts = [submission.text_answer or '']
+    preview = SubmissionPreview.query.get(submission.id)
+    if preview is not None and preview.status == 'ready' and preview.file_path == submission.file_path:
+        parts.append(preview.text or '')
+    return '\n'.join(parts)
+
+
+def index_submission(submission_id, min_length=50, min_similarity=0.5):
+    """更新一份提交的签名和桶，并记录与历史提交的相似配对（需要应用上下文）"""
+    from sqlalchemy import or_, tuple_
+    from extensions import db
+    from models import AssignmentSubmission, SignatureBand, SimilarPair, SubmissionSignature
+
+    submission = AssignmentSubmission.query.get(submission_id)
+    if submission is None:
+        return []
+
+    # 重新提交时先清掉旧的索引和配对
+    SignatureBand.query.filter_by(submission_id=submission_id).delete(synchronize_session=False)
+    SubmissionSignature.query.filter_by(submission_id=submission_id).delete(synchronize_session=False)
+    SimilarPair.query.filter(or_(SimilarPair.submission_id == submission_id,
+                                 SimilarPair.other_submission_id == submission_id))\
+        .delete(synchronize_session=False)
+
+    text = submission_text(submission)
+    if len(normalize(text)) < min_length:
+        db.session.commit()
+        return []
+
+    sig = signature(shingles(text))
+    keys = band_keys(sig)
+
+    candidate_ids = {
+        other_id for (other_id,) in db.session.query(SignatureBand.submission_id)
+        .filter(tuple_(SignatureBand.band, SignatureBand.bucket).in_(keys))
+        .distinct()
+    }
+
+    matches = []
+    if candidate_ids:
+        candidates = SubmissionSignature.query.filter(
+            SubmissionSignature.submission_id.in_(candidate_ids),
+            SubmissionSignature.student_id != submission.student_id
+        ).all()
+        now = datetime.utcnow()
+        for other in candidates:
+            score = similarity(sig, from_bytes(other.signature))
+            if score < min_similarity:
+                continue
+            matches.append((other.submission_id, score))
+            db.session.add(SimilarPair(
+                submission_id=submission_id,
+                assignment_id=submission.assignment_id,
+                other_submission_id=other.submission_id,
+                other_assignment_id=other.assignment_id,
+                similarity=round(score, 4),
+                detected_at=now
+            ))
+
+    db.session.add(SubmissionSignature(
+        submission_id=submission_id,
+        assignment_id=submission.assignment_id,
+        student_id=submission.student_id,
+        signature=to_bytes(sig)
+    ))
+    db.session.add_all([SignatureBand(band=band, bucket=bucket, submission_id=submission_id)
+                        for band, bucket in keys])
+    db.session.commit()
+    return matches
+
+
+def similar_pairs(assignment_id, threshold, limit=200):
+    """某个作业涉及的相似配对（包括与其他作业、往届提交的相似），按相似度从高到低"""
+    from sqlalchemy import or_
+    from models import SimilarPair
+
+    return SimilarPair.query.filter(
+        or_(SimilarPair.assignment_id == assignment_id, SimilarPair.other_assignment_id == assignment_id),
+        SimilarPair.similarity >= threshold
+    ).order_by(SimilarPair.similarity.desc()).limit(limit).all()
@@ -0,0 +1,188 @@
+# SQL 查询分析
+# 通过 SQLAlchemy 引擎事件记录每个请求执行的查询数、数据库耗时和每条语句重复执行的次数。
+# 同一条 SELECT 在一个请求里执行次数达到阈值时视为 N+1 嫌疑（通常是模板或循环中的延迟加载），
+# 记录到日志并计入接口汇总；超过慢查询阈值的语句连同 EXPLAIN 结果写入慢查询日志
+# （配置了 QUERY_PROFILER_SLOW_LOG 时）。绑定参数里可能有密码哈希、答案等数据，日志只记录参数的类型。
+# 调试时可打开 QUERY_PROFILER_SERVER_TIMING，响应带 Server-Timing 头，
+# 浏览器开发者工具里可以直接看到每个请求的数据库耗时。
+# 按接口的汇总在 /metrics/queries（POST /metrics/queries/reset 清空），访问控制与 /metrics 相同。
+
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from logging.handlers import RotatingFileHandler
+
+from flask import abort, g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+slow_query_logger = logging.getLogger('teaching.slow_query')
+
+
+def redact_parameters(parameters):
+    """只保留绑定参数的类型，例如 (str, int) 或 {name: str}"""
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{key}: {type(value).__name__}' for key, value in parameters.items()) + '}'
+    if isinstance(parameters, (list, tuple)):
+        return '(' + ', '.join(type(value).__name__ for value in parameters) + ')'
+    return type(parameters).__name__
+
+
+class EndpointSummary:
+    __slots__ = ('requests', 'queries', 'max_queries', 'db_time', 'n_plus_one', 'patterns')
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.db_time = 0.0
+        self.n_plus_one = 0
+        self.patterns = Counter()
+
+    def to_dict(self, top=5):
+        return {
+            'requests': self.requests,
+            'avg_queries': round(self.queries / self.requests, 2) if self.requests else 0,
+            'max_queries': self.max_queries,
+            'avg_db_ms': round(self.db_time * 1000 / self.requests, 2) if self.requests else 0,
+            'n_plus_one_requests': self.n_plus_one,
+            'n_plus_one_statements': [{'statement': s, 'requests': c} for s, c in self.patterns.most_common(top)],
+        }
+
+
+class QueryProfiler:
+    def __init__(self):
+        self.enabled = False
+        self.n_plus_one_threshold = 5
+        self.slow_seconds = 0.1
+        self.server_timing = False
+        self._app = None
+        self._summaries = {}
+        self._lock = threading.Lock()
+        self.slow_queries = 0
+
+    def init_app(self, app):
+        self._app = app
+        self.enabled = app.config.get('QUERY_PROFILER_ENABLED', True)
+        self.n_plus_one_threshold = app.config.get('QUERY_PROFILER_N_PLUS_ONE', 5)
+        self.slow_seconds = app.config.get('QUERY_PROFILER_SLOW_MS', 100) / 1000
+        self.server_timing = app.config.get('QUERY_PROFILER_SERVER_TIMING', False)
+        app.extensions['query_profiler'] = self
+        if not self.enabled:
+            return
+
+        log_path = app.config.get('QUERY_PROFILER_SLOW_LOG')
+        if log_path and not slow_query_logger.handlers:
+            os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+            handler = RotatingFileHandler(log_path, maxBytes=10 * 1024 * 1024, backupCount=5, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            slow_query_logger.addHandler(handler)
+            slow_query_logger.setLevel(logging.INFO)
+
+        # 监听所有引擎（包括只读副本），只在请求中统计
+        if not event.contains(Engine, 'before_cursor_execute', self._before_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_execute)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule('/metrics/queries', 'query_report', self.report_view)
+        app.add_url_rule('/metrics/queries/reset', 'query_report_reset', self.reset_view, methods=['POST'])
+
+    def _start_request(self):
+        g.query_count = 0
+        g.query_time = 0.0
+        g.query_statements = Counter()
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._profiler_started = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_profiler_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+
+        if has_request_context() and 'query_count' in g:
+            g.query_count += 1
+            g.query_time += elapsed
+            g.query_statements[statement] += 1
+
+        if elapsed >= self.slow_seconds and not executemany:
+            self._log_slow_query(conn, statement, parameters, elapsed)
+
+    def _log_slow_query(self, conn, statement, parameters, elapsed):
+        self.slow_queries += 1
+        plan = None
+        if statement.lstrip()[:6].upper() == 'SELECT':
+            prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+            cursor = conn.connection.cursor()
+            try:
+                cursor.execute(prefix + statement, parameters)
+                plan = '\n'.join('  ' + ' | '.join(str(col) for col in row) for row in cursor.fetchall())
+            except Exception as e:
+                plan = f'  (EXPLAIN 失败: {e})'
+            finally:
+                cursor.close()
+        endpoint = request.endpoint if has_request_context() else '-'
+        slow_query_logger.info('慢查询 %.1fms endpoint=%s\n%s\n参数: %s%s', elapsed * 1000, endpoint,
+                               statement, redact_parameters(parameters), f'\n执行计划:\n{plan}' if plan else '')
+
+    def _finish_request(self, response):
+        if 'query_count' not in g:
+            return response
+
+        suspects = [s for s, count in g.query_statements.items()
+                    if count >= self.n_plus_one_threshold and s.lstrip()[:6].upper() == 'SELECT']
+        if suspects:
+            self._app.logger.warning('疑似 N+1 查询 endpoint=%s 查询数=%d\n%s', request.endpoint, g.query_count,
+                                     '\n'.join(f'  x{g.query_statements[s]}: {s}' for s in suspects))
+
+        endpoint = request.endpoint or request.path
+        with self._lock:
+            summary = self._summaries.get(endpoint)
+            if summary is None:
+                summary = self._summaries[endpoint] = EndpointSummary()
+            summary.requests += 1
+            summary.queries += g.query_count
+            summary.max_queries = max(summary.max_queries, g.query_count)
+            summary.db_time += g.query_time
+            if suspects:
+                summary.n_plus_one += 1
+                summary.patterns.update(suspects)
+
+        if self.server_timing:
+            response.headers.add('Server-Timing', f'db;dur={g.query_time * 1000:.1f};desc="{g.query_count} queries"')
+        return response
+
+    def report(self):
+        """按接口汇总，查询数多的排在前面"""
+        with self._lock:
+            items = [(endpoint, summary.to_dict()) for endpoint, summary in self._summaries.items()]
+        items.sort(key=lambda item: (item[1]['n_plus_one_requests'], item[1]['avg_queries']), reverse=True)
+        return {'endpoints': dict(items), 'slow_queries': self.slow_queries}
+
+    def reset(self):
+        with self._lock:
+            self._summaries.clear()
+            self.slow_queries = 0
+
+    @staticmethod
+    def _check_access():
+        from services.metrics import metrics
+        if not metrics.authorized():
+            abort(404)
+
+    def report_view(self):
+        self._check_access()
+        return jsonify(self.report())
+
+    def reset_view(self):
+        self._check_access()
+        self.reset()
+        return jsonify({'reset': True})
+
+
+query_profiler = QueryProfiler()
@@ -0,0 +1,194 @@
+# 题库与组卷
+# 题库中的题目不属于某一场考试，按知识点、难度、题型打标签，题干 + 选项的哈希用于去重。
+# 组卷按"组卷方案"进行，例如 [{知识点: 链表, 难度: 简单, 数量: 10}, {知识点: 链表, 难度: 困难, 数量: 5}]：
+# 每一项只通过 (knowledge_point, difficulty, question_type, id) 复合索引取出符合条件的题目 ID 列表，
+# 然后在内存中按种子抽样，不做 ORDER BY RANDOM() 这样的全表排序。
+# 为全班生成不同的试卷（每个学生一份变体）时，ID 列表只读取一次，每个学生用 (种子, 学号) 单独抽样，
+# 结果可以复现。
+
+import hashlib
+import json
+import random
+import re
+
+DIFFICULTIES = {
+    'easy': 1, 'medium': 2, 'hard': 3,
+    '简单': 1, '容易': 1, '中等': 2, '一般': 2, '困难': 3, '难': 3,
+    '1': 1, '2': 2, '3': 3,
+}
+DIFFICULTY_LABELS = {1: '简单', 2: '中等', 3: '困难'}
+
+_SPACE_RE = re.compile(r'\s+')
+
+
+class BlueprintError(ValueError):
+    pass
+
+
+def content_hash(question_type, content, options=None):
+    """题型 + 题干 + 选项的哈希（忽略空白差异），相同题目只保存一份"""
+    if isinstance(options, (list, dict)):
+        options = json.dumps(options, ensure_ascii=False, sort_keys=True)
+    normalized = '\x1f'.join(_SPACE_RE.sub('', part or '') for part in (question_type, content, options))
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+def parse_difficulty(value):
+    if isinstance(value, int):
+        return value if value in DIFFICULTY_LABELS else None
+    return DIFFICULTIES.get(str(value or '').strip().lower())
+
+
+def parse_blueprint(items):
+    """校验组卷方案，返回 [(知识点, 难度, 题型, 数量)]；知识点、难度、题型为 None 表示不限"""
+    if not isinstance(items, list) or not items:
+        raise BlueprintError('组卷方案不能为空')
+    blueprint = []
+    for i, item in enumerate(items, start=1):
+        if not isinstance(item, dict):
+            raise BlueprintError(f'第 {i} 项格式不正确')
+        try:
+            count = int(item.get('count', 0))
+        except (TypeError, ValueError):
+            count = 0
+        if count <= 0:
+            raise BlueprintError(f'第 {i} 项的题目数量必须大于 0')
+        difficulty = None
+        if item.get('difficulty') not in (None, ''):
+            difficulty = parse_difficulty(item['difficulty'])
+            if difficulty is None:
+                raise BlueprintError(f'第 {i} 项的难度无法识别: {item["difficulty"]}')
+        blueprint.append((item.get('knowledge_point') or None, difficulty, item.get('question_type') or None, count))
+    return blueprint
+
+
+def load_strata(connection, blueprint, table=None):
+    """为组卷方案的每一项取出符合条件的题目 ID（只走复合索引，不读题目内容）"""
+    from sqlalchemy import select
+
+    if table is None:
+        from models import BankQuestion
+        table = BankQuestion.__table__
+    c = table.c
+
+    strata = {}
+    for knowledge_point, difficulty, question_type, _ in blueprint:
+        key = (knowledge_point, difficulty, question_type)
+        if key in strata:
+            continue
+        query = select(c.id)
+        if knowledge_point is not None:
+            query = query.where(c.knowledge_point == knowledge_point)
+        if difficulty is not None:
+            query = query.where(c.difficulty == difficulty)
+        if question_type is not None:
+            query = query.where(c.question_type == question_type)
+        strata[key] = connection.execute(query).scalars().all()
+    return strata
+
+
+def sample_paper(strata, blueprint, rng):
+    """按组卷方案抽题，返回题目 ID 列表；方案各项有重叠时同一道题不会被抽两次"""
+    chosen = []
+    seen = set()
+    for knowledge_point, difficulty, question_type, count in blueprint:
+        ids = strata[(knowledge_point, difficulty, question_type)]
+        # 多抽 len(seen) 道再去掉已选的题，结果仍是剩余题目中的均匀抽样，且不用复制整个 ID 列表
+        picked = [i for i in rng.sample(ids, min(len(ids), count + len(seen))) if i not in seen][:count]
+        if len(picked) < count:
+            label = ' / '.join(str(v) for v in (knowledge_point, DIFFICULTY_LABELS.get(difficulty), question_type)
+                               if v is not None) or '全部题目'
+            raise BlueprintError(f'题库中"{label}"的可用题目少于需要的 {count} 道')
+        chosen.extend(picked)
+        seen.update(picked)
+    return chosen
+
+
+def generate_variants(strata, blueprint, seed, student_ids):
+    """为每个学生生成一份试卷变体：{学生ID: 题目ID列表}，同样的种子和学生得到同样的试卷"""
+    return {student_id: sample_paper(strata, blueprint, random.Random(f'{seed}:{student_id}'))
+            for student_id in student_ids}
+
+
+def add_questions(rows, teacher_id, batch_size=1000):
+    """批量加入题库，按内容哈希去重；返回 (新增数, 重复数)。
+    先查询跳过已有的题目，插入时再由唯一键兜底：同时导入相同题目时后写入的一方直接跳过，不会报错"""
+    from extensions import db
+    from models import BankQuestion
+    from services.database import insert_or_ignore
+
+    created = duplicates = 0
+    for start in range(0, len(rows), batch_size):
+        batch = {}
+        for row in rows[start:start + batch_size]:
+            digest = content_hash(row['question_type'], row['content'], row.get('options'))
+            if digest in batch:
+                duplicates += 1
+                continue
+            batch[digest] = row
+
+        existing = {digest for (digest,) in db.session.query(BankQuestion.content_hash)
+                    .filter(BankQuestion.content_hash.in_(list(batch)))}
+        duplicates += len(existing)
+        mappings = [{
+            'teacher_id': teacher_id,
+            'question_type': row['question_type'],
+            'knowledge_point': row.get('knowledge_point'),
+            'difficulty': parse_difficulty(row.get('difficulty')) or 2,
+            'content': row['content'],
+            'options': row['options'] if isinstance(row.get('options'), str) or row.get('options') is None
+            else json.dumps(row['options'], ensure_ascii=False),
+            'answer': row.get('answer'),
+            'score': row.get('score') or 2.0,
+            'content_hash': digest,
+        } for digest, row in batch.items() if digest not in existing]
+        if not mappings:
+            continue
+        result = db.session.execute(insert_or_ignore(BankQuestion.__table__, ('content_hash',)), mappings)
+        # 查询之后被其他导入抢先写入的题目也算重复；驱动不能给出批量影响行数时按全部写入计
+        inserted = result.rowcount if result.rowcount >= 0 else len(mappings)
+        created += inserted
+        duplicates += len(mappings) - inserted
+    db.session.commit()
+    return created, duplicates
+
+
+def build_exam_from_bank(exam_id, blueprint, seed, student_ids=None):
+    """按组卷方案为考试出题（需要应用上下文）。
+    不传 student_ids 时全班同一份试卷；传入时每个学生一份变体，所有变体用到的题目复制到考试中，
+    每个学生的题目记录在 PaperVariant 里，另外生成一份 student_id 为空的默认变体给之后加入班级的学生。
+    返回 {'questions': 题目数, 'variants': 变体数}"""
+    from extensions import db
+    from models import BankQuestion, ExamQuestion, PaperVariant
+
+    strata = load_strata(db.session.connection(), blueprint)
+    if student_ids:
+        variants = generate_variants(strata, blueprint, seed, list(student_ids) + [None])
+        bank_ids = sorted({i for ids in variants.values() for i in ids})
+    else:
+        variants = {}
+        bank_ids = sample_paper(strata, blueprint, random.Random(str(seed)))
+
+    # 重新出题时先清掉之前生成的题目和变体；逐个通过 ORM 删除，触发全文检索和试卷缓存的删除事件
+    for obj in ExamQuestion.query.filter_by(exam_id=exam_id).all() + \
+            PaperVariant.query.filter_by(exam_id=exam_id).all():
+        db.session.delete(obj)
+    db.session.flush()
+
+    bank = {q.id: q for q in BankQuestion.query.filter(BankQuestion.id.in_(bank_ids))}
+    copies = {}
+    for bank_id in bank_ids:
+        q = bank[bank_id]
+        copies[bank_id] = ExamQuestion(exam_id=exam_id, question_type=q.question_type, content=q.content,
+                                       options=q.options, answer=q.answer, score=q.score)
+    db.session.add_all(copies.values())
+    db.session.flush()
+
+    db.session.add_all([PaperVariant(
+        exam_id=exam_id,
+        student_id=student_id,
+        seed=str(seed),
+        question_ids=json.dumps([copies[i].id for i in ids])
+    ) for student_id, ids in variants.items()])
+    db.session.commit()
+    return {'questions': len(copies), 'variants': len(student_ids or ())}
@@ -0,0 +1,99 @@
+# 学生名单的游标（keyset）分页
+# 按 (class_id, student_id, id) 排序，下一页从上一页最后一行之后开始查，
+# 配合 ix_user_role_class_student 索引，翻到任何一页的代价都一样，不需要 OFFSET。
+
+import base64
+import json
+
+from sqlalchemy import and_, or_
+
+from models import ClassInfo, User
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(student):
+    raw = json.dumps([student.class_id, student.student_id, student.id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """解析游标，格式不正确时返回 None（从第一页开始）"""
+    if not cursor:
+        return None
+    try:
+        class_id, student_id, user_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return (
+            int(class_id) if class_id is not None else None,
+            str(student_id) if student_id is not None else None,
+            int(user_id),
+        )
+    except (ValueError, TypeError):
+        return None
+
+
+def _after(column, value, tail):
+    # 排序中 NULL 排在最前（见 fetch_page 的 nullsfirst），因此：
+    # 游标值为 NULL 时，后面的行是同为 NULL 且 tail 成立的行，或者所有非 NULL 的行
+    if value is None:
+        return or_(and_(column.is_(None), tail), column.isnot(None))
+    return or_(column > value, and_(column == value, tail))
+
+
+def _cursor_condition(cursor):
+    class_id, student_id, user_id = cursor
+    return _after(User.class_id, class_id,
+                  _after(User.student_id, student_id, User.id > user_id))
+
+
+def roster_query(college=None, major=None, class_id=None):
+    """学生名单基础查询，学院/专业通过 ClassInfo 子查询过滤"""
+    query = User.query.filter(User.role == 'student')
+
+    if class_id:
+        query = query.filter(User.class_id == class_id)
+
+    if college or major:
+        class_ids = ClassInfo.query.with_entities(ClassInfo.id)
+        if college:
+            class_ids = class_ids.filter(ClassInfo.college == college)
+        if major:
+            class_ids = class_ids.filter(ClassInfo.major == major)
+        query = query.filter(User.class_id.in_(class_ids.scalar_subquery()))
+
+    return query
+
+
+def fetch_page(cursor=None, limit=DEFAULT_PAGE_SIZE, **filters):
+    """返回 (students, next_cursor)，next_cursor 为 None 表示没有下一页"""
+    limit = max(1, min(int(limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+    query = roster_query(**filters)
+
+    position = decode_cursor(cursor)
+    if position is not None:
+        query = query.filter(_cursor_condition(position))
+
+    # 多取一行用来判断是否还有下一页
+    students = query.order_by(
+        User.class_id.asc().nullsfirst(),
+        User.student_id.asc().nullsfirst(),
+        User.id.asc()
+    ).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(students) > limit:
+        students = students[:limit]
+        next_cursor = encode_cursor(students[-1])
+
+    return students, next_cursor
+
+
+def serialize_student(student):
+    return {
+        'id': student.id,
+        'name': student.name,
+        'phone': student.phone,
+        'student_id': student.student_id,
+        'class_id': student.class_id,
+    }
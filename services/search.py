@@ -0,0 +1,260 @@
+# 全文检索：SQLite FTS5 索引覆盖作业、考试、题目和学生提交
+# 内容几乎都是中文，FTS5 自带的分词器不会切分中文，所以写入前先切成单字和相邻两字的词组
+# （"数据结构" -> "数 据 结 构 数据 据结 结构"），英文和数字按单词保留；查询多字词时只用两字词组，
+# 单字查询才用单字。
+# 索引在每次 flush 后批量更新（与业务数据在同一事务里），查询按 bm25 排序并分页。
+
+import re
+
+# 行号 = 源记录 ID * 8 + 类型编号，更新和删除直接按 rowid 定位，不用扫描 UNINDEXED 列
+DOC_TYPES = {
+    'assignment': 1,
+    'exam': 2,
+    'exam_question': 3,
+    'assignment_question': 4,
+    'submission': 5,
+}
+DOC_TYPE_LABELS = {
+    'assignment': '作业',
+    'exam': '考试',
+    'exam_question': '考试题目',
+    'assignment_question': '作业题目',
+    'submission': '学生提交',
+}
+EXCERPT_LENGTH = 200
+
+_TOKEN_RE = re.compile(r'[㐀-䶿一-鿿豈-﫿]+|[a-z0-9]+')
+_CJK_RE = re.compile(r'[㐀-䶿一-鿿豈-﫿]')
+
+
+def tokenize(text, unigrams=False):
+    """把文本切成空格分隔的词：中文按相邻两字切分（unigrams=True 时另加单字），英文数字按单词"""
+    tokens = []
+    for run in _TOKEN_RE.findall((text or '').lower()):
+        if _CJK_RE.match(run) and len(run) > 1:
+            if unigrams:
+                tokens.extend(run)
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return ' '.join(tokens)
+
+
+def match_expression(query):
+    """把用户输入转换成 FTS5 查询：所有词都要出现"""
+    return ' '.join(f'"{token}"' for token in tokenize(query).split())
+
+
+def _rowid(doc_type, doc_id):
+    return doc_id * 8 + DOC_TYPES[doc_type]
+
+
+class SearchIndex:
+    def __init__(self):
+        self.available = False
+        self._sources = {}
+
+    def init_app(self, app):
+        from sqlalchemy import event
+        from extensions import db
+        from models import Assignment, AssignmentQuestion, AssignmentSubmission, Exam, ExamQuestion, \
+            SubmissionPreview
+
+        app.extensions['search_index'] = self
+        if not app.config.get('SEARCH_ENABLED', True):
+            return
+        with app.app_context():
+            self.available = self.create_table(db.engine)
+        if not self.available:
+            app.logger.warning('数据库不支持 FTS5，全文检索不可用')
+            return
+
+        sources = {
+            Assignment: ('assignment', 'id'),
+            Exam: ('exam', 'id'),
+            ExamQuestion: ('exam_question', 'id'),
+            AssignmentQuestion: ('assignment_question', 'id'),
+            AssignmentSubmission: ('submission', 'id'),
+            # 附件文本提取完成后，重新索引对应的提交
+            SubmissionPreview: ('submission', 'submission_id'),
+        }
+
+        # 写入时只记下变化的记录，flush 结束后按类型批量读取、批量写入索引（仍在同一事务中）
+        # 监听器只注册一次，重复调用 create_app() 不会叠加
+        self._sources = sources
+        for model in sources:
+            for name in ('after_insert', 'after_update', 'after_delete'):
+                if not event.contains(model, name, self._remember):
+                    event.listen(model, name, self._remember)
+        if not event.contains(db.session, 'after_flush', self._update_index):
+            event.listen(db.session, 'after_flush', self._update_index)
+            event.listen(db.session, 'after_rollback', self._forget_changed)
+
+    def _remember(self, mapper, connection, target):
+        from extensions import db
+        doc_type, id_attr = self._sources[mapper.class_]
+        db.session.info.setdefault('search_changed', set()).add((doc_type, getattr(target, id_attr)))
+
+    def _update_index(self, session, flush_context):
+        changed = session.info.pop('search_changed', None)
+        if not changed:
+            return
+        by_type = {}
+        for doc_type, doc_id in changed:
+            by_type.setdefault(doc_type, []).append(doc_id)
+        connection = session.connection()
+        for doc_type, doc_ids in by_type.items():
+            self.index_documents(connection, doc_type, doc_ids)
+
+    @staticmethod
+    def _forget_changed(session):
+        session.info.pop('search_changed', None)
+
+    @staticmethod
+    def create_table(engine):
+        from sqlalchemy import text
+        from sqlalchemy.exc import OperationalError
+
+        if engine.dialect.name != 'sqlite':
+            return False
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+                    "doc_type UNINDEXED, doc_id UNINDEXED, teacher_id UNINDEXED, parent_id UNINDEXED, "
+                    "label UNINDEXED, excerpt UNINDEXED, title, body, tokenize='unicode61')"
+                ))
+        except OperationalError:
+            return False
+        return True
+
+    def index_documents(self, connection, doc_type, doc_ids, batch_size=500):
+        """从数据库读取源记录并重写它们的索引；已删除的记录只删除索引"""
+        from sqlalchemy import text
+
+        if not self.available:
+            return 0
+        count = 0
+        doc_ids = sorted(doc_ids)
+        for start in range(0, len(doc_ids), batch_size):
+            batch = doc_ids[start:start + batch_size]
+            documents = load_documents(connection, doc_type, batch)
+            connection.execute(text('DELETE FROM search_index WHERE rowid = :rowid'),
+                               [{'rowid': _rowid(doc_type, doc_id)} for doc_id in batch])
+            if not documents:
+                continue
+            connection.execute(text(
+                'INSERT INTO search_index '
+                '(rowid, doc_type, doc_id, teacher_id, parent_id, label, excerpt, title, body) '
+                'VALUES (:rowid, :doc_type, :doc_id, :teacher_id, :parent_id, :label, :excerpt, :title, :body)'
+            ), [{
+                'rowid': _rowid(doc_type, doc_id),
+                'doc_type': doc_type,
+                'doc_id': doc_id,
+                'teacher_id': document['teacher_id'],
+                'parent_id': document['parent_id'],
+                'label': (document['label'] or '')[:200],
+                'excerpt': (document['body'] or '')[:EXCERPT_LENGTH],
+                'title': tokenize(document['title'], unigrams=True),
+                'body': tokenize(document['body'], unigrams=True),
+            } for doc_id, document in documents.items()])
+            count += len(documents)
+        return count
+
+    def rebuild(self, connection):
+        """重建整个索引，返回写入的文档数"""
+        from sqlalchemy import select, text
+        from models import Assignment, AssignmentQuestion, AssignmentSubmission, Exam, ExamQuestion
+
+        if not self.available:
+            return 0
+        connection.execute(text('DELETE FROM search_index'))
+        count = 0
+        for doc_type, model in (('assignment', Assignment), ('exam', Exam), ('exam_question', ExamQuestion),
+                                ('assignment_question', AssignmentQuestion),
+                                ('submission', AssignmentSubmission)):
+            ids = connection.execute(select(model.__table__.c.id)).scalars().all()
+            count += self.index_documents(connection, doc_type, ids)
+        return count
+
+    def search(self, query, teacher_id, doc_type=None, page=1, per_page=20):
+        """返回 (结果列表, 总数)；结果按相关度排序，标题命中权重高于正文"""
+        from sqlalchemy import text
+        from extensions import db
+
+        expression = match_expression(query)
+        if not self.available or not expression:
+            return [], 0
+
+        conditions = 'search_index MATCH :expression AND teacher_id = :teacher_id'
+        params = {'expression': expression, 'teacher_id': teacher_id}
+        if doc_type in DOC_TYPES:
+            conditions += ' AND doc_type = :doc_type'
+            params['doc_type'] = doc_type
+
+        total = db.session.execute(text(f'SELECT count(*) FROM search_index WHERE {conditions}'), params).scalar()
+        rows = db.session.execute(text(
+            'SELECT doc_type, doc_id, parent_id, label, excerpt, '
+            'bm25(search_index, 0, 0, 0, 0, 0, 0, 8.0, 1.0) AS rank '
+            f'FROM search_index WHERE {conditions} ORDER BY rank LIMIT :limit OFFSET :offset'
+        ), dict(params, limit=per_page, offset=(max(page, 1) - 1) * per_page)).mappings().all()
+        return [dict(row) for row in rows], total
+
+
+def load_documents(connection, doc_type, doc_ids):
+    """批量读取源记录，返回 {id: {teacher_id, parent_id, label, title, body}}"""
+    from sqlalchemy import select
+    from models import Assignment, AssignmentQuestion, AssignmentSubmission, Exam, ExamQuestion, \
+        SubmissionPreview, User
+
+    a, e = Assignment.__table__.c, Exam.__table__.c
+    documents = {}
+    if doc_type == 'assignment':
+        for row in connection.execute(select(a.id, a.teacher_id, a.title, a.description).where(a.id.in_(doc_ids))):
+            documents[row.id] = {'teacher_id': row.teacher_id, 'parent_id': None, 'label': row.title,
+                                 'title': row.title, 'body': row.description}
+
+    elif doc_type == 'exam':
+        for row in connection.execute(select(e.id, e.teacher_id, e.title, e.description).where(e.id.in_(doc_ids))):
+            documents[row.id] = {'teacher_id': row.teacher_id, 'parent_id': None, 'label': row.title,
+                                 'title': row.title, 'body': row.description}
+
+    elif doc_type == 'exam_question':
+        q = ExamQuestion.__table__.c
+        for row in connection.execute(select(q.id, q.exam_id, q.content, q.options, e.teacher_id, e.title)
+                                      .join_from(ExamQuestion.__table__, Exam.__table__, e.id == q.exam_id)
+                                      .where(q.id.in_(doc_ids))):
+            documents[row.id] = {'teacher_id': row.teacher_id, 'parent_id': row.exam_id, 'label': row.title,
+                                 'title': '', 'body': '\n'.join(filter(None, (row.content, row.options)))}
+
+    elif doc_type == 'assignment_question':
+        q = AssignmentQuestion.__table__.c
+        for row in connection.execute(select(q.id, q.assignment_id, q.content, a.teacher_id, a.title)
+                                      .join_from(AssignmentQuestion.__table__, Assignment.__table__,
+                                                 a.id == q.assignment_id)
+                                      .where(q.id.in_(doc_ids))):
+            documents[row.id] = {'teacher_id': row.teacher_id, 'parent_id': row.assignment_id, 'label': row.title,
+                                 'title': '', 'body': row.content}
+
+    elif doc_type == 'submission':
+        s, u, p = AssignmentSubmission.__table__.c, User.__table__.c, SubmissionPreview.__table__.c
+        rows = connection.execute(
+            select(s.id, s.assignment_id, s.text_answer, s.file_path, a.teacher_id, a.title, u.name,
+                   p.text.label('file_text'), p.file_path.label('preview_path'), p.status)
+            .select_from(AssignmentSubmission.__table__)
+            .join(Assignment.__table__, a.id == s.assignment_id)
+            .join(User.__table__, u.id == s.student_id)
+            .outerjoin(SubmissionPreview.__table__, p.submission_id == s.id)
+            .where(s.id.in_(doc_ids))
+        )
+        for row in rows:
+            parts = [row.text_answer or '']
+            if row.status == 'ready' and row.preview_path == row.file_path:
+                parts.append(row.file_text or '')
+            documents[row.id] = {'teacher_id': row.teacher_id, 'parent_id': row.assignment_id,
+                                 'label': f'{row.title} - {row.name}', 'title': '', 'body': '\n'.join(parts)}
+
+    return documents
+
+
+search_index = SearchIndex()
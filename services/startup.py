@@ -0,0 +1,109 @@
+# 启动耗时统计和 Jinja 模板字节码缓存
+# 应用工厂把每个启动阶段（导入、配置、各组件初始化、注册蓝图）的耗时记在 StartupTimer 中，
+# 第一个请求结束后再补上首个请求的耗时（其中包括模板编译），并把整份报告写入日志，
+# 同时作为 teaching_startup_* 指标输出。
+# 模板编译结果保存在磁盘上由所有 worker 共享：flask precompile-templates 在部署时编译全部模板，
+# 之后每个 worker 第一次渲染模板时只需读取字节码，不再解析模板源码。
+
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from jinja2 import FileSystemBytecodeCache
+
+
+class AtomicBytecodeCache(FileSystemBytecodeCache):
+    """多个 worker 可能同时写同一个模板的缓存，先写临时文件再替换，避免读到写了一半的文件"""
+
+    def dump_bytecode(self, bucket):
+        name = self._get_cache_filename(bucket)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                bucket.write_bytecode(f)
+            os.replace(tmp_path, name)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+def init_template_cache(app):
+    """给应用配置模板字节码缓存（必须在第一次使用 jinja_env 之前调用）"""
+    directory = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    cache = AtomicBytecodeCache(directory)
+    app.jinja_options = {**app.jinja_options, 'bytecode_cache': cache}
+    return cache
+
+
+def precompile_templates(app):
+    """加载全部模板（写入字节码缓存），返回 (成功数, [(模板名, 错误)])"""
+    loaded, errors = 0, []
+    for name in app.jinja_env.list_templates():
+        try:
+            app.jinja_env.get_template(name)
+            loaded += 1
+        except Exception as e:
+            errors.append((name, f'{e.__class__.__name__}: {e}'))
+    return loaded, errors
+
+
+class StartupTimer:
+    def __init__(self, import_seconds=0.0):
+        self.phases = [('import', import_seconds)] if import_seconds else []
+        self.first_request = None
+        self._first_started = None
+        self._first_thread = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def init_app(self, app):
+        self.logger = app.logger
+        app.extensions['startup'] = self
+        # 最先注册，首个请求的耗时包含其他组件的请求钩子
+        app.before_request_funcs.setdefault(None, []).insert(0, self._before_request)
+        app.teardown_request(self._teardown_request)
+
+    def _before_request(self):
+        if self._first_started is None:
+            with self._lock:
+                if self._first_started is None:
+                    self._first_started = time.perf_counter()
+                    self._first_thread = threading.get_ident()
+
+    def _teardown_request(self, exc):
+        if self.first_request is None and self._first_started is not None \
+                and threading.get_ident() == self._first_thread:
+            self.first_request = time.perf_counter() - self._first_started
+            self.logger.info('启动耗时：%s', self.summary())
+
+    @property
+    def total(self):
+        return sum(seconds for _, seconds in self.phases)
+
+    def summary(self):
+        parts = [f'{name} {seconds * 1000:.0f}ms' for name, seconds in self.phases]
+        parts.append(f'合计 {self.total * 1000:.0f}ms')
+        if self.first_request is not None:
+            parts.append(f'首个请求 {self.first_request * 1000:.0f}ms')
+        return '，'.join(parts)
+
+    def stats(self):
+        stats = {f'{name}_seconds': round(seconds, 4) for name, seconds in self.phases}
+        stats['total_seconds'] = round(self.total, 4)
+        if self.first_request is not None:
+            stats['first_request_seconds'] = round(self.first_request, 4)
+        return stats
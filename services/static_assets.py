@@ -0,0 +1,177 @@
+# 静态资源指纹与预压缩
+# flask build-assets 把 static/ 下的 CSS、JS、图片等复制到 static/dist/，文件名带上内容哈希
+# （css/style.css → dist/css/style.3f2a9c1b7d.css），文本类文件同时写出 .gz 和 .br 压缩版本，
+# 并生成 manifest.json（原路径 → 指纹路径）。
+# 应用启动时读取清单：url_for('static', filename='css/style.css') 自动改写成指纹路径；
+# 指纹文件内容永不改变，响应带一年的 immutable 缓存头，浏览器之后的页面加载不再请求静态资源；
+# 客户端支持时直接发送预先压缩好的文件并设置 Content-Encoding，不在请求时压缩。
+# 没有清单时（开发环境未构建）一切照旧，由 Flask 默认的静态文件处理返回原文件。
+# 修改静态文件后需要重新执行 flask build-assets。
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# 不参与构建的目录：用户上传的文件和构建输出本身
+SKIP_DIRS = ('uploads', 'dist')
+# static 下不对外提供的目录（旧版本把作业附件保存在 static/uploads）
+PRIVATE_DIRS = ('uploads',)
+ASSET_EXTENSIONS = ('.css', '.js', '.map', '.svg', '.png', '.jpg', '.jpeg', '.gif', '.ico', '.webp',
+                    '.woff', '.woff2', '.ttf', '.eot', '.json', '.txt')
+# 值得压缩的文本类文件，图片和字体本身已经压缩过
+COMPRESS_EXTENSIONS = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.ttf', '.eot')
+# 文件大于这个字节数才压缩，太小的文件压缩后可能反而更大
+COMPRESS_MIN_SIZE = 256
+HASH_LENGTH = 10
+MANIFEST_NAME = 'manifest.json'
+
+# 按优先级排列的编码：(Accept-Encoding 中的名字, 文件后缀)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _fingerprint(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            digest.update(block)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def _compress(path, data):
+    """写出 .gz 和（安装了 brotli 时）.br，压缩后没有变小的不保留，返回写出的后缀"""
+    written = []
+    # mtime=0 使相同内容每次构建出相同的 .gz
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(data):
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+            written.append(suffix)
+    return written
+
+
+def build(static_folder, output_dir='dist'):
+    """构建全部静态资源，返回清单 {原路径: 指纹路径}（路径都相对 static_folder，用 / 分隔）"""
+    output_root = os.path.join(static_folder, output_dir)
+    # 旧的构建结果整体替换，避免指纹文件越积越多
+    staging_root = output_root + '.tmp'
+    shutil.rmtree(staging_root, ignore_errors=True)
+    os.makedirs(staging_root)
+
+    skip_dirs = set(SKIP_DIRS) | {output_dir, output_dir + '.tmp'}
+    manifest = {}
+    for root, dirs, files in os.walk(static_folder):
+        relative_root = os.path.relpath(root, static_folder)
+        if relative_root == '.':
+            dirs[:] = sorted(d for d in dirs if d not in skip_dirs)
+        else:
+            dirs.sort()
+        for name in sorted(files):
+            stem, extension = os.path.splitext(name)
+            if extension.lower() not in ASSET_EXTENSIONS:
+                continue
+            source = os.path.join(root, name)
+            relative = os.path.normpath(os.path.join(relative_root, name)).replace(os.sep, '/')
+            hashed_name = f'{stem}.{_fingerprint(source)}{extension}'
+            target_dir = os.path.join(staging_root, relative_root)
+            os.makedirs(target_dir, exist_ok=True)
+            target = os.path.join(target_dir, hashed_name)
+            shutil.copyfile(source, target)
+
+            if extension.lower() in COMPRESS_EXTENSIONS and os.path.getsize(source) >= COMPRESS_MIN_SIZE:
+                with open(source, 'rb') as f:
+                    _compress(target, f.read())
+
+            manifest[relative] = os.path.normpath(
+                os.path.join(output_dir, relative_root, hashed_name)).replace(os.sep, '/')
+
+    with open(os.path.join(staging_root, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    shutil.rmtree(output_root, ignore_errors=True)
+    os.replace(staging_root, output_root)
+    return manifest
+
+
+class StaticAssets:
+    def __init__(self):
+        self.manifest = {}
+        # 指纹路径 → 已有的压缩后缀集合
+        self._hashed = {}
+        self.max_age = 365 * 24 * 3600
+
+    def init_app(self, app):
+        self.max_age = app.config.get('STATIC_ASSETS_MAX_AGE', self.max_age)
+        self.output_dir = app.config.get('STATIC_ASSETS_DIR', 'dist')
+        app.extensions['static_assets'] = self
+        if not app.static_folder:
+            return
+
+        # 即使不启用指纹资源也要接管 static 视图，拒绝访问旧版本留在 static 下的上传文件
+        self._default_view = app.view_functions['static']
+        app.view_functions['static'] = self.send_static_file
+        if not app.config.get('STATIC_ASSETS_ENABLED', True):
+            return
+        self.load(app.static_folder)
+        app.url_defaults(self._rewrite_url)
+
+    def load(self, static_folder):
+        """读取清单，没有构建过时清单为空"""
+        self.static_folder = static_folder
+        try:
+            with open(os.path.join(static_folder, self.output_dir, MANIFEST_NAME), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+
+        hashed = {}
+        for path in manifest.values():
+            full_path = os.path.join(static_folder, path)
+            hashed[path] = {suffix for _, suffix in ENCODINGS if os.path.exists(full_path + suffix)}
+        self.manifest = manifest
+        self._hashed = hashed
+        return len(manifest)
+
+    def _rewrite_url(self, endpoint, values):
+        if endpoint == 'static':
+            hashed = self.manifest.get(values.get('filename'))
+            if hashed is not None:
+                values['filename'] = hashed
+
+    def send_static_file(self, filename):
+        from flask import abort, request, send_from_directory
+
+        if filename.replace('\\', '/').lstrip('/').split('/', 1)[0].lower() in PRIVATE_DIRS:
+            abort(404)
+        suffixes = self._hashed.get(filename)
+        if suffixes is None:
+            return self._default_view(filename=filename)
+
+        accepted = request.accept_encodings
+        encoding, suffix = next(((name, suffix) for name, suffix in ENCODINGS
+                                 if suffix in suffixes and accepted[name]), (None, ''))
+        # 预压缩文件的 Content-Type 仍然是原文件的类型
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = send_from_directory(self.static_folder, filename + suffix, mimetype=mimetype,
+                                       download_name=os.path.basename(filename),
+                                       max_age=self.max_age, conditional=True)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if suffixes:
+            response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+static_assets = StaticAssets()
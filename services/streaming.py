@@ -0,0 +1,202 @@
+# 流式响应工具：边生成边输出的 CSV、XLSX 和 ZIP
+# ZipFile 写入不可 seek 的输出时会在每个文件后面写数据描述符，
+# 因此可以把压缩包按块交给 WSGI 服务器，不需要临时文件，也不会把整个压缩包放在内存里。
+
+import csv
+import io
+import re
+import zipfile
+from urllib.parse import quote
+
+from markupsafe import escape
+
+# 每写入多少行向客户端输出一次
+FLUSH_ROWS = 200
+
+
+class _ChunkSink(io.RawIOBase):
+    """只写、不可 seek 的缓冲区，写入的数据由 drain() 取走"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def attachment_headers(filename):
+    """Content-Disposition 头，兼容中文文件名"""
+    fallback = re.sub(r'[^A-Za-z0-9._-]', '_', filename)
+    return {'Content-Disposition': f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"}
+
+
+# Excel 把以这些字符开头的单元格当作公式
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_cell(value):
+    """学生填写的文本（姓名、答案等）以公式字符开头时加单引号，Excel 按文本显示；数值不变"""
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_csv(header, rows):
+    # 带 BOM，Excel 打开中文不乱码
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow([_csv_cell(v) for v in header])
+
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_csv_cell(v) for v in row])
+        if count % FLUSH_ROWS == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue().encode('utf-8')
+
+
+class ZipStream:
+    """逐个写入文件、边写边输出的 ZIP 包"""
+
+    def __init__(self, compression=zipfile.ZIP_DEFLATED):
+        self._sink = _ChunkSink()
+        self._zip = zipfile.ZipFile(self._sink, 'w', compression=compression, allowZip64=True)
+
+    def writestr(self, name, data):
+        self._zip.writestr(name, data)
+        return self._sink.drain()
+
+    def open(self, name, compress_type=None):
+        info = zipfile.ZipInfo(name)
+        info.compress_type = self._zip.compression if compress_type is None else compress_type
+        return self._zip.open(info, 'w', force_zip64=True)
+
+    def drain(self):
+        return self._sink.drain()
+
+    def write_file(self, name, path, compress_type=None, block_size=64 * 1024):
+        """把磁盘上的文件按块写入压缩包，逐块产出压缩后的数据"""
+        with open(path, 'rb') as src, self.open(name, compress_type) as dest:
+            while True:
+                block = src.read(block_size)
+                if not block:
+                    break
+                dest.write(block)
+                data = self.drain()
+                if data:
+                    yield data
+        yield self.drain()
+
+    def close(self):
+        self._zip.close()
+        return self._sink.drain()
+
+
+_XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+        '<borders count="1"><border/></borders>'
+        '<cellStyleXfs count="1"><xf/></cellStyleXfs>'
+        '<cellXfs count="1"><xf xfId="0"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+
+# XML 中不允许出现的控制字符
+_ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _xlsx_cell(value):
+    if value is None or value == '':
+        return '<c/>'
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    text = _ILLEGAL_XML_CHARS.sub('', str(value))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return ('<row>' + ''.join(_xlsx_cell(v) for v in values) + '</row>').encode('utf-8')
+
+
+def iter_xlsx(header, rows, sheet_name='Sheet1'):
+    """生成只有一个工作表的 XLSX，行数据边查询边写出"""
+    stream = ZipStream()
+
+    workbook = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(sheet_name[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+    for name, content in _XLSX_STATIC_PARTS.items():
+        yield stream.writestr(name, content)
+    yield stream.writestr('xl/workbook.xml', workbook)
+
+    with stream.open('xl/worksheets/sheet1.xml') as sheet:
+        sheet.write(
+            b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+        )
+        if header:
+            sheet.write(_xlsx_row(header))
+        for count, row in enumerate(rows, 1):
+            sheet.write(_xlsx_row(row))
+            if count % FLUSH_ROWS == 0:
+                data = stream.drain()
+                if data:
+                    yield data
+        sheet.write(b'</sheetData></worksheet>')
+
+    yield stream.drain()
+    yield stream.close()
@@ -0,0 +1,152 @@
+# 作业附件下载
+# 整个作业的提交打包成 ZIP 边查询边输出：提交记录用服务端游标分批读取，附件按块读入压缩包，
+# 不写临时文件，也不在内存中保留整个压缩包。包内文件按学号命名（附件用原扩展名，文字答案为 .txt），
+# 最后附一份提交清单 CSV，附件缺失的提交也会列出。
+# 单个附件下载支持 Range 和条件请求；可以配置由前端服务器发送文件（X-Sendfile 或 nginx 的 X-Accel-Redirect），
+# 应用只做权限检查。
+# 附件保存在 UPLOAD_FOLDER（默认 instance/uploads），不在 static 下，只能经过上面的下载路由获取。
+
+import csv
+import io
+import os
+import zipfile
+from urllib.parse import quote
+
+from flask import current_app, request
+from sqlalchemy import bindparam, select, update
+from werkzeug.utils import send_file
+
+from extensions import db
+from models import AssignmentSubmission, SubmissionPreview, User
+from services.streaming import ZipStream, attachment_headers
+
+# 服务端游标每批读取的行数
+YIELD_PER = 500
+
+# 本身已经压缩过的格式直接存储，再压缩只会浪费 CPU
+STORED_EXTENSIONS = {'.docx', '.xlsx', '.pptx', '.zip', '.rar', '.7z', '.gz', '.pdf', '.jpg', '.jpeg', '.png'}
+
+MANIFEST_HEADER = ['学号', '姓名', '提交时间', '是否批改', '成绩', '附件', '文字答案']
+
+
+def upload_path(path):
+    """返回附件的真实路径；不在上传目录内（或文件不存在）时返回 None"""
+    if not path:
+        return None
+    root = os.path.realpath(current_app.config['UPLOAD_FOLDER'])
+    real = os.path.realpath(path)
+    if os.path.commonpath([root, real]) != root or not os.path.isfile(real):
+        return None
+    return real
+
+
+def archive_name(student_number, user_id, extension, seen):
+    """包内文件名：学号 + 扩展名；没有学号或重名时追加用户 ID"""
+    stem = (student_number or '').strip().replace('/', '_').replace('\\', '_') or f'user{user_id}'
+    name = f'{stem}{extension}'
+    if name in seen:
+        name = f'{stem}_{user_id}{extension}'
+    seen.add(name)
+    return name
+
+
+def iter_submission_archive(assignment):
+    """逐块产出包含该作业全部提交的 ZIP"""
+    rows = db.session.execute(
+        select(User.id, User.student_id, User.name, AssignmentSubmission.submitted_at,
+               AssignmentSubmission.graded, AssignmentSubmission.score,
+               AssignmentSubmission.file_path, AssignmentSubmission.text_answer)
+        .join(User, User.id == AssignmentSubmission.student_id)
+        .where(AssignmentSubmission.assignment_id == assignment.id)
+        .order_by(User.student_id, User.id)
+        .execution_options(stream_results=True, yield_per=YIELD_PER)
+    )
+
+    stream = ZipStream()
+    manifest = io.StringIO()
+    writer = csv.writer(manifest)
+    # 带 BOM，Excel 打开中文不乱码
+    manifest.write('\ufeff')
+    writer.writerow(MANIFEST_HEADER)
+    seen = set()
+
+    for user_id, student_number, name, submitted_at, graded, score, file_path, text_answer in rows:
+        attachment = ''
+        real_path = upload_path(file_path)
+        if real_path is not None:
+            extension = os.path.splitext(real_path)[1].lower()
+            attachment = archive_name(student_number, user_id, extension, seen)
+            compress_type = zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else None
+            yield from stream.write_file(attachment, real_path, compress_type)
+        elif file_path:
+            attachment = '（附件缺失）'
+
+        text_name = ''
+        if text_answer:
+            text_name = archive_name(student_number, user_id, '.txt', seen)
+            yield stream.writestr(text_name, text_answer)
+
+        writer.writerow([student_number, name,
+                         submitted_at.strftime('%Y-%m-%d %H:%M') if submitted_at else '',
+                         '是' if graded else '否', score, attachment, text_name])
+
+    yield stream.writestr('提交清单.csv', manifest.getvalue().encode('utf-8'))
+    yield stream.close()
+
+
+def send_submission_file(path, download_name):
+    """发送单个附件（需要请求上下文），文件不存在时返回 None"""
+    real_path = upload_path(path)
+    if real_path is None:
+        return None
+
+    config = current_app.config
+    offload = config['SUBMISSION_FILE_OFFLOAD']
+    if offload == 'x-accel':
+        # nginx 中把该前缀配置为 internal 的 location，指向上传目录
+        root = os.path.realpath(config['UPLOAD_FOLDER'])
+        relative = os.path.relpath(real_path, root).replace(os.sep, '/')
+        response = current_app.response_class(mimetype='application/octet-stream',
+                                              headers=attachment_headers(download_name))
+        response.headers['X-Accel-Redirect'] = config['SUBMISSION_ACCEL_PREFIX'].rstrip('/') + '/' + quote(relative)
+    else:
+        # Range、If-None-Match / If-Modified-Since 由 werkzeug 处理
+        response = send_file(real_path, request.environ, as_attachment=True, download_name=download_name,
+                             conditional=True, use_x_sendfile=offload == 'x-sendfile',
+                             response_class=current_app.response_class)
+    # 附件需要登录才能下载，不允许共享缓存保存
+    response.cache_control.private = True
+    return response
+
+
+def move_legacy_uploads(old_root):
+    """把旧版本保存在 old_root（static/uploads）下的附件移到 UPLOAD_FOLDER，并更新提交和预览中的路径。
+    返回 (移动的文件数, 缺失的文件数)"""
+    old_root = os.path.realpath(old_root)
+    new_root = current_app.config['UPLOAD_FOLDER']
+    moved, missing, changes = 0, 0, []
+    rows = db.session.execute(select(AssignmentSubmission.id, AssignmentSubmission.file_path)
+                              .where(AssignmentSubmission.file_path.isnot(None)))
+    for submission_id, file_path in rows:
+        real = os.path.realpath(file_path)
+        if os.path.commonpath([old_root, real]) != old_root:
+            continue
+        target = os.path.join(new_root, os.path.relpath(real, old_root))
+        if os.path.isfile(real):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(real, target)
+            moved += 1
+        elif not os.path.isfile(target):
+            missing += 1
+        changes.append({'row_id': submission_id, 'old_path': file_path, 'new_path': target})
+
+    # 预览记录的路径一起改，避免附件预览和检索索引被当作过期而重新生成
+    for table, key in ((AssignmentSubmission.__table__, 'id'), (SubmissionPreview.__table__, 'submission_id')):
+        if changes:
+            db.session.execute(
+                update(table).where(table.c[key] == bindparam('row_id'), table.c.file_path == bindparam('old_path'))
+                .values(file_path=bindparam('new_path')),
+                changes
+            )
+    db.session.commit()
+    return moved, missing
@@ -0,0 +1,133 @@
+# 教师面板统计
+# 面板上的计数（未截止作业、未开始考试、待批改提交）保存在 TeacherStats 中，
+# 创建作业/考试和学生提交时用单条 UPDATE 增量维护，页面只读这一行。
+# 与时间相关的计数会随时间失效：记录最近的截止/开始时间，过了之后再用聚合查询重算。
+
+from datetime import datetime
+
+from sqlalchemy import case, func, or_
+
+from extensions import db
+from models import Assignment, AssignmentSubmission, ClassInfo, Exam, TeacherStats
+
+
+def _earliest(column, value):
+    # SQL 表达式：取列当前值与 value 中较早的一个（列为空时取 value）
+    return case((or_(column.is_(None), column > value), value), else_=column)
+
+
+def _count_active_assignments(teacher_id, now):
+    return db.session.query(func.count(Assignment.id), func.min(Assignment.deadline)).filter(
+        Assignment.teacher_id == teacher_id,
+        Assignment.deadline > now
+    ).one()
+
+
+def _count_upcoming_exams(teacher_id, now):
+    return db.session.query(func.count(Exam.id), func.min(Exam.start_time)).filter(
+        Exam.teacher_id == teacher_id,
+        Exam.start_time > now
+    ).one()
+
+
+def _count_ungraded(teacher_id):
+    return db.session.query(func.count(AssignmentSubmission.id)).join(
+        Assignment, AssignmentSubmission.assignment_id == Assignment.id
+    ).filter(
+        Assignment.teacher_id == teacher_id,
+        or_(AssignmentSubmission.graded.is_(False), AssignmentSubmission.graded.is_(None))
+    ).scalar()
+
+
+def get_counters(teacher_id):
+    """返回教师面板计数；首次访问或时间相关计数过期时用聚合查询重算"""
+    now = datetime.now()
+    stats = TeacherStats.query.get(teacher_id)
+    changed = False
+
+    if stats is None:
+        stats = TeacherStats(teacher_id=teacher_id)
+        stats.ungraded_submissions = _count_ungraded(teacher_id)
+        db.session.add(stats)
+        changed = True
+
+    if changed or (stats.next_deadline is not None and stats.next_deadline <= now):
+        stats.active_assignments, stats.next_deadline = _count_active_assignments(teacher_id, now)
+        changed = True
+
+    if changed or (stats.next_exam_start is not None and stats.next_exam_start <= now):
+        stats.upcoming_exams, stats.next_exam_start = _count_upcoming_exams(teacher_id, now)
+        changed = True
+
+    if changed:
+        stats.refreshed_at = now
+        try:
+            db.session.commit()
+        except Exception:
+            # 并发请求可能同时创建了这一行，本次结果仍然可用
+            db.session.rollback()
+
+    return {
+        'active_assignments': stats.active_assignments,
+        'upcoming_exams': stats.upcoming_exams,
+        'ungraded_submissions': stats.ungraded_submissions,
+    }
+
+
+def _bump(teacher_id, **values):
+    # 计数行不存在时不做任何事，首次打开面板时会完整计算
+    TeacherStats.query.filter_by(teacher_id=teacher_id).update(values, synchronize_session=False)
+
+
+def assignment_created(assignment):
+    if assignment.deadline and assignment.deadline > datetime.now():
+        _bump(assignment.teacher_id,
+              active_assignments=TeacherStats.active_assignments + 1,
+              next_deadline=_earliest(TeacherStats.next_deadline, assignment.deadline))
+
+
+def exam_created(exam):
+    if exam.start_time and exam.start_time > datetime.now():
+        _bump(exam.teacher_id,
+              upcoming_exams=TeacherStats.upcoming_exams + 1,
+              next_exam_start=_earliest(TeacherStats.next_exam_start, exam.start_time))
+
+
+def ungraded_changed(teacher_id, delta):
+    """待批改数变化：新提交或已批改的作业被重新提交时 +1，批改后 -1"""
+    if delta:
+        _bump(teacher_id, ungraded_submissions=TeacherStats.ungraded_submissions + delta)
+
+
+def class_summary(teacher_id):
+    """按班级分组统计该教师的作业数和考试数（两条 GROUP BY 查询）"""
+    assignment_counts = dict(
+        db.session.query(Assignment.class_id, func.count(Assignment.id))
+        .filter(Assignment.teacher_id == teacher_id)
+        .group_by(Assignment.class_id)
+        .all()
+    )
+    exam_counts = dict(
+        db.session.query(Exam.class_id, func.count(Exam.id))
+        .filter(Exam.teacher_id == teacher_id)
+        .group_by(Exam.class_id)
+        .all()
+    )
+
+    class_ids = set(assignment_counts) | set(exam_counts)
+    if not class_ids:
+        return []
+
+    rows = db.session.query(ClassInfo.id, ClassInfo.college, ClassInfo.major, ClassInfo.class_name)\
+        .filter(ClassInfo.id.in_(class_ids))\
+        .order_by(ClassInfo.college, ClassInfo.major, ClassInfo.class_name)\
+        .all()
+
+    return [{
+        'id': row.id,
+        'college': row.college,
+        'major': row.major,
+        'class_name': row.class_name,
+        'assignment_count': assignment_counts.get(row.id, 0),
+        'exam_count': exam_counts.get(row.id, 0),
+    } for row in rows]
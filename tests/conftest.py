@@ -0,0 +1,48 @@
+# 测试公共夹具
+# 配置在导入 config 时从环境变量读取，所以先把数据库和各运行目录指向临时目录，再导入应用。
+# 测试中不启动后台线程，密码哈希使用很少的迭代次数。
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+_TMP = tempfile.mkdtemp(prefix='teaching-tests-')
+os.environ.update({
+    'DATABASE_URL': 'sqlite:///' + os.path.join(_TMP, 'test.db'),
+    'UPLOAD_FOLDER': os.path.join(_TMP, 'uploads'),
+    'CHUNK_UPLOAD_FOLDER': os.path.join(_TMP, 'chunk_uploads'),
+    'EXAM_AUTOSAVE_DIR': os.path.join(_TMP, 'autosave'),
+    'EXAM_PAPER_CACHE_DIR': os.path.join(_TMP, 'exam_papers'),
+    'JINJA_BYTECODE_CACHE_DIR': os.path.join(_TMP, 'jinja_cache'),
+    'BULK_IMPORT_RESULT_DIR': os.path.join(_TMP, 'import_results'),
+    'QUERY_PROFILER_SLOW_LOG': '',
+    'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+    'BACKGROUND_WORKERS': '0',
+    'WTF_CSRF_ENABLED': '0',
+})
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def database(app):
+    """每个测试使用空数据库（测试结束时不保留应用上下文，避免登录用户留在 g 中）"""
+    from extensions import db
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    yield db
+    with app.app_context():
+        db.session.remove()
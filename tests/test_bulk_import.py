@@ -0,0 +1,85 @@
+import io
+import os
+
+import pytest
+from werkzeug.security import check_password_hash
+
+from services import bulk_import
+
+
+@pytest.fixture
+def teachers(app, database):
+    from models import User
+    with app.app_context():
+        users = [User(name=f'教师{i}', phone=f'1380000000{i}', role='teacher') for i in range(2)]
+        for user in users:
+            user.set_password('pw123456')
+        database.session.add_all(users)
+        database.session.commit()
+        return [user.id for user in users]
+
+
+def _client(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+def _wait_for_imports():
+    # 导入线程只有一个，排在后面的空任务完成时前面的导入也已完成
+    bulk_import.import_worker._get_executor().submit(lambda: None).result(timeout=60)
+
+
+def test_hash_pool_is_reused():
+    passwords = [f'password-{i}' for i in range(60)]
+    first = bulk_import.hash_passwords(passwords, workers=2, method='pbkdf2:sha256:1000')
+    pool = bulk_import._hash_pool
+    bulk_import.hash_passwords(passwords, workers=2, method='pbkdf2:sha256:1000')
+    assert pool is not None and bulk_import._hash_pool is pool
+    assert all(check_password_hash(h, p) for h, p in zip(first, passwords))
+
+
+def test_import_runs_in_background_and_shows_passwords_once(app, teachers):
+    from models import ImportJob, User
+
+    csv_data = ('姓名,手机号,学号,学院,专业,班级,密码\n'
+                '张三,13900000001,S001,信息学院,软件工程,1班,\n'
+                '李四,13900000002,S002,信息学院,软件工程,1班,secret123\n'
+                '王五,12345,S003,信息学院,软件工程,1班,\n').encode('utf-8')
+    client = _client(app, teachers[0])
+    response = client.post('/teacher/students/import',
+                           data={'file': (io.BytesIO(csv_data), 'students.csv')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 302
+    job_url = response.headers['Location']
+    _wait_for_imports()
+
+    with app.app_context():
+        job = ImportJob.query.one()
+        assert job.status == 'done' and job.total == 3
+        assert 'secret123' not in job.report and '13900000001' not in job.report
+        assert {u.student_id for u in User.query.filter_by(role='student')} == {'S001', 'S002'}
+        job_id = job.id
+
+    password_file = os.path.join(app.config['BULK_IMPORT_RESULT_DIR'], f'{job_id}.csv')
+    assert os.path.exists(password_file)
+    assert oct(os.stat(password_file).st_mode & 0o777) == '0o600'
+
+    # 其他教师看不到这个任务
+    assert _client(app, teachers[1]).get(job_url).status_code == 404
+    assert os.path.exists(password_file)
+
+    response = client.get(job_url)
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-store'
+    assert not os.path.exists(password_file)
+    assert bulk_import.import_worker.take_passwords(job_id) == []
+
+
+def test_take_passwords_returns_rows_once(app):
+    worker = bulk_import.import_worker
+    worker._write_passwords(999, [(2, 'S001', '张三', 'abcDEF2345')])
+    assert worker.take_passwords(999) == [('2', 'S001', '张三', 'abcDEF2345')]
+    assert worker.take_passwords(999) == []
@@ -0,0 +1,82 @@
+import pytest
+from flask import Flask
+
+from benchmarks.bench_metrics import hook_overhead
+from services.metrics import Metrics
+
+# 每个请求的指标代码耗时预算（秒），比 bench_metrics 的默认预算宽松，避免测试机抖动导致失败
+OVERHEAD_BUDGET = 200e-6
+
+
+@pytest.fixture
+def metrics_app():
+    app = Flask(__name__)
+
+    @app.route('/ping')
+    def ping():
+        return 'ok'
+
+    app.add_url_rule('/odd', 'odd"name\\x', lambda: 'odd')
+    metrics = Metrics()
+    metrics.init_app(app)
+    return app, metrics
+
+
+def test_local_scrape_allowed(metrics_app):
+    app, _ = metrics_app
+    client = app.test_client()
+    client.get('/ping')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert 'http_requests_total{endpoint="ping",status="200"} 1' in response.get_data(as_text=True)
+
+
+@pytest.mark.parametrize('headers, remote_addr', [
+    ({'X-Forwarded-For': '203.0.113.7'}, '127.0.0.1'),
+    ({'Forwarded': 'for=203.0.113.7'}, '127.0.0.1'),
+    ({}, '10.0.0.5'),
+])
+def test_proxied_or_remote_scrape_rejected_without_token(metrics_app, headers, remote_addr):
+    app, _ = metrics_app
+    response = app.test_client().get('/metrics', headers=headers, environ_base={'REMOTE_ADDR': remote_addr})
+    assert response.status_code == 404
+
+
+def test_token_required_when_configured(metrics_app):
+    app, metrics = metrics_app
+    metrics.token = 's3cret'
+    client = app.test_client()
+    assert client.get('/metrics').status_code == 404
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 404
+    assert client.get('/metrics', headers={'Authorization': 'Basic s3cret'}).status_code == 404
+    response = client.get('/metrics', headers={'Authorization': 'Bearer s3cret', 'X-Forwarded-For': '203.0.113.7'},
+                          environ_base={'REMOTE_ADDR': '10.0.0.5'})
+    assert response.status_code == 200
+
+
+def test_labels_escaped(metrics_app):
+    app, metrics = metrics_app
+    app.test_client().get('/odd')
+    assert 'endpoint="odd\\"name\\\\x"' in metrics.render()
+
+
+def test_collectors_skip_bad_values(metrics_app):
+    _, metrics = metrics_app
+    metrics.register('cache', lambda: {'hits': 3, 'hit_rate': None, 'enabled': True, 'name': 'x'})
+    metrics.register('broken', lambda: 1 / 0)
+    text = metrics.render()
+    assert 'teaching_cache_hits 3' in text
+    assert 'teaching_cache_hit_rate' not in text
+    assert 'teaching_cache_enabled' not in text
+    assert 'teaching_broken' not in text
+
+
+def test_app_exports_component_stats(app):
+    text = app.test_client().get('/metrics').get_data(as_text=True)
+    for name in ('identity_cache', 'password_verify', 'class_fragments', 'exam_autosave', 'exam_timer'):
+        assert f'teaching_{name}_' in text
+
+
+def test_hook_overhead_within_budget():
+    assert hook_overhead(2000) < OVERHEAD_BUDGET
@@ -0,0 +1,30 @@
+from services import question_bank
+
+
+def _rows(*contents):
+    return [{'question_type': 'choice', 'content': content, 'options': ['A', 'B'], 'answer': 'A',
+             'knowledge_point': '链表', 'difficulty': '简单'} for content in contents]
+
+
+def test_add_questions_deduplicates(app, database):
+    from models import BankQuestion
+    with app.app_context():
+        assert question_bank.add_questions(_rows('题目一', '题目二', '题目一'), None) == (2, 1)
+        assert question_bank.add_questions(_rows('题目二', '题目三'), None) == (1, 1)
+        assert BankQuestion.query.count() == 3
+
+
+def test_add_questions_skips_rows_inserted_concurrently(app, database, monkeypatch):
+    """查询已有题目之后才被其他导入写入的题目，插入时跳过而不是抛出唯一键冲突"""
+    from models import BankQuestion
+    with app.app_context():
+        question_bank.add_questions(_rows('题目一'), None)
+
+        class NothingExists:
+            def filter(self, *args):
+                return []
+
+        monkeypatch.setattr(database.session, 'query', lambda *args: NothingExists())
+        assert question_bank.add_questions(_rows('题目一', '题目二'), None) == (1, 1)
+        monkeypatch.undo()
+        assert BankQuestion.query.count() == 2
@@ -0,0 +1,18 @@
+import csv
+import io
+
+from services.streaming import iter_csv
+
+
+def _read(header, rows):
+    text = b''.join(iter_csv(header, rows)).decode('utf-8-sig')
+    return list(csv.reader(io.StringIO(text)))
+
+
+def test_csv_formula_cells_are_escaped():
+    rows = [['=HYPERLINK("http://example.com")', '+1', '-2', '@SUM(A1)', '\tx', '张三'], [-1.5, 0, None]]
+    assert _read(['姓名'], rows) == [
+        ['姓名'],
+        ['\'=HYPERLINK("http://example.com")', "'+1", "'-2", "'@SUM(A1)", "'\tx", '张三'],
+        ['-1.5', '0', ''],
+    ]